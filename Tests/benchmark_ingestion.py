@@ -0,0 +1,477 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+import tempfile
+import platform
+import statistics
+import subprocess
+from io import BytesIO
+from collections import Counter
+from datetime import datetime, timezone
+
+# Offline ingestion benchmark: runs get_pdf_documents -> split -> embed -> index -> query over a
+# corpus of PDFs with local stand-ins for every remote service, and writes a JSON report that
+# can be diffed between commits.
+#
+#   python Tests/benchmark_ingestion.py --output benchmark.json
+#   python Tests/benchmark_ingestion.py --corpus ./pdfs --vlm-latency-ms 0 --embed-latency-ms 0
+#   python Tests/benchmark_ingestion.py --record   # call the real NVIDIA API on fixture misses and save them
+#
+# NeVA, DePlot, chat-completion, embedding and query-LLM responses are replayed from a JSON
+# fixture file with a fixed latency per call; requests without a recorded response get a
+# deterministic synthetic answer and are counted as fixture misses. Pinecone is replaced by
+# the local vector store backend. Without --corpus a synthetic corpus is generated.
+#
+# No fixture file is checked in: until one is recorded with --record, every remote answer is
+# synthetic and the report's "mode" is "synthetic". Such runs measure parsing, splitting,
+# indexing and the configured latencies only, not real model output or real API timings.
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(REPO_ROOT, "backend")
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_fixtures", "nvidia_responses.json")
+DEFAULT_QUESTIONS = [
+    "What are the main findings of this publication?",
+    "Which risks does the author highlight?",
+    "Summarize the data shown in the tables."
+]
+EMBED_DIMENSION = 1024
+
+class FixtureStore:
+    """Recorded responses keyed by the SHA-256 of the request, persisted as one JSON file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.responses = {}
+        self.embeddings = {}
+        self.dirty = False
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.responses = data.get("responses", {})
+            self.embeddings = data.get("embeddings", {})
+
+    @staticmethod
+    def key(*parts):
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(json.dumps(part, sort_keys=True).encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"responses": self.responses, "embeddings": self.embeddings}, f)
+        print(f"Saved {len(self.responses)} responses and {len(self.embeddings)} embeddings to {self.path}")
+
+def synthetic_embedding(text):
+    """Deterministic unit vector derived from the text, used when no embedding was recorded."""
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    vector = [rng.gauss(0.0, 1.0) for _ in range(EMBED_DIMENSION)]
+    norm = sum(value * value for value in vector) ** 0.5
+    return [value / norm for value in vector]
+
+def synthetic_response(url):
+    """Deterministic stand-in answer for an unrecorded NVIDIA request."""
+    if "deplot" in url:
+        return "Year | Revenue <0x0A> 2021 | 10.5 <0x0A> 2022 | 12.1 <0x0A> 2023 | 13.8"
+    if "neva" in url:
+        return "A line chart plotting revenue growth over three years."
+    return "The chart shows revenue rising steadily from 10.5 in 2021 to 13.8 in 2023."
+
+def endpoint_name(url):
+    for name in ("neva", "deplot", "chat"):
+        if name in url:
+            return name
+    return url
+
+def build_stand_ins(args, fixtures, calls):
+    """Create the replay embedding model and LLM (imported here so the backend path is set up first)."""
+    from typing import Any
+    from pydantic import PrivateAttr
+    from llama_index.core.embeddings import BaseEmbedding
+    from llama_index.core.llms import CustomLLM, CompletionResponse, LLMMetadata
+    from llama_index.core.llms.callbacks import llm_completion_callback
+    from utils.embedding_pipeline import EMBED_MAX_BATCH_SIZE
+    from utils.nvidia_client import get_embedding_model, get_llm, NVIDIA_EMBED_MODEL, NVIDIA_LLM_MODEL
+
+    class ReplayEmbedding(BaseEmbedding):
+        """Embedding model replaying recorded vectors, one fixed latency per request."""
+
+        _upstream: Any = PrivateAttr(default=None)
+
+        def __init__(self, upstream=None, **kwargs):
+            super().__init__(model_name=NVIDIA_EMBED_MODEL, embed_batch_size=EMBED_MAX_BATCH_SIZE, **kwargs)
+            self._upstream = upstream
+
+        def _lookup(self, texts, kind):
+            calls["embedding_requests"] += 1
+            calls["embedded_texts"] += len(texts)
+            time.sleep(args.embed_latency_ms / 1000)
+            vectors, missing = [], []
+            for text in texts:
+                key = FixtureStore.key(NVIDIA_EMBED_MODEL, kind, text)
+                vector = fixtures.embeddings.get(key)
+                if vector is None:
+                    missing.append((len(vectors), key, text))
+                vectors.append(vector)
+            calls["fixture_hits"] += len(texts) - len(missing)
+            if missing and self._upstream is not None:
+                embed = self._upstream.get_query_embedding if kind == "query" else self._upstream.get_text_embedding
+                for position, key, text in missing:
+                    vectors[position] = fixtures.embeddings[key] = embed(text)
+                fixtures.dirty = True
+            else:
+                calls["fixture_misses"] += len(missing)
+                for position, _, text in missing:
+                    vectors[position] = synthetic_embedding(text)
+            return vectors
+
+        def _get_query_embedding(self, query):
+            return self._lookup([query], "query")[0]
+
+        def _get_text_embedding(self, text):
+            return self._lookup([text], "passage")[0]
+
+        def _get_text_embeddings(self, texts):
+            return self._lookup(texts, "passage")
+
+        async def _aget_query_embedding(self, query):
+            return self._get_query_embedding(query)
+
+    class ReplayLLM(CustomLLM):
+        """Query LLM replaying recorded completions with a fixed latency."""
+
+        _upstream: Any = PrivateAttr(default=None)
+
+        def __init__(self, upstream=None, **kwargs):
+            super().__init__(**kwargs)
+            self._upstream = upstream
+
+        @property
+        def metadata(self):
+            return LLMMetadata(model_name=NVIDIA_LLM_MODEL)
+
+        def _answer(self, prompt):
+            calls["query_llm"] += 1
+            time.sleep(args.llm_latency_ms / 1000)
+            key = FixtureStore.key(NVIDIA_LLM_MODEL, prompt)
+            text = fixtures.responses.get(key)
+            if text is None and self._upstream is not None:
+                text = fixtures.responses[key] = self._upstream.complete(prompt).text
+                fixtures.dirty = True
+            elif text is None:
+                calls["fixture_misses"] += 1
+                text = "The publication discusses its findings in complete sentences."
+            else:
+                calls["fixture_hits"] += 1
+            return text
+
+        @llm_completion_callback()
+        def complete(self, prompt, formatted=False, **kwargs):
+            return CompletionResponse(text=self._answer(prompt))
+
+        @llm_completion_callback()
+        def stream_complete(self, prompt, formatted=False, **kwargs):
+            text = self._answer(prompt)
+            yield CompletionResponse(text=text, delta=text)
+
+    if args.record:
+        return (
+            ReplayEmbedding(upstream=get_embedding_model(NVIDIA_EMBED_MODEL, embed_batch_size=EMBED_MAX_BATCH_SIZE)),
+            ReplayLLM(upstream=get_llm(NVIDIA_LLM_MODEL))
+        )
+    return ReplayEmbedding(), ReplayLLM()
+
+def build_vlm_transport(args, fixtures, calls):
+    """httpx transport that answers the enrichment stage's NVIDIA requests from the fixture store."""
+    import httpx
+
+    class ReplayTransport(httpx.AsyncBaseTransport):
+        def __init__(self):
+            self._upstream = httpx.AsyncHTTPTransport() if args.record else None
+
+        async def handle_async_request(self, request):
+            url = str(request.url)
+            calls[endpoint_name(url)] += 1
+            key = FixtureStore.key(url, json.loads(request.content))
+            content = fixtures.responses.get(key)
+            if content is None and self._upstream is not None:
+                response = await self._upstream.handle_async_request(request)
+                await response.aread()
+                if response.status_code == 200:
+                    fixtures.responses[key] = response.json()["choices"][0]["message"]["content"]
+                    fixtures.dirty = True
+                return response
+            await asyncio.sleep(args.vlm_latency_ms / 1000)
+            if content is None:
+                calls["fixture_misses"] += 1
+                content = synthetic_response(url)
+            else:
+                calls["fixture_hits"] += 1
+            return httpx.Response(200, json={"choices": [{"message": {"content": content}}]}, request=request)
+
+        async def aclose(self):
+            if self._upstream is not None:
+                await self._upstream.aclose()
+
+    return ReplayTransport()
+
+def synthetic_pdf(seed, pages):
+    """Generate a reproducible PDF with paragraphs, a ruled table and a chart-like image on every page."""
+    import fitz
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(seed)
+    words = ("market", "equity", "duration", "yield", "inflation", "portfolio", "risk", "return",
+             "allocation", "credit", "liquidity", "volatility", "earnings", "valuation", "growth")
+    doc = fitz.open()
+    for pagenum in range(pages):
+        page = doc.new_page(width=595, height=842)
+        y = 100
+        for paragraph in range(3):
+            text = " ".join(rng.choice(words) for _ in range(70)).capitalize() + "."
+            page.insert_textbox(fitz.Rect(60, y, 535, y + 90), text, fontsize=9)
+            y += 100
+        page.insert_text((60, y + 10), f"Table {pagenum + 1}: Asset class returns", fontsize=9)
+        rows, cols, cell_w, cell_h = 5, 4, 110, 18
+        top = y + 20
+        for r in range(rows):
+            for c in range(cols):
+                cell = fitz.Rect(60 + c * cell_w, top + r * cell_h, 60 + (c + 1) * cell_w, top + (r + 1) * cell_h)
+                page.draw_rect(cell, color=(0, 0, 0), width=0.5)
+                label = ("Asset", "2021", "2022", "2023")[c] if r == 0 else (rng.choice(words) if c == 0 else f"{rng.uniform(-5, 15):.1f}")
+                page.insert_text((cell.x0 + 4, cell.y1 - 5), label, fontsize=8)
+        y = top + rows * cell_h + 30
+
+        image = Image.new("RGB", (600, 300), "white")
+        draw = ImageDraw.Draw(image)
+        points = [(40 + i * 50, 260 - rng.randint(20, 220)) for i in range(11)]
+        draw.line([(40, 20), (40, 260), (580, 260)], fill="black", width=2)
+        draw.line(points, fill=(31, 119, 180), width=3)
+        buffer = BytesIO()
+        image.save(buffer, format="PNG")
+        page.insert_image(fitz.Rect(60, y, 460, y + 200), stream=buffer.getvalue())
+        page.insert_text((60, y + 215), f"Figure {pagenum + 1}: Cumulative return of the strategy", fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+def load_corpus(args):
+    """Return (name, bytes) pairs from --corpus, or a generated synthetic corpus."""
+    if args.corpus:
+        names = sorted(name for name in os.listdir(args.corpus) if name.lower().endswith(".pdf"))
+        corpus = []
+        for name in names:
+            with open(os.path.join(args.corpus, name), "rb") as f:
+                corpus.append((name, f.read()))
+        return corpus
+    return [(f"synthetic-{i}.pdf", synthetic_pdf(seed=i, pages=args.synthetic_pages)) for i in range(args.synthetic_documents)]
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of samples."""
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def benchmark_document(pdf_id, name, pdf_content, args, work_dir, embed_model, llm, transport, calls):
+    """Run one PDF through the pipeline and return its per-stage timings and counters."""
+    import fitz
+    from llama_index.core import VectorStoreIndex
+    from llama_index.core.node_parser import SentenceSplitter
+    from utils.pdf_processor import get_pdf_documents
+    from utils.embedding_pipeline import embed_nodes
+    from utils.incremental_index import chunk_id, stamp_chunk_hashes, sync_collection
+    from utils.vector_store import get_vector_store
+    from utils.memory_usage import MemoryTracker
+
+    with fitz.open(stream=pdf_content, filetype="pdf") as f:
+        page_count = len(f)
+    calls_before = Counter(calls)
+    stages = {}
+    stage_marks = {}
+
+    def progress(stage, done=0, total=0):
+        stage_marks[stage] = time.perf_counter()
+
+    with MemoryTracker() as memory:
+        start = time.perf_counter()
+        documents = get_pdf_documents(
+            pdf_content, f"publication_{pdf_id}.pdf", os.path.join(work_dir, f"artifacts-{pdf_id}"),
+            max_workers=args.workers, progress=progress, transport=transport
+        )
+        parsed = time.perf_counter()
+        parse_end = stage_marks.get("parse", parsed)
+        stages["parse"] = parse_end - start
+        stages["enrich"] = parsed - parse_end
+
+        splitter = SentenceSplitter(chunk_size=args.chunk_size, id_func=chunk_id)
+        nodes = splitter.get_nodes_from_documents(documents)
+        stamp_chunk_hashes(nodes, embed_model.model_name)
+        split = time.perf_counter()
+        stages["split"] = split - parsed
+
+        embed_stats = embed_nodes(nodes, embed_model)
+        embedded = time.perf_counter()
+        stages["embed"] = embedded - split
+
+        index_stats = sync_collection("pdf-index", pdf_id, nodes)
+        indexed = time.perf_counter()
+        stages["index"] = indexed - embedded
+
+        query_latencies = []
+        vector_store = get_vector_store("pdf-index", pdf_id)
+        index = VectorStoreIndex.from_vector_store(vector_store=vector_store, embed_model=embed_model)
+        query_engine = index.as_query_engine(llm=llm, similarity_top_k=5, response_mode="tree_summarize")
+        for question in args.questions:
+            query_start = time.perf_counter()
+            query_engine.query(f"Please provide a complete sentence answer to the following question: {question}")
+            query_latencies.append(time.perf_counter() - query_start)
+        stages["query"] = time.perf_counter() - indexed
+
+    ingest_seconds = indexed - start
+    result = {
+        "name": name,
+        "pdf_bytes": len(pdf_content),
+        "pages": page_count,
+        "documents": len(documents),
+        "chunks": len(nodes),
+        "stages_seconds": {stage: round(seconds, 4) for stage, seconds in stages.items()},
+        "ingest_seconds": round(ingest_seconds, 4),
+        "pages_per_second": round(page_count / ingest_seconds, 3) if ingest_seconds > 0 else None,
+        "embeddings_per_second": round(embed_stats["embeddings_per_second"], 2),
+        "index": index_stats,
+        "query_latency_seconds": [round(latency, 4) for latency in query_latencies],
+        "api_calls": dict(Counter(calls) - calls_before),
+        "memory": memory.stats()
+    }
+    print(f"{name}: {page_count} pages, {len(nodes)} chunks, ingested in {ingest_seconds:.2f}s "
+          f"({result['pages_per_second']} pages/sec)")
+    return result
+
+def run_mode(args, calls):
+    """How the remote responses of a run were produced: recorded, replayed, synthetic or a mix."""
+    if args.record:
+        return "recorded"
+    if not calls["fixture_misses"]:
+        return "replayed"
+    if not calls["fixture_hits"]:
+        return "synthetic"
+    return "partially synthetic"
+
+def main(args):
+    work_dir = tempfile.mkdtemp(prefix="benchmark-ingestion-")
+    # Everything the pipeline persists goes to the scratch directory, so each run starts cold
+    os.environ["VECTOR_STORE_BACKEND"] = "local"
+    os.environ["LOCAL_VECTOR_STORE_DIR"] = os.path.join(work_dir, "vectorstore")
+    os.environ["RESPONSE_CACHE_PATH"] = os.path.join(work_dir, "responses.db")
+    os.environ["INGESTION_CACHE_DIR"] = os.path.join(work_dir, "ingestion_cache")
+    if not args.record:
+        # Replayed calls never reach NVIDIA, so the client-side rate limit must not slow them down
+        os.environ["NVIDIA_RATE_LIMIT_PER_MINUTE"] = "0"
+        os.environ.setdefault("NVIDIA_API_KEY", "benchmark-replay")
+    sys.path.insert(0, BACKEND_DIR)
+
+    from utils.memory_usage import MemoryTracker
+
+    fixtures = FixtureStore(args.fixtures)
+    calls = Counter()
+    embed_model, llm = build_stand_ins(args, fixtures, calls)
+    corpus = load_corpus(args)
+    if not corpus:
+        raise SystemExit("The corpus is empty")
+
+    results = []
+    with MemoryTracker() as memory:
+        start = time.perf_counter()
+        for pdf_id, (name, pdf_content) in enumerate(corpus, 1):
+            results.append(benchmark_document(str(pdf_id), name, pdf_content, args, work_dir, embed_model, llm, build_vlm_transport(args, fixtures, calls), calls))
+        total_seconds = time.perf_counter() - start
+    fixtures.save()
+
+    stage_totals = Counter()
+    for result in results:
+        stage_totals.update(result["stages_seconds"])
+    pages = sum(result["pages"] for result in results)
+    ingest_seconds = sum(result["ingest_seconds"] for result in results)
+    query_latencies = [latency for result in results for latency in result["query_latency_seconds"]]
+
+    mode = run_mode(args, calls)
+    report = {
+        "mode": mode,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "config": {
+            "corpus": args.corpus or f"synthetic ({args.synthetic_documents} x {args.synthetic_pages} pages)",
+            "fixtures": os.path.relpath(args.fixtures, REPO_ROOT),
+            "record": args.record,
+            "workers": args.workers,
+            "chunk_size": args.chunk_size,
+            "vlm_latency_ms": args.vlm_latency_ms,
+            "embed_latency_ms": args.embed_latency_ms,
+            "llm_latency_ms": args.llm_latency_ms,
+            "questions": len(args.questions)
+        },
+        "totals": {
+            "documents": len(results),
+            "pages": pages,
+            "chunks": sum(result["chunks"] for result in results),
+            "wall_seconds": round(total_seconds, 4),
+            "ingest_seconds": round(ingest_seconds, 4),
+            "pages_per_second": round(pages / ingest_seconds, 3) if ingest_seconds > 0 else None,
+            "stages_seconds": {stage: round(seconds, 4) for stage, seconds in stage_totals.items()},
+            "api_calls": dict(calls),
+            "fixture_hits": calls["fixture_hits"],
+            "fixture_misses": calls["fixture_misses"],
+            "query_p50_seconds": round(statistics.median(query_latencies), 4) if query_latencies else None,
+            "query_p95_seconds": round(percentile(query_latencies, 95), 4) if query_latencies else None,
+            "memory": memory.stats()
+        },
+        "documents": results
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+    print(f"\n{len(results)} documents, {pages} pages in {total_seconds:.2f}s "
+          f"({report['totals']['pages_per_second']} pages/sec during ingestion)")
+    for stage, seconds in report["totals"]["stages_seconds"].items():
+        print(f"  {stage:<7} {seconds:8.3f}s")
+    print(f"API calls: {dict(calls)}")
+    if mode in ("synthetic", "partially synthetic"):
+        print(f"Mode: {mode} ({calls['fixture_misses']} fixture misses answered with synthetic responses; "
+              f"record fixtures with --record for real model output)")
+    print(f"Peak RSS: {memory.peak_rss_bytes / 1024 ** 2:.0f} MiB (page workers: {memory.page_workers_peak_rss_bytes / 1024 ** 2:.0f} MiB)")
+    print(f"Report written to {args.output}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline ingestion and query benchmark with replayed NVIDIA responses. No fixtures are "
+                                                 "checked in, so until they are recorded with --record all responses are synthetic.")
+    parser.add_argument("--corpus", help="Directory of PDFs (default: a generated synthetic corpus)")
+    parser.add_argument("--synthetic-documents", type=int, default=3)
+    parser.add_argument("--synthetic-pages", type=int, default=8)
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES, help="JSON file of recorded responses (not checked in; missing responses are synthetic)")
+    parser.add_argument("--record", action="store_true", help="Call the real NVIDIA API on fixture misses and save the responses")
+    parser.add_argument("--vlm-latency-ms", type=float, default=800.0, help="Replayed latency of a NeVA/DePlot/chat call")
+    parser.add_argument("--embed-latency-ms", type=float, default=150.0, help="Replayed latency of an embedding request")
+    parser.add_argument("--llm-latency-ms", type=float, default=1200.0, help="Replayed latency of a query LLM call")
+    parser.add_argument("--workers", type=int, default=None, help="Page-parsing processes (default: PDF_PARSE_MAX_WORKERS)")
+    parser.add_argument("--chunk-size", type=int, default=650)
+    parser.add_argument("--question", dest="questions", action="append", help="Question to ask every document (repeatable)")
+    parser.add_argument("--output", default="benchmark_ingestion.json", help="Where to write the JSON report")
+    args = parser.parse_args()
+    args.questions = args.questions or DEFAULT_QUESTIONS
+    main(args)
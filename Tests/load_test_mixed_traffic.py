@@ -0,0 +1,100 @@
+import os
+import time
+import asyncio
+import argparse
+import statistics
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Mixed-traffic load test: keeps a PDF ingestion running on the backend while a pool of
+# clients sends /rag/query requests, then reports the query latency percentiles.
+API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000")
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of samples."""
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+async def run_ingestions(client, args, stop_event, results):
+    """Reprocess the PDF back to back until the query phase is over."""
+    while not stop_event.is_set():
+        start = time.perf_counter()
+        try:
+            response = await client.post(
+                f"{args.base_url}/rag/reload-pdf",
+                json={"pdf_link": args.pdf_link, "pdf_id": args.ingest_pdf_id},
+                timeout=None
+            )
+            results.append((time.perf_counter() - start, response.status_code))
+        except httpx.HTTPError as e:
+            print(f"Ingestion request failed: {e}")
+            results.append((time.perf_counter() - start, None))
+
+async def run_queries(client, args, deadline, latencies, errors):
+    """Send queries one after another until the deadline."""
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = await client.post(
+                f"{args.base_url}/rag/query",
+                json={"pdf_id": args.query_pdf_id, "question": args.question, "index_type": "pdf-index"},
+                timeout=args.timeout
+            )
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors.append(response.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+
+async def main(args):
+    latencies, errors, ingestions = [], [], []
+    stop_event = asyncio.Event()
+    limits = httpx.Limits(max_connections=args.concurrency + 2)
+
+    async with httpx.AsyncClient(limits=limits) as client:
+        ingestion_task = asyncio.create_task(run_ingestions(client, args, stop_event, ingestions))
+        # Give the ingestion a head start so the queries overlap with parsing and indexing
+        await asyncio.sleep(args.warmup)
+        deadline = time.perf_counter() + args.duration
+        await asyncio.gather(*(run_queries(client, args, deadline, latencies, errors) for _ in range(args.concurrency)))
+        stop_event.set()
+        print("Query phase finished, waiting for the running ingestion to complete...")
+        await ingestion_task
+
+    print(f"\nQueries: {len(latencies)} succeeded, {len(errors)} failed over {args.duration}s "
+          f"with {args.concurrency} concurrent clients")
+    if errors:
+        print(f"Failures: {errors[:10]}{' ...' if len(errors) > 10 else ''}")
+    if ingestions:
+        print(f"Ingestions completed during the test: {len(ingestions)} "
+              f"(mean {statistics.mean(seconds for seconds, _ in ingestions):.1f}s)")
+    if not latencies:
+        print("No successful queries; check that the query PDF is indexed.")
+        return 1
+
+    p50, p95, p99 = (percentile(latencies, pct) for pct in (50, 95, 99))
+    print(f"Latency p50={p50 * 1000:.0f}ms p95={p95 * 1000:.0f}ms p99={p99 * 1000:.0f}ms "
+          f"max={max(latencies) * 1000:.0f}ms ({len(latencies) / args.duration:.1f} queries/sec)")
+
+    if args.max_p99_ms and p99 * 1000 > args.max_p99_ms:
+        print(f"FAIL: p99 latency is above {args.max_p99_ms}ms")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure /rag/query latency while a PDF is being ingested.")
+    parser.add_argument("--base-url", default=API_BASE_URL)
+    parser.add_argument("--pdf-link", required=True, help="PDF reprocessed in a loop during the test")
+    parser.add_argument("--ingest-pdf-id", required=True, help="PDF ID used for the ingestion requests")
+    parser.add_argument("--query-pdf-id", required=True, help="PDF ID of an already indexed publication to query")
+    parser.add_argument("--question", default="What are the key findings of this publication?")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=60, help="Seconds of query traffic")
+    parser.add_argument("--warmup", type=float, default=5, help="Seconds between starting the ingestion and the queries")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-query timeout in seconds")
+    parser.add_argument("--max-p99-ms", type=float, default=None, help="Exit non-zero if p99 latency exceeds this")
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
@@ -4,6 +4,7 @@ from datetime import datetime
 import snowflake.connector
 import boto3
 import os
+import requests
 import pandas as pd
 from io import StringIO
 
@@ -78,6 +79,21 @@ def load_data_into_snowflake():
         print("Snowflake connection closed.")
 
 
+def invalidate_publications_cache():
+    """Ask the FastAPI backend to drop its cached publication list so the new rows show up immediately."""
+    backend_url = os.getenv("BACKEND_API_URL", "http://host.docker.internal:8000")
+    headers = {}
+    if os.getenv("CACHE_INVALIDATION_TOKEN"):
+        headers["X-Invalidation-Token"] = os.getenv("CACHE_INVALIDATION_TOKEN")
+    try:
+        response = requests.post(f"{backend_url}/snowflake/publications/invalidate", headers=headers, timeout=10)
+        response.raise_for_status()
+        print(f"Publications cache invalidated: {response.json()}")
+    except requests.RequestException as e:
+        # The backend cache also expires on its own (PUBLICATIONS_CACHE_TTL_SECONDS), so this is not fatal
+        print(f"Could not invalidate the publications cache: {e}")
+
+
 default_args = {
     'owner': 'airflow',
     'start_date': datetime(2024, 10, 22),
@@ -96,3 +112,10 @@ with DAG(
         task_id='load_data_into_snowflake',
         python_callable=load_data_into_snowflake,
     )
+
+    invalidate_cache_task = PythonOperator(
+        task_id='invalidate_publications_cache',
+        python_callable=invalidate_publications_cache,
+    )
+
+    load_data_task >> invalidate_cache_task
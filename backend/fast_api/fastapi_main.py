@@ -1,8 +1,13 @@
 # fast_api/fastapi_main.py
 
-from fastapi import FastAPI
+from typing import Optional
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, PlainTextResponse
 from fast_api.routers import snowflake_router, s3_router, summarization_router, rag_router
+from utils.instrumentation import metrics_registry, METRICS_CONTENT_TYPE
+from utils.request_metrics import RequestMetricsMiddleware
+from utils.sampling_profiler import sampling_profiler, SAMPLING_PROFILER_ENABLED
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -25,6 +30,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency, payload size, status code and in-flight metrics (added last, so it wraps CORS too)
+app.add_middleware(RequestMetricsMiddleware)
+
 # Include the routers
 app.include_router(snowflake_router.router)
 app.include_router(s3_router.router)
@@ -35,3 +43,36 @@ app.include_router(rag_router.router)
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the Document Exploration API"}
+
+# Prometheus scrape endpoint: per-route request metrics, per-stage and per-remote-call latency
+# histograms and item counters
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(content=metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+# Sampling profiler toggle, only served when SAMPLING_PROFILER_ENABLED=1
+def require_profiler():
+    if not SAMPLING_PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+@app.post("/debug/profiler/start", include_in_schema=False)
+def start_profiler(interval_ms: Optional[float] = None):
+    require_profiler()
+    if not sampling_profiler.start(interval_ms / 1000 if interval_ms else None):
+        raise HTTPException(status_code=409, detail="The profiler is already running")
+    return sampling_profiler.stats()
+
+@app.post("/debug/profiler/stop", include_in_schema=False)
+def stop_profiler():
+    require_profiler()
+    sampling_profiler.stop()
+    return sampling_profiler.stats()
+
+@app.get("/debug/profiler", include_in_schema=False)
+def get_profile(limit: int = 200, format: str = "json"):
+    """Samples of the current or last session: JSON with the top stacks, or `format=collapsed` for flame graphs."""
+    require_profiler()
+    if format == "collapsed":
+        return PlainTextResponse(sampling_profiler.collapsed(limit))
+    stacks = [{"stack": stack, "samples": samples} for stack, samples in sampling_profiler.top_stacks(limit)]
+    return {"stats": sampling_profiler.stats(), "stacks": stacks}
@@ -2,17 +2,25 @@
 
 import boto3
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from pinecone import Pinecone, ServerlessSpec
 from llama_index.core import Settings, VectorStoreIndex, StorageContext
 from llama_index.core.node_parser import SentenceSplitter
-from llama_index.embeddings.nvidia import NVIDIAEmbedding
-from llama_index.llms.nvidia import NVIDIA
 from utils.pdf_processor import get_pdf_documents
-from utils.helper_functions import set_environment_variables, clear_cache_directory
-from llama_index.vector_stores.pinecone import PineconeVectorStore
-from io import BytesIO
+from utils.helper_functions import set_environment_variables
+from utils.ingestion_cache import ingestion_cache, compute_cache_key
+from utils.embedding_pipeline import EMBED_MAX_BATCH_SIZE
+from utils.vector_store import collection_exists, get_vector_store, refresh_collection_registry
+from utils.incremental_index import chunk_id, stamp_chunk_hashes, sync_collection
+from utils.query_engine_cache import query_engine_cache
+from utils.ingestion_jobs import ingestion_jobs
+from utils.scratch_space import scratch_space, ScratchQuotaExceeded, SCRATCH_RESERVATION_FACTOR
+from utils.concurrency import run_blocking, iterate_blocking
+from utils.memory_usage import MemoryTracker
+from utils.instrumentation import stage_span, remote_call_span, ingestion_context, count
+from utils.nvidia_client import get_llm, get_embedding_model, get_query_embedding_model
 import os
+import json
 import requests
 
 # Set up router
@@ -24,21 +32,25 @@ router = APIRouter(
 # Initialize environment variables
 set_environment_variables()
 
-# Initialize Pinecone
-pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+# Downloads larger than this are rejected; PDFs are held in memory for the whole ingestion
+MAX_PDF_BYTES = int(os.getenv("MAX_PDF_BYTES", str(200 * 1024 ** 2)))
+PDF_DOWNLOAD_CHUNK_BYTES = 1024 ** 2
+PDF_DOWNLOAD_TIMEOUT_SECONDS = float(os.getenv("PDF_DOWNLOAD_TIMEOUT_SECONDS", "60"))
 
-# Specify directory for saving the temporary files
-CACHE_DIR = "./.cache"
-TMP_DIR = os.path.join(CACHE_DIR, "tmp")
-
-# Create the directories if they don't exist
-os.makedirs(TMP_DIR, exist_ok=True)
+# Model and chunking settings (also part of the ingestion cache key)
+EMBED_MODEL_NAME = "nvidia/nv-embedqa-e5-v5"
+CHUNK_SIZE = 650
 
 # Data model to receive PDF link and ID
 class PDFLink(BaseModel):
     pdf_link: str
     pdf_id: str
 
+class IngestionJobRequest(BaseModel):
+    pdf_link: str
+    pdf_id: str
+    reload: bool = False
+
 class QueryRequest(BaseModel):
     question: str
     pdf_id: str
@@ -51,144 +63,273 @@ class ReportRequest(BaseModel):
     research_notes: str 
 
 @router.get("/check-index")
-async def check_index(pdf_id: str):
-    """Check if an index exists for the given PDF ID in Pinecone."""
+async def check_index(pdf_id: str, refresh: bool = False):
+    """
+    Check if an index exists for the given PDF ID in Pinecone.
+
+    Answers come from the cached index registry; pass `refresh=true` to force a lookup.
+    """
     try:
-        index_name = f"pdf-index-{pdf_id}"
-        if index_name in pc.list_indexes().names():
+        if refresh:
+            await run_blocking(refresh_collection_registry)
+        if await run_blocking(collection_exists, "pdf-index", pdf_id):
             return {"index_exists": True}
         else:
             return {"index_exists": False}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error checking index: {str(e)}")
 
+# Settings are process-wide and point at the shared, pooled NVIDIA clients
+_settings_initialized = False
+
 def initialize_settings():
-    Settings.embed_model = NVIDIAEmbedding(model="nvidia/nv-embedqa-e5-v5", truncate="END")
-    Settings.llm = NVIDIA(model="nvidia/llama-3.1-nemotron-51b-instruct")
-    Settings.text_splitter = SentenceSplitter(chunk_size=650)
-
-def create_index(documents, pdf_id):
-    index_name = f"pdf-index-{pdf_id}"
-
-    if index_name not in pc.list_indexes().names():
-        pc.create_index(
-            name=index_name,
-            dimension=1024,
-            metric="cosine",
-            spec=ServerlessSpec(cloud="aws", region="us-east-1")
-        )
-    
-    vector_store = PineconeVectorStore(index_name=index_name)
-    
-    # Create a storage context without specifying persist_dir if not needed locally
+    global _settings_initialized
+    if _settings_initialized:
+        return
+    Settings.embed_model = get_query_embedding_model(EMBED_MODEL_NAME, embed_batch_size=EMBED_MAX_BATCH_SIZE)
+    Settings.llm = get_llm("nvidia/llama-3.1-nemotron-51b-instruct")
+    Settings.text_splitter = SentenceSplitter(chunk_size=CHUNK_SIZE, id_func=chunk_id)
+    _settings_initialized = True
+
+def load_index(index_type, pdf_id):
+    """Load a LlamaIndex handle on top of an existing collection."""
+    vector_store = get_vector_store(index_type, pdf_id)
     storage_context = StorageContext.from_defaults(vector_store=vector_store)
-    
-    # Create the index directly in Pinecone
-    index = VectorStoreIndex.from_documents(documents, storage_context=storage_context)
-    
-    return index
-
-def delete_existing_index(pdf_id):
-    index_name = f"pdf-index-{pdf_id}"
-    if index_name in pc.list_indexes().names():
-        pc.delete_index(index_name)
-
-@router.post("/process-pdf")
-async def process_pdf_link(data: PDFLink):
-    """Process a given PDF link, create an index, and return success message."""
-    try:
-        pdf_id = str(data.pdf_id)
+    return VectorStoreIndex.from_vector_store(
+        vector_store=vector_store,
+        storage_context=storage_context
+    )
+
+def get_query_engine(index_type, pdf_id, **engine_kwargs):
+    """Return a cached query engine for a collection, loading the index on first use."""
+    return query_engine_cache.get_query_engine(
+        index_type, pdf_id, lambda: load_index(index_type, pdf_id), **engine_kwargs
+    )
+
+def build_nodes(documents):
+    """Split documents into chunks with stable ids and hashes; embedding is left to `update_index`."""
+    with stage_span("split", documents=len(documents)):
+        nodes = Settings.text_splitter.get_nodes_from_documents(documents)
+        stamp_chunk_hashes(nodes, EMBED_MODEL_NAME)
+    count("chunks", len(nodes))
+    return nodes
+
+def update_index(nodes, pdf_id, progress=None):
+    """
+    Bring the PDF's index (or namespace) up to date, writing only new, changed and removed chunks.
 
-        # Clear the entire cache directory before processing
-        clear_cache_directory(CACHE_DIR)
-        
-        # Ensure the temporary directory exists
-        os.makedirs(TMP_DIR, exist_ok=True)
+    Only chunks whose hash is new or changed (and that carry no embedding yet) are embedded.
+    """
+    # sync_collection embeds through embed_nodes, which retries failed batches itself
+    embed_model = get_embedding_model(EMBED_MODEL_NAME, embed_batch_size=EMBED_MAX_BATCH_SIZE, max_retries=0)
+    stats = sync_collection("pdf-index", pdf_id, nodes, embed_model=embed_model, progress=progress)
+    if stats["upserted"] or stats["deleted"]:
+        query_engine_cache.invalidate("pdf-index", pdf_id)
+    return stats
+
+def download_pdf(pdf_link):
+    """
+    Stream a PDF into an in-memory buffer, rejecting it as soon as it exceeds `MAX_PDF_BYTES`.
 
-        # Download and process the PDF document
-        response = requests.get(data.pdf_link)
+    The buffer is returned as a bytearray and is never written to disk; PyMuPDF,
+    the cache key and the page workers all read it directly.
+    """
+    with requests.get(pdf_link, stream=True, timeout=PDF_DOWNLOAD_TIMEOUT_SECONDS) as response:
         if response.status_code != 200:
             raise HTTPException(status_code=400, detail="Unable to download the PDF document.")
 
-        pdf_content = response.content
-        if not pdf_content:
-            raise HTTPException(status_code=400, detail="Downloaded PDF is empty.")
-
-        # Save the downloaded PDF as a temporary file in the 'tmp' directory
-        pdf_file_path = os.path.join(TMP_DIR, f"temp_selected_pub_{pdf_id}.pdf")
-        try:
-            with open(pdf_file_path, "wb") as pdf_file:
-                pdf_file.write(pdf_content)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error saving the PDF locally: {str(e)}")
-
-        # Process the saved PDF document
-        try:
-            documents = get_pdf_documents(open(pdf_file_path, "rb"))
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error processing the saved PDF: {str(e)}")
-
-        if not documents:
-            raise HTTPException(status_code=500, detail="Failed to process the PDF document.")
+        content_length = int(response.headers.get("Content-Length") or 0)
+        if content_length > MAX_PDF_BYTES:
+            raise HTTPException(status_code=413, detail=f"PDF is larger than the {MAX_PDF_BYTES} byte limit.")
 
-        # Delete existing index if it exists
-        delete_existing_index(pdf_id)
+        pdf_content = bytearray()
+        for chunk in response.iter_content(chunk_size=PDF_DOWNLOAD_CHUNK_BYTES):
+            pdf_content += chunk
+            if len(pdf_content) > MAX_PDF_BYTES:
+                raise HTTPException(status_code=413, detail=f"PDF is larger than the {MAX_PDF_BYTES} byte limit.")
 
-        # Create the index using the processed documents
-        initialize_settings()
-        create_index(documents, pdf_id)
+    if not pdf_content:
+        raise HTTPException(status_code=400, detail="Downloaded PDF is empty.")
+    return pdf_content
 
-        return {"message": "PDF processed and index created successfully!"}
-    except HTTPException as e:
-        raise e
+def parse_and_split(pdf_content, pdf_id, scratch_dir, progress):
+    """Parse an in-memory PDF, writing its artifacts to a scratch directory, and return its documents and chunked nodes."""
+    try:
+        documents = get_pdf_documents(
+            pdf_content, f"publication_{pdf_id}.pdf", os.path.join(scratch_dir, "artifacts"), progress=progress
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing the PDF: {str(e)}")
 
-@router.post("/reload-pdf")
-async def reload_pdf(data: PDFLink):
-    """Force reprocessing of a given PDF link, create a fresh index, and return success message."""
-    try:
-        pdf_id = data.pdf_id
+    if not documents:
+        raise HTTPException(status_code=500, detail="Failed to process the PDF document.")
 
-        # Clear the entire cache directory before processing
-        clear_cache_directory(CACHE_DIR)
-        
-        # Ensure the temporary directory exists
-        os.makedirs(TMP_DIR, exist_ok=True)
-        
-        # Delete existing index if it exists
-        delete_existing_index(pdf_id)
-        
-        # Reprocess and create a new index
-        response = requests.get(data.pdf_link)
-        if response.status_code != 200:
-            raise HTTPException(status_code=400, detail="Unable to download the PDF document.")
+    return documents, build_nodes(documents)
 
-        pdf_content = response.content
-        pdf_file = BytesIO(pdf_content)
-        pdf_file.name = f"temp_selected_pub_{pdf_id}.pdf"
+def _no_progress(stage, done=0, total=0):
+    pass
 
-        pdf_file_path = os.path.join(TMP_DIR, f"temp_selected_pub_{pdf_id}.pdf")
+def ingest_pdf(pdf_link, pdf_id, use_cache=True, progress=None):
+    """
+    Download and parse a PDF, then bring its index up to date.
 
-        with open(pdf_file_path, "wb") as f:
-            f.write(pdf_content)
+    Chunked nodes are stored in the content-addressed ingestion cache, so an unchanged
+    PDF is only parsed once; only chunks that are new or changed in the index are
+    embedded. Parsing happens in a private scratch directory, so several PDFs can be
+    ingested at once. Set `use_cache=False` to bypass the lookup and force a fresh parse.
+    If given, `progress(stage, done, total)` is called as each stage of the pipeline advances.
 
-        documents = get_pdf_documents(open(pdf_file_path, "rb"))
-        if not documents:
-            raise HTTPException(status_code=500, detail="Failed to process the PDF document.")
+    Returns the PDF size, whether the cache was hit and the peak RSS reached during the ingestion.
+    """
+    if progress is None:
+        progress = _no_progress
+
+    with ingestion_context(pdf_id), stage_span("ingest", use_cache=use_cache), MemoryTracker() as memory:
+        stats = _ingest_pdf(pdf_link, pdf_id, use_cache, progress)
+    stats.update(memory.stats())
+    print(f"Ingested PDF {pdf_id} ({stats['pdf_bytes']} bytes, cache hit: {stats['cache_hit']}): "
+          f"peak RSS {stats['peak_rss_bytes'] / 1024 ** 2:.0f} MiB "
+          f"(+{stats['peak_rss_growth_bytes'] / 1024 ** 2:.0f} MiB), "
+          f"page workers {stats['page_workers_peak_rss_bytes'] / 1024 ** 2:.0f} MiB")
+    return stats
+
+def _ingest_pdf(pdf_link, pdf_id, use_cache, progress):
+    # Download the PDF document straight into memory
+    progress("download", 0, 1)
+    with stage_span("download"):
+        pdf_content = download_pdf(pdf_link)
+    progress("download", 1, 1)
+
+    initialize_settings()
+    # Node ids and source metadata are derived from the pdf_id, so identical bytes uploaded
+    # under another ID must not reuse this entry
+    cache_key = compute_cache_key(pdf_content, EMBED_MODEL_NAME, f"chunk_size={CHUNK_SIZE}", f"pdf_id={pdf_id}")
+    cached = ingestion_cache.get(cache_key) if use_cache else None
+
+    if cached is not None:
+        print(f"Ingestion cache hit for PDF {pdf_id} ({cache_key[:12]})")
+        nodes = cached
+    else:
+        try:
+            with scratch_space.scratch_dir(expected_bytes=len(pdf_content) * SCRATCH_RESERVATION_FACTOR) as scratch_dir:
+                _, nodes = parse_and_split(pdf_content, pdf_id, scratch_dir, progress)
+        except ScratchQuotaExceeded as e:
+            raise HTTPException(status_code=503, detail=f"Too many PDFs are being processed, please retry later: {str(e)}")
+
+    # Update the index in place: only new or changed chunks are upserted and removed ones deleted
+    progress("index", 0, len(nodes))
+    with stage_span("index", chunks=len(nodes)):
+        index_stats = update_index(nodes, pdf_id, progress=progress)
+    progress("index", len(nodes), len(nodes))
+    if cached is None or index_stats["upserted"]:
+        # Stored after indexing, so the entry keeps the embeddings computed by this run
+        ingestion_cache.put(cache_key, nodes)
+    return {"pdf_bytes": len(pdf_content), "cache_hit": cached is not None, "index": index_stats}
+
+def submit_ingestion(pdf_link, pdf_id, reload=False):
+    """Queue an ingestion job for a PDF, or return the queued or running job it is deduplicated onto."""
+    return ingestion_jobs.submit(
+        pdf_id,
+        pdf_link,
+        lambda progress: ingest_pdf(pdf_link, pdf_id, use_cache=not reload, progress=progress),
+        reload=reload
+    )
+
+async def ingest_and_wait(pdf_link, pdf_id, reload=False):
+    """Run an ingestion through the job queue, so it is serialized with other jobs for the PDF, and return its stats."""
+    try:
+        job = await ingestion_jobs.wait(submit_ingestion(pdf_link, pdf_id, reload=reload)["job_id"])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error submitting the ingestion job: {str(e)}")
+    if job["status"] != "succeeded":
+        raise HTTPException(status_code=job["error_status"] or 500, detail=job["error"] or "Ingestion failed.")
+    return job["result"]
 
-        initialize_settings()
-        create_index(documents, pdf_id)
+@router.post("/process-pdf")
+async def process_pdf_link(data: PDFLink):
+    """Process a given PDF link, create an index, and return success message once the ingestion job has finished."""
+    stats = await ingest_and_wait(data.pdf_link, str(data.pdf_id))
+    return {"message": "PDF processed and index created successfully!", "stats": stats}
 
-        return {"message": "PDF reprocessed and index created successfully!"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error reprocessing the PDF: {str(e)}")
+@router.post("/reload-pdf")
+async def reload_pdf(data: PDFLink):
+    """Force reprocessing of a given PDF link, create a fresh index, and return success message once the reload job has finished."""
+    stats = await ingest_and_wait(data.pdf_link, str(data.pdf_id), reload=True)
+    return {"message": "PDF reprocessed and index created successfully!", "stats": stats}
+
+@router.post("/jobs")
+async def submit_ingestion_job(data: IngestionJobRequest):
+    """
+    Queue a PDF for background ingestion and return its job id immediately.
 
-@router.post("/query")
+    Concurrent submissions for the same PDF ID return the job that is already queued or running;
+    a reload is only deduplicated onto another reload and otherwise runs after the current job.
+    """
+    try:
+        return submit_ingestion(data.pdf_link, str(data.pdf_id), reload=data.reload)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error submitting the ingestion job: {str(e)}")
+
+@router.get("/jobs/{job_id}")
+async def get_ingestion_job(job_id: str):
+    """Return the status and per-stage progress of an ingestion job."""
+    job = ingestion_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingestion job not found.")
+    return job
+
+def ensure_index_exists(index_type, pdf_id):
+    """Raise a 404 if a collection has not been indexed (warm cache entries skip the lookup)."""
+    if query_engine_cache.contains(index_type, pdf_id) or collection_exists(index_type, pdf_id):
+        return
+    if index_type == "research-notes":
+        raise HTTPException(status_code=404, detail="Research notes index not found. Please save research notes first.")
+    raise HTTPException(status_code=404, detail="Full document index not found for the provided PDF ID.")
+
+def answer_query(data: QueryRequest):
+    """Retrieve and generate an answer for a question; blocking, so it runs on the I/O pool."""
+    # Initialize global settings or configurations
+    initialize_settings()
+
+    # Check if the specified index exists in Pinecone
+    ensure_index_exists(data.index_type, data.pdf_id)
+
+    # Get a (cached) query engine with specified similarity settings and response mode
+    query_engine = get_query_engine(
+        data.index_type,
+        data.pdf_id,
+        similarity_top_k=5,
+        streaming=False,
+        response_mode="tree_summarize"  # This encourages more complete responses
+    )
+
+    # Modify the prompt to encourage a complete sentence answer
+    enhanced_prompt = f"Please provide a complete sentence answer to the following question: {data.question}"
+
+    # Query the index with the enhanced prompt
+    response = query_engine.query(enhanced_prompt)
+
+    # Extract the answer text
+    answer = getattr(response, "response")
+
+    # Post-process the answer to ensure it's a complete sentence
+    if not answer.endswith(('.', '!', '?')):
+        answer += '.'
+
+    # If the answer doesn't seem to be a complete sentence, prepend context
+    if not answer[0].isupper() or len(answer.split()) < 3:
+        answer = f"The answer to your question is: {answer}"
+
+    return {"answer": answer}
+
+@router.post("/query", deprecated=True)
 async def query_index(data: QueryRequest):
     """
     Query the index with a question and return an answer.
 
+    Deprecated: the frontend streams answers from `/rag/query-stream`. This endpoint waits for
+    the complete answer and is only kept for scripts and load tests that need a single JSON response.
+
     Args:
         data (QueryRequest): Contains the PDF ID, the question to be queried, and the index type.
 
@@ -196,104 +337,110 @@ async def query_index(data: QueryRequest):
         dict: A dictionary containing the answer to the question.
     """
     try:
-        # Initialize global settings or configurations
-        initialize_settings()
-        
-        # Determine the index name based on the query mode
-        index_name = f"{data.index_type}-{data.pdf_id}"
-
-        # Check if the specified index exists in Pinecone
-        if index_name not in pc.list_indexes().names():
-            if data.index_type == "research-notes":
-                raise HTTPException(status_code=404, detail="Research notes index not found. Please save research notes first.")
-            else:
-                raise HTTPException(status_code=404, detail="Full document index not found for the provided PDF ID.")
-        
-        # Set up the vector store and storage context
-        vector_store = PineconeVectorStore(index_name=index_name)
-        storage_context = StorageContext.from_defaults(vector_store=vector_store)
-
-        # Load the index using the storage context
-        index = VectorStoreIndex.from_vector_store(
-            vector_store=vector_store,
-            storage_context=storage_context
-        )
+        # Retrieval and generation block, so they run off the event loop
+        return await run_blocking(answer_query, data)
+    except HTTPException as http_err:
+        # Handle known HTTP exceptions separately
+        raise http_err
+    except Exception as e:
+        # Handle unexpected exceptions with a generic message
+        raise HTTPException(status_code=500, detail=f"Error querying the index: {str(e)}")
+    
+def format_sse_event(data, event=None):
+    """Format a Server-Sent Events message with a JSON payload."""
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
 
-        # Create a query engine with specified similarity settings and response mode
-        query_engine = index.as_query_engine(
-            similarity_top_k=5,
-            streaming=False,
-            response_mode="tree_summarize"  # This encourages more complete responses
-        )
-        
-        # Modify the prompt to encourage a complete sentence answer
-        enhanced_prompt = f"Please provide a complete sentence answer to the following question: {data.question}"
-        
-        # Query the index with the enhanced prompt
-        response = query_engine.query(enhanced_prompt)
+def start_streaming_query(data: QueryRequest):
+    """Run retrieval for a streamed answer and return the response whose generator yields tokens."""
+    initialize_settings()
 
-        # Extract the answer text
-        answer = getattr(response, "response")
+    # Check if the specified index exists before the stream starts, so a 404 can still be returned
+    ensure_index_exists(data.index_type, data.pdf_id)
 
-        # Post-process the answer to ensure it's a complete sentence
-        if not answer.endswith(('.', '!', '?')):
-            answer += '.'
+    query_engine = get_query_engine(
+        data.index_type,
+        data.pdf_id,
+        similarity_top_k=5,
+        streaming=True,
+        response_mode="tree_summarize"
+    )
 
-        # If the answer doesn't seem to be a complete sentence, prepend context
-        if not answer[0].isupper() or len(answer.split()) < 3:
-            answer = f"The answer to your question is: {answer}"
+    enhanced_prompt = f"Please provide a complete sentence answer to the following question: {data.question}"
 
-        # Return the enhanced answer
-        return {"answer": answer}
-        
+    # Retrieval happens here; generation is deferred to the token generator
+    return query_engine.query(enhanced_prompt)
+
+@router.post("/query-stream")
+async def query_index_stream(data: QueryRequest):
+    """
+    Query the index with a question and stream the answer as Server-Sent Events.
+
+    Each token is sent as a `data: {"token": ...}` event as soon as the LLM produces it,
+    followed by a final `event: done`. Errors after the stream has started are sent as
+    an `event: error` message, since the status code has already been sent.
+    """
+    try:
+        streaming_response = await run_blocking(start_streaming_query, data)
     except HTTPException as http_err:
-        # Handle known HTTP exceptions separately
         raise http_err
     except Exception as e:
-        # Handle unexpected exceptions with a generic message
         raise HTTPException(status_code=500, detail=f"Error querying the index: {str(e)}")
-    
-@router.post("/generate-report")
-async def generate_report(data: ReportRequest):
-    try:
-        initialize_settings()
-        
-        index_name = f"{data.index_type}-{data.pdf_id}"
 
-        if index_name not in pc.list_indexes().names():
-            raise HTTPException(status_code=404, detail="Index not found for the provided PDF ID.")
-        
-        vector_store = PineconeVectorStore(index_name=index_name)
-        storage_context = StorageContext.from_defaults(vector_store=vector_store)
+    async def event_stream():
+        answer = ""
+        try:
+            # Each blocking read of the token generator runs on the I/O pool
+            async for token in iterate_blocking(iter(streaming_response.response_gen)):
+                answer += token
+                yield format_sse_event({"token": token})
+            # Same post-processing as /rag/query, applied to the end of the streamed answer
+            if answer and not answer.rstrip().endswith(('.', '!', '?')):
+                yield format_sse_event({"token": "."})
+            yield format_sse_event({}, event="done")
+        except Exception as e:
+            yield format_sse_event({"detail": f"Error querying the index: {str(e)}"}, event="error")
 
-        index = VectorStoreIndex.from_vector_store(
-            vector_store=vector_store,
-            storage_context=storage_context
-        )
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-        query_engine = index.as_query_engine(similarity_top_k=5, streaming=False)
-        
-        # Generate a summary of the conversation
-        conversation_summary = "\n".join([f"{msg['role']}: {msg['content']}" for msg in data.conversation])
-        summary_prompt = f"Summarize the following conversation in brief and provide key insights:\n\n{conversation_summary}"
-        summary_response = query_engine.query(summary_prompt)
-        summary = getattr(summary_response, "response")
-
-        # Generate an explanation of the conversation
-        explanation_prompt = "Explain the main topics in brief discussed in the conversation and why they are important and site sources as validation."
-        explanation_response = query_engine.query(explanation_prompt)
-        explanation = getattr(explanation_response, "response")
-
-        # Fetch research notes
-        research_notes = data.research_notes
-
-        report = {
-            "summary": summary,
-            "explanation": explanation,
-            "research_notes": research_notes,
-            "conversation": data.conversation
-        }
+def build_report(data: ReportRequest):
+    """Summarize and explain a conversation with the index; blocking, so it runs on the I/O pool."""
+    initialize_settings()
+
+    if not query_engine_cache.contains(data.index_type, data.pdf_id) and not collection_exists(data.index_type, data.pdf_id):
+        raise HTTPException(status_code=404, detail="Index not found for the provided PDF ID.")
+
+    query_engine = get_query_engine(data.index_type, data.pdf_id, similarity_top_k=5, streaming=False)
+
+    # Generate a summary of the conversation
+    conversation_summary = "\n".join([f"{msg['role']}: {msg['content']}" for msg in data.conversation])
+    summary_prompt = f"Summarize the following conversation in brief and provide key insights:\n\n{conversation_summary}"
+    summary_response = query_engine.query(summary_prompt)
+    summary = getattr(summary_response, "response")
 
+    # Generate an explanation of the conversation
+    explanation_prompt = "Explain the main topics in brief discussed in the conversation and why they are important and site sources as validation."
+    explanation_response = query_engine.query(explanation_prompt)
+    explanation = getattr(explanation_response, "response")
+
+    # Fetch research notes
+    research_notes = data.research_notes
+
+    return {
+        "summary": summary,
+        "explanation": explanation,
+        "research_notes": research_notes,
+        "conversation": data.conversation
+    }
+
+@router.post("/generate-report")
+async def generate_report(data: ReportRequest):
+    try:
+        report = await run_blocking(build_report, data)
         return {"report": report}
         
     except HTTPException as http_err:
@@ -309,8 +456,9 @@ def fetch_research_notes(pdf_id: str):
         
         print(f"Attempting to fetch research notes with key: {notes_key}")  # Debug log
         
-        response = s3_client.get_object(Bucket=bucket_name, Key=notes_key)
-        notes_content = response['Body'].read().decode('utf-8')
+        with remote_call_span("s3.get_object"):
+            response = s3_client.get_object(Bucket=bucket_name, Key=notes_key)
+            notes_content = response['Body'].read().decode('utf-8')
         print(f"Fetched research notes: {notes_content[:100]}...")  # Debug log (first 100 chars)
         return notes_content
     except Exception as e:
@@ -5,11 +5,15 @@ from pydantic import BaseModel
 import boto3
 from botocore.exceptions import NoCredentialsError, ClientError
 import os
-from pinecone import Pinecone, ServerlessSpec
-from llama_index.embeddings.nvidia import NVIDIAEmbedding
-from llama_index.vector_stores.pinecone import PineconeVectorStore
-from llama_index.core import Settings, StorageContext, Document, VectorStoreIndex 
+from llama_index.core import Settings, Document
 from llama_index.core.node_parser import SentenceSplitter
+from utils.embedding_pipeline import EMBED_MAX_BATCH_SIZE
+from utils.vector_store import get_collection_name
+from utils.incremental_index import chunk_id, stamp_chunk_hashes, assign_content_ids, sync_collection
+from utils.query_engine_cache import query_engine_cache
+from utils.concurrency import run_blocking
+from utils.nvidia_client import get_embedding_model, get_query_embedding_model
+from utils.instrumentation import stage_span, ingestion_context
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -20,9 +24,6 @@ router = APIRouter(
     tags=["S3"]
 )
 
-# Initialize Pinecone client
-pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-
 # Initialize S3 client using environment variables
 s3_client = boto3.client(
     's3',
@@ -39,38 +40,32 @@ class SaveNotesRequest(BaseModel):
     notes: str
     pdf_id: str
 
+NOTES_EMBED_MODEL_NAME = "nvidia/nv-embedqa-e5-v5"
+
 # Initialize LLM and embeddings settings for indexing notes
 def initialize_settings_for_notes():
-    Settings.embed_model = NVIDIAEmbedding(model="nvidia/nv-embedqa-e5-v5", truncate="END")
-    Settings.text_splitter = SentenceSplitter(chunk_size=650)
+    Settings.embed_model = get_query_embedding_model(NOTES_EMBED_MODEL_NAME, embed_batch_size=EMBED_MAX_BATCH_SIZE)
+    Settings.text_splitter = SentenceSplitter(chunk_size=650, id_func=chunk_id)
 
 def create_or_update_index_for_notes(notes, pdf_id):
-    index_name = f"research-notes-{pdf_id}"
-
-    # Delete the index if it already exists (overwrite behavior)
-    if index_name in pc.list_indexes().names():
-        pc.delete_index(index_name)
-
-    # Create a new index
-    pc.create_index(
-        name=index_name,
-        dimension=1024,
-        metric="cosine",
-        spec=ServerlessSpec(cloud="aws", region="us-east-1")
-    )
-
-    vector_store = PineconeVectorStore(index_name=index_name)
-
-    # Create a storage context without specifying persist_dir if not needed locally
-    storage_context = StorageContext.from_defaults(vector_store=vector_store)
-
-    # Create a document from the notes
-    document = Document(text=notes)
-
-    # Create or update the index directly in Pinecone
-    index = VectorStoreIndex.from_documents([document], storage_context=storage_context)
-
-    return index
+    # Split the notes into chunks with content hashes and ids derived from them, so an edit
+    # only re-embeds the chunks it touches even when it shifts the chunks after it
+    collection_name = get_collection_name("research-notes", pdf_id)
+    document = Document(text=notes, id_=collection_name)
+    nodes = Settings.text_splitter.get_nodes_from_documents([document]) if notes.strip() else []
+    stamp_chunk_hashes(nodes, NOTES_EMBED_MODEL_NAME)
+    assign_content_ids(nodes, collection_name)
+
+    # Embed and upsert only the chunks that changed since the last save, and delete removed ones
+    with ingestion_context(pdf_id), stage_span("notes_index", chunks=len(nodes)):
+        # sync_collection embeds through embed_nodes, which retries failed batches itself
+        ingestion_embed_model = get_embedding_model(NOTES_EMBED_MODEL_NAME, embed_batch_size=EMBED_MAX_BATCH_SIZE, max_retries=0)
+        stats = sync_collection("research-notes", pdf_id, nodes, embed_model=ingestion_embed_model)
+
+    # Cached query engines still point at the previous notes
+    if stats["upserted"] or stats["deleted"]:
+        query_engine_cache.invalidate("research-notes", pdf_id)
+    return stats
 
 @router.get("/fetch-image/{file_key:path}")
 async def fetch_image_from_s3(file_key: str):
@@ -83,7 +78,7 @@ async def fetch_image_from_s3(file_key: str):
 
         # Check if the file exists in S3 by trying to get its metadata
         try:
-            s3_client.head_object(Bucket=bucket_name, Key=file_key)
+            await run_blocking(s3_client.head_object, Bucket=bucket_name, Key=file_key)
         except ClientError as e:
             if e.response['Error']['Code'] == "404":
                 raise HTTPException(status_code=404, detail="File not found in S3 bucket")
@@ -91,7 +86,8 @@ async def fetch_image_from_s3(file_key: str):
                 raise HTTPException(status_code=500, detail="Error checking file existence")
 
         # Generate a pre-signed URL to access the image if it exists
-        image_url = s3_client.generate_presigned_url(
+        image_url = await run_blocking(
+            s3_client.generate_presigned_url,
             'get_object',
             Params={'Bucket': bucket_name, 'Key': file_key},
             ExpiresIn=3600  # URL expiration time in seconds
@@ -112,7 +108,7 @@ async def fetch_pdf_from_s3(file_key: str):
 
         # Check if the file exists in S3 by trying to get its metadata
         try:
-            s3_client.head_object(Bucket=bucket_name, Key=file_key)
+            await run_blocking(s3_client.head_object, Bucket=bucket_name, Key=file_key)
         except ClientError as e:
             if e.response['Error']['Code'] == "404":
                 raise HTTPException(status_code=404, detail="PDF file not found in S3 bucket")
@@ -120,7 +116,8 @@ async def fetch_pdf_from_s3(file_key: str):
                 raise HTTPException(status_code=500, detail="Error checking PDF file existence")
 
         # Generate a pre-signed URL to access the PDF if it exists
-        pdf_url = s3_client.generate_presigned_url(
+        pdf_url = await run_blocking(
+            s3_client.generate_presigned_url,
             'get_object',
             Params={'Bucket': bucket_name, 'Key': file_key},
             ExpiresIn=3600  # URL expiration time in seconds
@@ -141,7 +138,7 @@ async def fetch_summary_from_s3(file_key: str):
 
         # Check if the file exists in S3 by trying to get its metadata and last modified timestamp
         try:
-            head_response = s3_client.head_object(Bucket=bucket_name, Key=file_key)
+            head_response = await run_blocking(s3_client.head_object, Bucket=bucket_name, Key=file_key)
         except ClientError as e:
             if e.response['Error']['Code'] == "404":
                 raise HTTPException(status_code=404, detail="Summary file not found in S3 bucket")
@@ -153,7 +150,8 @@ async def fetch_summary_from_s3(file_key: str):
         last_modified_str = last_modified.strftime("%Y-%m-%dT%H:%M:%S.%fZ") if last_modified else None
 
         # Generate a pre-signed URL to access the summary file if it exists
-        summary_url = s3_client.generate_presigned_url(
+        summary_url = await run_blocking(
+            s3_client.generate_presigned_url,
             'get_object',
             Params={'Bucket': bucket_name, 'Key': file_key},
             ExpiresIn=3600  # URL expiration time in seconds
@@ -182,8 +180,8 @@ async def fetch_research_notes(pdf_link: str):
 
         # Check if the notes file exists in S3 by trying to get its metadata
         try:
-            response = s3_client.get_object(Bucket=bucket_name, Key=notes_key)
-            notes_content = response['Body'].read().decode('utf-8')
+            response = await run_blocking(s3_client.get_object, Bucket=bucket_name, Key=notes_key)
+            notes_content = (await run_blocking(response['Body'].read)).decode('utf-8')
             return {"notes": notes_content}
         except ClientError as e:
             if e.response['Error']['Code'] == "NoSuchKey":
@@ -209,11 +207,12 @@ async def save_research_notes(request: SaveNotesRequest):
         notes_key = f"research_notes/{base_file_name}.txt"
         
         # Upload the notes content to S3
-        s3_client.put_object(Bucket=bucket_name, Key=notes_key, Body=request.notes.encode('utf-8'))
+        await run_blocking(s3_client.put_object, Bucket=bucket_name, Key=notes_key, Body=request.notes.encode('utf-8'))
 
-        # Create or update an index for research notes in Pinecone
+        # Update the research-notes index in place; only edited chunks are re-embedded, so this
+        # runs on the I/O pool instead of queueing behind PDF ingestions
         initialize_settings_for_notes()
-        create_or_update_index_for_notes(request.notes, request.pdf_id)
+        await run_blocking(create_or_update_index_for_notes, request.notes, request.pdf_id)
 
         return {"message": "Research notes saved and indexed successfully."}
 
@@ -1,11 +1,17 @@
 # fast_api/routers/snowflake_router.py
 
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Request, Header, Query
+from fastapi.responses import Response
+from fastapi.encoders import jsonable_encoder
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel
-import snowflake.connector
-from datetime import datetime
+from datetime import date, datetime
 import os
+import json
+import base64
+from utils.concurrency import run_blocking
+from utils.snowflake_pool import snowflake_pool
+from utils.publications_cache import publications_cache, etag_matches
 
 router = APIRouter(
     prefix="/snowflake",
@@ -23,56 +29,207 @@ class Publication(BaseModel):
     RESEARCH_NOTES: str = None
     CREATED_DATE: datetime = None  # Changed to datetime
 
+class PublicationPage(BaseModel):
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
 
-# Snowflake connection setup (fetch credentials from environment variables)
-def get_snowflake_connection():
+
+# Clients revalidate with If-None-Match on every load; unchanged responses are answered with 304
+PUBLICATIONS_CACHE_CONTROL = "no-cache"
+
+# When set, POST /snowflake/publications/invalidate requires this value in X-Invalidation-Token
+CACHE_INVALIDATION_TOKEN = os.getenv("CACHE_INVALIDATION_TOKEN")
+
+PUBLICATIONS_TABLE = "DB_CFA_PUBLICATIONS.CFA_PUBLICATIONS.PUBLICATION_LIST"
+
+# Columns in the order of the `Publication` model (and of the row indices in `publication_from_row`)
+PUBLICATION_COLUMNS = ("ID", "TITLE", "BRIEF_SUMMARY", "DATE", "AUTHOR", "IMAGE_LINK", "PDF_LINK", "RESEARCH_NOTES", "CREATED_DATE")
+
+# The list endpoint returns only what the grid needs unless `fields` asks for more
+PUBLICATION_LIST_DEFAULT_FIELDS = ("ID", "TITLE", "IMAGE_LINK")
+PUBLICATIONS_DEFAULT_PAGE_SIZE = int(os.getenv("PUBLICATIONS_DEFAULT_PAGE_SIZE", "50"))
+PUBLICATIONS_MAX_PAGE_SIZE = int(os.getenv("PUBLICATIONS_MAX_PAGE_SIZE", "200"))
+
+# DATE is stored as scraped text; date-range filters parse it with this Snowflake format ('AUTO' detects it).
+# TRY_TO_DATE yields NULL for text it cannot parse, so publications with such dates never match a date filter.
+PUBLICATION_DATE_FORMAT = os.getenv("PUBLICATION_DATE_FORMAT", "AUTO")
+
+def publication_from_row(row):
+    created_date = row[8].strftime("%Y-%m-%d %H:%M:%S") if row[8] else None  # Convert datetime to string
+    return Publication(
+        ID=row[0],
+        TITLE=row[1],
+        BRIEF_SUMMARY=row[2],
+        DATE=row[3],
+        AUTHOR=row[4],
+        IMAGE_LINK=row[5],
+        PDF_LINK=row[6],
+        RESEARCH_NOTES=row[7],
+        CREATED_DATE=created_date  # Use the formatted string
+    )
+
+def parse_fields(fields):
+    """Validate a comma-separated `fields` parameter; ID is always included."""
+    if not fields:
+        return PUBLICATION_LIST_DEFAULT_FIELDS
+    requested = [field.strip().upper() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in PUBLICATION_COLUMNS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}. Valid fields: {', '.join(PUBLICATION_COLUMNS)}")
+    # Keep the column order stable so equivalent requests share a cache entry
+    return tuple(column for column in PUBLICATION_COLUMNS if column == "ID" or column in requested)
+
+def encode_cursor(sort_date, publication_id):
+    """Opaque cursor pointing just past the given row in (DATE DESC, ID DESC) order."""
+    return base64.urlsafe_b64encode(json.dumps([sort_date, publication_id]).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor):
     try:
-        connection = snowflake.connector.connect(
-            user=os.getenv("SNOWFLAKE_USER"),
-            password=os.getenv("SNOWFLAKE_PASSWORD"),
-            account=os.getenv("SNOWFLAKE_ACCOUNT"),
-            role=os.getenv("SNOWFLAKE_ROLE"),
-            warehouse=os.getenv("SNOWFLAKE_WAREHOUSE", "WH_PUBLICATIONS_ETL"),
-            database=os.getenv("SNOWFLAKE_DATABASE", "DB_CFA_PUBLICATIONS"),
-            schema=os.getenv("SNOWFLAKE_SCHEMA", "CFA_PUBLICATIONS")
-        )
-        #print("Connected to Snowflake successfully")  # Debug print
-        return connection
-    except Exception as e:
-        #print(f"Snowflake connection error: {str(e)}")  # Debug print
-        raise
+        sort_date, publication_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if not isinstance(sort_date, str) or not isinstance(publication_id, int):
+            raise ValueError("unexpected cursor contents")
+        return sort_date, publication_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
-@router.get("/publications", response_model=List[Publication])
-async def get_publications_from_snowflake():
+def escape_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def fetch_publication_page(fields, limit, position=None, author=None, title=None, date_from=None, date_to=None):
     """
-    Retrieve a list of all publications from Snowflake.
+    Run one keyset-paginated, projected and filtered publications query on a pooled connection.
+
+    Only the requested columns are read and at most `limit + 1` rows are returned, so the
+    cost of a page does not depend on the size of the catalogue. Blocking, so it runs on
+    the I/O pool.
     """
-    try:
-        conn = get_snowflake_connection()
+    # The sort key is always read, to build the cursor of the next page
+    select_columns = ", ".join(column for column in fields if column != "DATE")
+    query = f"SELECT {select_columns}, COALESCE(DATE, '') AS SORT_DATE FROM {PUBLICATIONS_TABLE}"
+    conditions, params = [], []
+    if position:
+        sort_date, last_id = position
+        conditions.append("(COALESCE(DATE, '') < %s OR (COALESCE(DATE, '') = %s AND ID < %s))")
+        params.extend([sort_date, sort_date, last_id])
+    if author:
+        conditions.append("AUTHOR ILIKE %s ESCAPE '\\\\'")
+        params.append(f"%{escape_like(author)}%")
+    if title:
+        conditions.append("TITLE ILIKE %s ESCAPE '\\\\'")
+        params.append(f"%{escape_like(title)}%")
+    if date_from:
+        conditions.append("TRY_TO_DATE(DATE, %s) >= %s")
+        params.extend([PUBLICATION_DATE_FORMAT, date_from.isoformat()])
+    if date_to:
+        conditions.append("TRY_TO_DATE(DATE, %s) <= %s")
+        params.extend([PUBLICATION_DATE_FORMAT, date_to.isoformat()])
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY SORT_DATE DESC, ID DESC LIMIT %s"
+    params.append(limit + 1)
+
+    with snowflake_pool.connection() as conn:
         cursor = conn.cursor()
+        try:
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+
+    selected = [column for column in fields if column != "DATE"]
+    items = []
+    for row in rows[:limit]:
+        item = dict(zip(selected, row[:-1]))
+        if "DATE" in fields:
+            item["DATE"] = row[-1] or None
+        # Return the columns in the order they were projected
+        items.append({column: item.get(column) for column in fields})
+
+    next_cursor = None
+    if len(rows) > limit:
+        last_row = rows[limit - 1]
+        next_cursor = encode_cursor(last_row[-1], last_row[selected.index("ID")])
+    return jsonable_encoder({"items": items, "next_cursor": next_cursor})
 
-        # Use fully qualified table name: {database}.{schema}.{table}
-        cursor.execute("SELECT * FROM DB_CFA_PUBLICATIONS.CFA_PUBLICATIONS.PUBLICATION_LIST ORDER BY DATE DESC")
-        
-        publications = []
-        for row in cursor:
-            created_date = row[8].strftime("%Y-%m-%d %H:%M:%S") if row[8] else None  # Convert datetime to string
-            publications.append(Publication(
-                ID=row[0],
-                TITLE=row[1],
-                BRIEF_SUMMARY=row[2],
-                DATE=row[3],
-                AUTHOR=row[4],
-                IMAGE_LINK=row[5],
-                PDF_LINK=row[6],
-                RESEARCH_NOTES=row[7],
-                CREATED_DATE=created_date  # Use the formatted string
-            ))
-        cursor.close()
-        conn.close()
-        
-        #print("Fetched publications successfully")  # Debug print
-        return publications
+def fetch_publication(publication_id):
+    """Fetch one full publication record by ID, or None; blocking, so it runs on the I/O pool."""
+    with snowflake_pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"SELECT {', '.join(PUBLICATION_COLUMNS)} FROM {PUBLICATIONS_TABLE} WHERE ID = %s", (publication_id,))
+            row = cursor.fetchone()
+        finally:
+            cursor.close()
+    return jsonable_encoder(publication_from_row(row)) if row else None
+
+def cached_response(request, snapshot):
+    """JSON response for a cached snapshot, or an empty 304 if the client's ETag still matches."""
+    headers = {"ETag": snapshot.etag, "Cache-Control": PUBLICATIONS_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), snapshot.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
+@router.get("/publications", response_model=PublicationPage)
+async def get_publications_from_snowflake(
+    request: Request,
+    cursor: Optional[str] = Query(default=None, description="`next_cursor` of the previous page"),
+    limit: int = Query(default=PUBLICATIONS_DEFAULT_PAGE_SIZE, ge=1, le=PUBLICATIONS_MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(default=None, description="Comma-separated columns to return (default: ID,TITLE,IMAGE_LINK)"),
+    author: Optional[str] = Query(default=None, description="Case-insensitive substring of the author"),
+    title: Optional[str] = Query(default=None, description="Case-insensitive substring of the title"),
+    date_from: Optional[date] = Query(default=None, description="Earliest publication date; excludes publications whose DATE cannot be parsed"),
+    date_to: Optional[date] = Query(default=None, description="Latest publication date; excludes publications whose DATE cannot be parsed")
+):
+    """
+    Retrieve one page of publications from Snowflake, newest first.
+
+    Returns `{"items": [...], "next_cursor": ...}`; pass `next_cursor` back as `cursor` for
+    the following page (it is null on the last one). Items hold only the requested `fields`;
+    the full record of a publication comes from GET /snowflake/publications/{publication_id}.
+
+    `date_from` and `date_to` compare the DATE text parsed with PUBLICATION_DATE_FORMAT;
+    publications whose DATE does not parse are left out of date-filtered results (but still
+    listed without a date filter).
+
+    Pages are served from an in-process cache (see `utils.publications_cache`) with an
+    ETag; requests whose If-None-Match matches it get an empty 304 response.
+    """
+    projection = parse_fields(fields)
+    position = decode_cursor(cursor) if cursor else None
+    author = author.strip() if author else None
+    title = title.strip() if title else None
+    key = ("page", projection, position, limit, author, title, date_from, date_to)
+    try:
+        snapshot = await run_blocking(
+            publications_cache.get,
+            lambda: fetch_publication_page(projection, limit, position, author, title, date_from, date_to),
+            key
+        )
     except Exception as e:
         #print(f"Error fetching data from Snowflake: {str(e)}")  # Debug print
-        raise HTTPException(status_code=500, detail=f"Error fetching data: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error fetching data: {str(e)}")
+    return cached_response(request, snapshot)
+
+@router.get("/publications/{publication_id}", response_model=Publication)
+async def get_publication_from_snowflake(request: Request, publication_id: int):
+    """Retrieve the full record of one publication, including its summary and research notes."""
+    try:
+        snapshot = await run_blocking(publications_cache.get, lambda: fetch_publication(publication_id), ("publication", publication_id))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching data: {str(e)}")
+    if snapshot.rows is None:
+        raise HTTPException(status_code=404, detail=f"Publication {publication_id} not found")
+    return cached_response(request, snapshot)
+
+@router.post("/publications/invalidate")
+async def invalidate_publications_cache(x_invalidation_token: Optional[str] = Header(default=None)):
+    """
+    Drop the cached publication pages and records, e.g. after the Airflow load DAG has merged new rows.
+
+    Each API worker process keeps its own cache; workers this request does not reach
+    pick up the changes when their TTL expires.
+    """
+    if CACHE_INVALIDATION_TOKEN and x_invalidation_token != CACHE_INVALIDATION_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid cache invalidation token")
+    publications_cache.invalidate()
+    return {"message": "Publications cache invalidated.", "stats": publications_cache.stats()}
@@ -2,9 +2,10 @@
 
 from pydantic import BaseModel
 from fastapi import APIRouter, HTTPException
-from langchain_nvidia_ai_endpoints import ChatNVIDIA
 import boto3
 import os
+from utils.concurrency import run_blocking
+from utils.nvidia_client import get_chat_client, nvidia_rate_limiter
 
 router = APIRouter(
     prefix="/summarization",
@@ -32,6 +33,12 @@ def get_s3_file_content(bucket_name, file_key):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching file from S3: {str(e)}")
 
+def generate_summary_text(client, prompt):
+    """Stream a summary from ChatNVIDIA and join the chunks; blocking, so it runs on the I/O pool."""
+    nvidia_rate_limiter.acquire()
+    summary_chunks = client.stream([{"role": "user", "content": prompt}])
+    return "".join(chunk.content for chunk in summary_chunks)
+
 @router.post("/generate-summary")
 async def generate_summary(request: SummaryRequest):
     """
@@ -49,15 +56,14 @@ async def generate_summary(request: SummaryRequest):
         bucket_name = os.getenv("S3_BUCKET_NAME")
 
         # Step 1: Fetch the extracted publication text from `silver/publications/`
-        publication_text = get_s3_file_content(bucket_name, publication_key)
+        publication_text = await run_blocking(get_s3_file_content, bucket_name, publication_key)
 
         # Adjusted: Truncate the text to fit within 5,000 tokens (approximately 25,000 characters)
         truncated_text = publication_text[:25000]  # Approximation for 5,000 tokens
 
-        # Initialize ChatNVIDIA client with the correct API key
-        client = ChatNVIDIA(
+        # Reuse the shared ChatNVIDIA client (and its connection pool) across requests
+        client = get_chat_client(
             model="nvidia/llama-3.1-nemotron-51b-instruct",
-            api_key=os.getenv("NVIDIA_API_KEY"),
             temperature=0.5,
             top_p=1,
             max_tokens=1024,
@@ -72,11 +78,10 @@ async def generate_summary(request: SummaryRequest):
 
         try:
             # Send the prompt to ChatNVIDIA API and stream the response to generate a summary
-            summary_chunks = client.stream([{"role": "user", "content": prompt}])
-            summary = "".join(chunk.content for chunk in summary_chunks)
+            summary = await run_blocking(generate_summary_text, client, prompt)
 
             # Step 3: Overwrite the summary in S3 in the `silver/publication_summary/` path
-            s3_client.put_object(Bucket=bucket_name, Key=summary_key, Body=summary.encode('utf-8'))
+            await run_blocking(s3_client.put_object, Bucket=bucket_name, Key=summary_key, Body=summary.encode('utf-8'))
 
             return {"summary": summary, "message": "Summary generated and saved successfully!"}
         except Exception as e:
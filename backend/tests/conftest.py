@@ -0,0 +1,19 @@
+# tests/conftest.py
+
+import os
+import sys
+import tempfile
+
+# Modules create their caches and stores at import time, so point every on-disk location
+# at a throwaway directory (and select the local backend) before anything is imported
+_state_dir = tempfile.mkdtemp(prefix="backend-tests-")
+os.environ.setdefault("VECTOR_STORE_BACKEND", "local")
+os.environ.setdefault("LOCAL_VECTOR_STORE_DIR", os.path.join(_state_dir, "vectorstore"))
+os.environ.setdefault("INGESTION_CACHE_DIR", os.path.join(_state_dir, "ingestion_cache"))
+os.environ.setdefault("RESPONSE_CACHE_PATH", os.path.join(_state_dir, "response_cache", "responses.db"))
+os.environ.setdefault("SCRATCH_ROOT", os.path.join(_state_dir, "scratch"))
+os.environ.setdefault("INGESTION_JOBS_DB", os.path.join(_state_dir, "jobs", "jobs.db"))
+os.environ.setdefault("NVIDIA_RATE_LIMIT_PER_MINUTE", "0")
+
+# The backend imports its modules as `utils.*`, relative to the backend directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
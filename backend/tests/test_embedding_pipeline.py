@@ -0,0 +1,118 @@
+# tests/test_embedding_pipeline.py
+
+import threading
+import pytest
+from llama_index.core.schema import TextNode
+from utils import embedding_pipeline
+from utils.embedding_pipeline import AdaptiveBatchSizer, embed_nodes, estimate_tokens
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+class FakeEmbedding:
+    """Embeds a text as [len(text)]; `fail(texts)` may return a status code to raise instead."""
+
+    def __init__(self, fail=None):
+        self.fail = fail
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def get_text_embedding_batch(self, texts):
+        with self._lock:
+            self.batches.append(list(texts))
+        status_code = self.fail(texts) if self.fail else None
+        if status_code:
+            raise StatusError(status_code)
+        return [[float(len(text))] for text in texts]
+
+def make_nodes(count, chars=400):
+    return [TextNode(id_=f"n{i}", text=f"{i:04d}" + "x" * (chars - 4)) for i in range(count)]
+
+@pytest.fixture(autouse=True)
+def no_backoff_sleep(monkeypatch):
+    monkeypatch.setattr(embedding_pipeline.time, "sleep", lambda seconds: None)
+
+def test_sizer_halves_on_failure_and_grows_back_additively():
+    sizer = AdaptiveBatchSizer(token_budget=1000, min_token_budget=100)
+    sizer.shrink()
+    sizer.shrink()
+    assert sizer.token_budget == 250
+    for _ in range(3):
+        sizer.shrink()
+    assert sizer.token_budget == 100
+    sizer.grow()
+    assert sizer.token_budget == 200
+    for _ in range(20):
+        sizer.grow()
+    assert sizer.token_budget == 1000
+
+def test_batches_respect_the_token_budget():
+    nodes = make_nodes(20)
+    model = FakeEmbedding()
+    sizer = AdaptiveBatchSizer(token_budget=300, min_token_budget=100)
+    stats = embed_nodes(nodes, model, max_in_flight=2, sizer=sizer)
+
+    assert stats["embeddings"] == 20 and stats["retries"] == 0
+    assert all(sum(estimate_tokens(text) for text in batch) <= 300 for batch in model.batches)
+    assert all(node.embedding == [400.0] for node in nodes)
+
+def test_rate_limited_batches_are_requeued_and_split_smaller():
+    failures = {"left": 2}
+    lock = threading.Lock()
+
+    def fail(texts):
+        with lock:
+            if failures["left"] and len(texts) > 1:
+                failures["left"] -= 1
+                return 429
+        return None
+
+    nodes = make_nodes(12)
+    model = FakeEmbedding(fail=fail)
+    sizer = AdaptiveBatchSizer(token_budget=1000, min_token_budget=100)
+    progress = []
+    stats = embed_nodes(nodes, model, max_in_flight=1, sizer=sizer, progress=lambda *args: progress.append(args))
+
+    assert stats["retries"] == 2
+    assert stats["embeddings"] == 12
+    # Every node is embedded exactly once, with its own text, despite the requeues
+    assert [node.embedding for node in nodes] == [[400.0]] * 12
+    embedded = [text for batch in model.batches[2:] for text in batch]
+    assert sorted(embedded) == sorted(node.text for node in nodes)
+    # The first retry was re-split under the halved budget
+    assert sum(estimate_tokens(text) for text in model.batches[1]) <= 500
+    assert progress[-1] == ("embed", 12, 12)
+
+def test_payload_too_large_shrinks_until_the_batch_fits():
+    nodes = make_nodes(8)
+    model = FakeEmbedding(fail=lambda texts: 413 if sum(len(text) for text in texts) > 800 else None)
+    stats = embed_nodes(nodes, model, max_in_flight=1, sizer=AdaptiveBatchSizer(token_budget=2000, min_token_budget=100))
+
+    assert stats["embeddings"] == 8
+    assert stats["retries"] > 0
+    assert all(node.embedding is not None for node in nodes)
+
+def test_single_node_too_large_and_other_errors_are_raised():
+    model = FakeEmbedding(fail=lambda texts: 413)
+    with pytest.raises(StatusError):
+        embed_nodes(make_nodes(1), model, max_in_flight=1)
+
+    model = FakeEmbedding(fail=lambda texts: 500)
+    with pytest.raises(StatusError):
+        embed_nodes(make_nodes(3), model, max_in_flight=1)
+
+def test_persistent_rate_limiting_gives_up_after_max_retries():
+    model = FakeEmbedding(fail=lambda texts: 429)
+    with pytest.raises(StatusError):
+        embed_nodes(make_nodes(4), model, max_in_flight=1)
+    assert len(model.batches) == embedding_pipeline.EMBED_MAX_RETRIES + 1
+
+def test_nodes_with_embeddings_are_skipped():
+    nodes = make_nodes(3)
+    nodes[1].embedding = [-1.0]
+    model = FakeEmbedding()
+    stats = embed_nodes(nodes, model)
+    assert stats["embeddings"] == 2
+    assert nodes[1].embedding == [-1.0]
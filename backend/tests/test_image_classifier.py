@@ -0,0 +1,58 @@
+# tests/test_image_classifier.py
+
+from io import BytesIO
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+from utils.image_classifier import classify_image_locally, PHOTO, LOGO, CHART, UNCERTAIN
+
+def png_bytes(img):
+    buffered = BytesIO()
+    img.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+def bar_chart(width, height):
+    """White background, black axes and a few solid bars, as rendered by a plotting library."""
+    img = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(img)
+    left, bottom = width // 10, height - height // 10
+    draw.line([(left, height // 20), (left, bottom), (width - width // 20, bottom)], fill="black", width=2)
+    bar_width = width // 12
+    for k, (share, colour) in enumerate([(0.5, "steelblue"), (0.8, "orange"), (0.3, "seagreen"), (0.6, "firebrick")]):
+        x = left + bar_width // 2 + k * 2 * bar_width
+        draw.rectangle([x, bottom - int(share * (bottom - height // 10)), x + bar_width, bottom - 1], fill=colour)
+    return img
+
+def photo(width, height, seed=0):
+    """Smooth colour gradients with sensor-like noise."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([x / width * 200, y / height * 180, (x + y) / (width + height) * 160 + 40], axis=-1)
+    pixels = np.clip(base + rng.normal(scale=25, size=base.shape), 0, 255).astype(np.uint8)
+    return Image.fromarray(pixels)
+
+def flat_logo(width, height):
+    img = Image.new("RGB", (width, height), "navy")
+    ImageDraw.Draw(img).ellipse([width // 4, height // 4, 3 * width // 4, 3 * height // 4], fill="gold")
+    return img
+
+@pytest.mark.parametrize("size", [(640, 480), (150, 100)])
+def test_charts_are_recognised_even_when_small(size):
+    # Charts are checked first, so a small chart is never mistaken for a low-colour logo
+    assert classify_image_locally(png_bytes(bar_chart(*size))) == CHART
+
+def test_photos_skip_the_remote_models():
+    assert classify_image_locally(png_bytes(photo(400, 300))) == PHOTO
+
+@pytest.mark.parametrize("size", [(120, 120), (800, 100), (600, 600)])
+def test_low_colour_artwork_is_a_logo(size):
+    assert classify_image_locally(png_bytes(flat_logo(*size))) == LOGO
+
+def test_ambiguous_and_undecodable_images_are_left_to_the_remote_models():
+    # A large low-colour image with many edges (e.g. a diagram on a dark background) is not decided locally
+    img = Image.new("RGB", (600, 400), "black")
+    draw = ImageDraw.Draw(img)
+    for x in range(0, 600, 6):
+        draw.line([(x, 0), (x, 400)], fill="white", width=2)
+    assert classify_image_locally(png_bytes(img)) == UNCERTAIN
+    assert classify_image_locally(b"not an image") == UNCERTAIN
@@ -0,0 +1,30 @@
+# tests/test_image_preprocessing.py
+
+import base64
+from io import BytesIO
+import numpy as np
+from PIL import Image
+from utils.image_preprocessing import ImagePreprocessor
+
+def jpeg_bytes(width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    buffered = BytesIO()
+    Image.fromarray(pixels).save(buffered, format="JPEG", quality=85)
+    return buffered.getvalue()
+
+def test_jpeg_that_fits_is_sent_without_re_encoding():
+    preprocessor = ImagePreprocessor(max_side=256, max_b64_chars=10 ** 6)
+    image_content = jpeg_bytes(200, 120)
+
+    encoded = preprocessor.encode(image_content)
+    assert encoded.mime_type == "image/jpeg"
+    assert base64.b64decode(encoded.b64) == image_content
+    assert preprocessor.encode(image_content) is encoded
+
+def test_jpeg_larger_than_the_model_input_is_downscaled():
+    preprocessor = ImagePreprocessor(max_side=128, max_b64_chars=10 ** 6)
+    encoded = preprocessor.encode(jpeg_bytes(400, 200))
+
+    assert max(Image.open(BytesIO(base64.b64decode(encoded.b64))).size) == 128
+    assert encoded.encoded_bytes < encoded.original_bytes
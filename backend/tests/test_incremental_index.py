@@ -0,0 +1,108 @@
+# tests/test_incremental_index.py
+
+import itertools
+import pytest
+from llama_index.core import Document
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import NodeRelationship
+from utils.incremental_index import chunk_id, stamp_chunk_hashes, assign_content_ids, sync_collection, CHUNK_HASH_KEY
+from utils.vector_store import get_metadata_values
+
+MODEL = "test-embedding-model"
+_pdf_ids = itertools.count(1)
+
+class CountingEmbedding:
+    """Fake embedding client that records every text it embeds."""
+
+    def __init__(self):
+        self.embedded = []
+
+    def get_text_embedding_batch(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+@pytest.fixture
+def pdf_id():
+    return f"test{next(_pdf_ids)}"
+
+def paragraphs(*names):
+    # Each paragraph is over half the chunk size, so the splitter keeps every paragraph as its own chunk
+    return "\n\n\n".join(f"{name} " + " ".join(f"{name}{i}" for i in range(45)) for name in names)
+
+def split(text, doc_id, content_ids):
+    splitter = SentenceSplitter(chunk_size=120, chunk_overlap=0, id_func=chunk_id)
+    nodes = splitter.get_nodes_from_documents([Document(text=text, id_=doc_id)])
+    stamp_chunk_hashes(nodes, MODEL)
+    if content_ids:
+        assign_content_ids(nodes, doc_id)
+    return nodes
+
+def test_unchanged_nodes_are_not_rewritten(pdf_id):
+    model = CountingEmbedding()
+    nodes = split(paragraphs("alpha", "beta", "gamma"), "notes", content_ids=False)
+    assert sync_collection("research-notes", pdf_id, nodes, embed_model=model) == {"unchanged": 0, "upserted": 3, "deleted": 0}
+
+    model.embedded.clear()
+    nodes = split(paragraphs("alpha", "beta", "gamma"), "notes", content_ids=False)
+    assert sync_collection("research-notes", pdf_id, nodes, embed_model=model) == {"unchanged": 3, "upserted": 0, "deleted": 0}
+    assert model.embedded == []
+
+def test_changed_and_removed_chunks_are_upserted_and_deleted(pdf_id):
+    model = CountingEmbedding()
+    sync_collection("research-notes", pdf_id, split(paragraphs("alpha", "beta", "gamma"), "notes", False), embed_model=model)
+
+    model.embedded.clear()
+    nodes = split(paragraphs("alpha", "delta"), "notes", content_ids=False)
+    stats = sync_collection("research-notes", pdf_id, nodes, embed_model=model)
+    assert stats == {"unchanged": 1, "upserted": 1, "deleted": 1}
+    assert len(model.embedded) == 1 and model.embedded[0].startswith("delta")
+
+    stored = get_metadata_values("research-notes", pdf_id, CHUNK_HASH_KEY)
+    assert stored == {node.node_id: node.metadata[CHUNK_HASH_KEY] for node in nodes}
+
+    assert sync_collection("research-notes", pdf_id, [], embed_model=model)["deleted"] == 2
+    assert get_metadata_values("research-notes", pdf_id, CHUNK_HASH_KEY) == {}
+
+def test_content_ids_keep_shifted_chunks_in_place(pdf_id):
+    model = CountingEmbedding()
+    sync_collection("research-notes", pdf_id, split(paragraphs("alpha", "beta", "gamma"), "notes", True), embed_model=model)
+
+    # A paragraph inserted at the start shifts every positional id, but no content id
+    model.embedded.clear()
+    stats = sync_collection("research-notes", pdf_id, split(paragraphs("intro", "alpha", "beta", "gamma"), "notes", True), embed_model=model)
+    assert stats == {"unchanged": 3, "upserted": 1, "deleted": 0}
+    assert len(model.embedded) == 1 and model.embedded[0].startswith("intro")
+
+def test_content_ids_are_unique_and_links_follow_them():
+    nodes = split(paragraphs("alpha", "beta", "alpha"), "notes", content_ids=True)
+    ids = [node.node_id for node in nodes]
+    assert len(set(ids)) == 3
+    assert ids[2] == f"{ids[0]}-2"
+    assert nodes[1].relationships[NodeRelationship.PREVIOUS].node_id == ids[0]
+    assert nodes[1].relationships[NodeRelationship.NEXT].node_id == ids[2]
+    assert nodes[0].relationships[NodeRelationship.SOURCE].node_id == "notes"
+
+def page_nodes(texts):
+    # Same shape as the /rag ingestion path: one document per block, positional chunk ids
+    documents = [Document(text=text, id_=f"publication_1-page0-block{i}") for i, text in enumerate(texts, 1)]
+    nodes = SentenceSplitter(chunk_size=120, chunk_overlap=0, id_func=chunk_id).get_nodes_from_documents(documents)
+    return stamp_chunk_hashes(nodes, MODEL)
+
+def test_reload_embeds_only_the_changed_chunk(pdf_id):
+    model = CountingEmbedding()
+    texts = [paragraphs(name) for name in ("alpha", "beta", "gamma", "delta")]
+    sync_collection("pdf-index", pdf_id, page_nodes(texts), embed_model=model)
+    assert len(model.embedded) == 4
+
+    model.embedded.clear()
+    texts[2] = paragraphs("epsilon")
+    stats = sync_collection("pdf-index", pdf_id, page_nodes(texts), embed_model=model)
+    assert stats == {"unchanged": 3, "upserted": 1, "deleted": 0}
+    assert len(model.embedded) == 1 and model.embedded[0].startswith("epsilon")
+
+def test_nodes_that_carry_embeddings_are_not_embedded_again(pdf_id):
+    model = CountingEmbedding()
+    nodes = page_nodes([paragraphs("alpha"), paragraphs("beta")])
+    nodes[0].embedding = [1.0, 0.0]
+    assert sync_collection("pdf-index", pdf_id, nodes, embed_model=model)["upserted"] == 2
+    assert len(model.embedded) == 1 and model.embedded[0].startswith("beta")
@@ -0,0 +1,55 @@
+# tests/test_ingestion_cache.py
+
+import os
+import time
+from llama_index.core.schema import TextNode
+from utils.ingestion_cache import IngestionCache, compute_cache_key
+
+def make_nodes(name, count=3):
+    return [
+        TextNode(id_=f"{name}-chunk{i}", text=f"{name} chunk {i} " + "x" * 200, embedding=[float(i), 1.0] if i else None)
+        for i in range(count)
+    ]
+
+def entry_size(cache, key):
+    return cache._conn.execute("SELECT size_bytes FROM entries WHERE key = ?", (key,)).fetchone()[0]
+
+def test_cache_key_covers_bytes_model_and_pdf_id():
+    key = compute_cache_key(b"%PDF-1.7 a", "model-a", "chunk_size=650", "pdf_id=1")
+    assert key == compute_cache_key(bytearray(b"%PDF-1.7 a"), "model-a", "chunk_size=650", "pdf_id=1")
+    assert key != compute_cache_key(b"%PDF-1.7 b", "model-a", "chunk_size=650", "pdf_id=1")
+    assert key != compute_cache_key(b"%PDF-1.7 a", "model-b", "chunk_size=650", "pdf_id=1")
+    assert key != compute_cache_key(b"%PDF-1.7 a", "model-a", "chunk_size=650", "pdf_id=2")
+
+def test_hit_survives_a_restart(tmp_path):
+    cache = IngestionCache(cache_dir=str(tmp_path))
+    assert cache.get("k1") is None
+    cache.put("k1", make_nodes("a"))
+
+    nodes = IngestionCache(cache_dir=str(tmp_path)).get("k1")
+    assert [node.node_id for node in nodes] == ["a-chunk0", "a-chunk1", "a-chunk2"]
+    assert nodes[0].embedding is None and nodes[2].embedding == [2.0, 1.0]
+    # Only the nodes are stored: no parsed documents or artifact copies
+    assert os.listdir(tmp_path / "k1") == ["nodes.json"]
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = IngestionCache(cache_dir=str(tmp_path))
+    cache.put("a", make_nodes("a"))
+    cache.max_bytes = int(entry_size(cache, "a") * 2.5)
+    time.sleep(0.01)
+    cache.put("b", make_nodes("b"))
+    time.sleep(0.01)
+    assert cache.get("a") is not None
+    time.sleep(0.01)
+    cache.put("c", make_nodes("c"))
+
+    assert cache.get("b") is None
+    assert not os.path.exists(tmp_path / "b")
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+def test_unreadable_entry_is_a_miss(tmp_path):
+    cache = IngestionCache(cache_dir=str(tmp_path))
+    cache.put("k", make_nodes("a"))
+    (tmp_path / "k" / "nodes.json").write_text("{not json")
+    assert cache.get("k") is None
+    assert not os.path.exists(tmp_path / "k")
@@ -0,0 +1,138 @@
+# tests/test_ingestion_jobs.py
+
+import asyncio
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from utils.ingestion_jobs import IngestionJobManager, QUEUED, RUNNING, SUCCEEDED, FAILED
+from utils.scratch_space import PROCESS_TOKEN
+
+@pytest.fixture
+def executor():
+    executor = ThreadPoolExecutor(max_workers=2)
+    yield executor
+    executor.shutdown(wait=True)
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "jobs.db")
+
+def blocking_run(started, release, result=None):
+    def run(progress):
+        started.set()
+        assert release.wait(5)
+        return result
+    return run
+
+def wait_for(manager, job_id):
+    return asyncio.run(asyncio.wait_for(manager.wait(job_id, poll_interval=0.01), timeout=5))
+
+def test_submissions_are_deduplicated_but_reloads_are_not_dropped(db_path, executor):
+    manager = IngestionJobManager(db_path=db_path, executor=executor)
+    started, release = threading.Event(), threading.Event()
+    first = manager.submit("1", "link", blocking_run(started, release))
+    assert started.wait(5)
+
+    # Another ingestion of the same PDF joins the running job, a reload is queued behind it
+    assert manager.submit("1", "link", lambda progress: None)["job_id"] == first["job_id"]
+    reload = manager.submit("1", "link", lambda progress: {"reloaded": True}, reload=True)
+    assert reload["job_id"] != first["job_id"] and reload["status"] == QUEUED
+    assert manager.submit("1", "link", lambda progress: None, reload=True)["job_id"] == reload["job_id"]
+
+    release.set()
+    assert wait_for(manager, first["job_id"])["status"] == SUCCEEDED
+    finished = wait_for(manager, reload["job_id"])
+    assert finished["status"] == SUCCEEDED and finished["result"] == {"reloaded": True}
+
+def test_jobs_for_one_pdf_run_in_order_without_holding_a_worker(db_path, executor):
+    manager = IngestionJobManager(db_path=db_path, executor=executor)
+    order = []
+    started, release = threading.Event(), threading.Event()
+
+    def first_run(progress):
+        order.append("first")
+        blocking_run(started, release)(progress)
+
+    first = manager.submit("1", "link", first_run)
+    assert started.wait(5)
+    reload = manager.submit("1", "link", lambda progress: order.append("reload"), reload=True)
+
+    # The queued reload must not take the second worker, so another PDF still gets it
+    other = manager.submit("2", "link", lambda progress: order.append("other"))
+    assert wait_for(manager, other["job_id"])["status"] == SUCCEEDED
+    assert manager.get(reload["job_id"])["status"] == QUEUED
+
+    release.set()
+    assert wait_for(manager, reload["job_id"])["status"] == SUCCEEDED
+    assert manager.get(first["job_id"])["status"] == SUCCEEDED
+    assert order == ["first", "other", "reload"]
+
+def test_a_failed_job_records_its_error_and_the_next_job_still_runs(db_path, executor):
+    manager = IngestionJobManager(db_path=db_path, executor=executor)
+    started, release = threading.Event(), threading.Event()
+
+    def fail(progress):
+        blocking_run(started, release)(progress)
+        error = RuntimeError("boom")
+        error.status_code = 413
+        raise error
+
+    failing = manager.submit("1", "link", fail)
+    assert started.wait(5)
+    reload = manager.submit("1", "link", lambda progress: "ok", reload=True)
+    release.set()
+
+    failed = wait_for(manager, failing["job_id"])
+    assert failed["status"] == FAILED and failed["error"] == "boom" and failed["error_status"] == 413
+    assert wait_for(manager, reload["job_id"])["result"] == "ok"
+
+def test_only_jobs_of_stopped_processes_are_failed_at_startup(db_path, executor):
+    IngestionJobManager(db_path=db_path, executor=executor)
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    conn = sqlite3.connect(db_path)
+    owners = {
+        "live": (os.getpid(), PROCESS_TOKEN),
+        "other-live-process": (os.getppid(), "another-token"),
+        "exited-process": (exited.pid, "another-token"),
+        "earlier-process-same-pid": (os.getpid(), "earlier-token"),
+        "no-owner": (None, None)
+    }
+    for job_id, (owner_pid, owner_token) in owners.items():
+        conn.execute(
+            "INSERT INTO jobs (job_id, pdf_id, pdf_link, reload, status, owner_pid, owner_token, created_at, updated_at) "
+            "VALUES (?, ?, 'link', 0, ?, ?, ?, 0, 0)",
+            (job_id, job_id, RUNNING, owner_pid, owner_token)
+        )
+    conn.commit()
+    conn.close()
+
+    manager = IngestionJobManager(db_path=db_path, executor=executor)
+    statuses = {job_id: manager.get(job_id)["status"] for job_id in owners}
+    assert statuses == {
+        "live": RUNNING,
+        "other-live-process": RUNNING,
+        "exited-process": FAILED,
+        "earlier-process-same-pid": FAILED,
+        "no-owner": FAILED
+    }
+
+def test_tables_from_before_job_owners_are_migrated(db_path, executor):
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE jobs (job_id TEXT PRIMARY KEY, pdf_id TEXT NOT NULL, pdf_link TEXT NOT NULL, reload INTEGER NOT NULL, "
+        "status TEXT NOT NULL, stage TEXT, progress TEXT NOT NULL DEFAULT '{}', error TEXT, "
+        "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+    )
+    conn.execute("INSERT INTO jobs (job_id, pdf_id, pdf_link, reload, status, created_at, updated_at) VALUES ('old', '1', 'link', 0, 'queued', 0, 0)")
+    conn.commit()
+    conn.close()
+
+    manager = IngestionJobManager(db_path=db_path, executor=executor)
+    assert manager.get("old")["status"] == FAILED
+    job = manager.submit("1", "link", lambda progress: {"pages": 3})
+    assert wait_for(manager, job["job_id"])["result"] == {"pages": 3}
@@ -0,0 +1,99 @@
+# tests/test_layout_analysis.py
+
+import random
+import fitz
+import pytest
+from utils.layout_analysis import PageLayout, intersects_any, rects_to_array
+
+WORDS = "capital markets equity yield duration risk premium factor portfolio return volatility".split()
+
+# Reference implementations: the per-block loops PageLayout replaced
+
+def reference_text_blocks(page):
+    return [block for block in page.get_text("blocks", sort=True)
+            if block[-1] == 0 and not (block[1] < page.rect.height * 0.1 or block[3] > page.rect.height * 0.9)]
+
+def reference_text_around(text_blocks, bbox, page_height, threshold_percentage=0.1):
+    before_text, after_text = "", ""
+    vertical_threshold_distance = page_height * threshold_percentage
+    horizontal_threshold_distance = bbox.width * threshold_percentage
+
+    for block in text_blocks:
+        block_bbox = fitz.Rect(block[:4])
+        vertical_distance = min(abs(block_bbox.y1 - bbox.y0), abs(block_bbox.y0 - bbox.y1))
+        horizontal_overlap = max(0, min(block_bbox.x1, bbox.x1) - max(block_bbox.x0, bbox.x0))
+
+        if vertical_distance <= vertical_threshold_distance and horizontal_overlap >= -horizontal_threshold_distance:
+            if block_bbox.y1 < bbox.y0 and not before_text:
+                before_text = block[4]
+            elif block_bbox.y0 > bbox.y1 and not after_text:
+                after_text = block[4]
+                break
+
+    return before_text, after_text
+
+def reference_group_blocks(text_blocks, char_count_threshold=500):
+    current_group = []
+    grouped_blocks = []
+    current_char_count = 0
+    for block in text_blocks:
+        if block[-1] == 0:
+            block_char_count = len(block[4])
+            if current_char_count + block_char_count <= char_count_threshold:
+                current_group.append(block)
+                current_char_count += block_char_count
+            else:
+                if current_group:
+                    grouped_blocks.append((current_group[0], "\n".join(b[4] for b in current_group)))
+                current_group = [block]
+                current_char_count = block_char_count
+    if current_group:
+        grouped_blocks.append((current_group[0], "\n".join(b[4] for b in current_group)))
+    return grouped_blocks
+
+def random_rect(rng, page_rect):
+    x0 = rng.uniform(0, page_rect.width - 20)
+    y0 = rng.uniform(0, page_rect.height - 20)
+    return fitz.Rect(x0, y0, rng.uniform(x0, page_rect.width), rng.uniform(y0, page_rect.height))
+
+@pytest.fixture(scope="module")
+def generated_pdf():
+    """A PDF whose pages hold randomly placed text blocks of random length, some in the header/footer bands."""
+    rng = random.Random(19)
+    doc = fitz.open()
+    for _ in range(40):
+        page = doc.new_page()
+        for _ in range(rng.randint(0, 30)):
+            x, y = rng.uniform(20, 400), rng.uniform(10, 820)
+            text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 60)))
+            page.insert_textbox(fitz.Rect(x, y, x + rng.uniform(80, 190), y + rng.uniform(12, 120)), text, fontsize=rng.choice([6, 8, 10]))
+    yield doc
+    doc.close()
+
+def test_page_layout_matches_reference_implementation(generated_pdf):
+    rng = random.Random(20)
+    checked_items = 0
+    for page in generated_pdf:
+        layout = PageLayout.from_page(page)
+        text_blocks = reference_text_blocks(page)
+        assert layout.blocks == text_blocks
+
+        groups = layout.group_blocks()
+        assert groups == reference_group_blocks(text_blocks)
+
+        items = [random_rect(rng, page.rect) for _ in range(10)] + [fitz.Rect(block[:4]) for block in text_blocks[:5]]
+        for bbox in items:
+            assert layout.text_around(bbox) == reference_text_around(text_blocks, bbox, page.rect.height)
+            checked_items += 1
+
+        tables = [random_rect(rng, page.rect) for _ in range(rng.randint(0, 3))]
+        expected = [any(fitz.Rect(heading[:4]).intersects(table) for table in tables) for heading, _ in groups]
+        assert intersects_any(layout.heading_coords(groups), rects_to_array(tables)).tolist() == expected
+    assert checked_items > 0
+
+def test_intersects_any_follows_fitz_semantics():
+    rects = [fitz.Rect(0, 0, 10, 10), fitz.Rect(10, 0, 20, 10), fitz.Rect(5, 5, 5, 20), fitz.Rect(30, 30, 40, 40)]
+    others = [fitz.Rect(9, 9, 15, 15), fitz.Rect(0, 0, 0, 0)]
+    expected = [any(rect.intersects(other) for other in others) for rect in rects]
+    assert intersects_any(rects_to_array(rects), rects_to_array(others)).tolist() == expected
+    assert intersects_any(rects_to_array(rects), rects_to_array([])).tolist() == [False] * len(rects)
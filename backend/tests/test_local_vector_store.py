@@ -0,0 +1,148 @@
+# tests/test_local_vector_store.py
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores.types import VectorStoreQuery
+from utils import local_vector_store
+from utils.local_vector_store import LocalVectorStore
+
+DIM = 16
+
+@pytest.fixture
+def store(tmp_path):
+    yield LocalVectorStore("pdf-index-1", persist_dir=str(tmp_path))
+
+def make_nodes(embeddings, prefix="n"):
+    return [TextNode(id_=f"{prefix}{i}", text=f"text {i}", embedding=embedding.tolist()) for i, embedding in enumerate(embeddings)]
+
+def brute_force_top_k(embeddings, query, k):
+    normalized = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    scores = normalized @ (query / np.linalg.norm(query))
+    return [f"n{i}" for i in np.argsort(-scores)[:k]], np.sort(scores)[::-1][:k]
+
+def test_exact_search_matches_brute_force(store):
+    rng = np.random.default_rng(8)
+    embeddings = rng.normal(size=(300, DIM)).astype(np.float32)
+    store.add(make_nodes(embeddings))
+
+    for query in rng.normal(size=(10, DIM)).astype(np.float32):
+        result = store.query(VectorStoreQuery(query_embedding=query.tolist(), similarity_top_k=5))
+        expected_ids, expected_scores = brute_force_top_k(embeddings, query, 5)
+        assert result.ids == expected_ids
+        np.testing.assert_allclose(result.similarities, expected_scores, rtol=1e-5)
+        assert [node.get_content() for node in result.nodes] == [f"text {node_id[1:]}" for node_id in expected_ids]
+
+def test_ivf_search_finds_clustered_neighbours(store, monkeypatch):
+    monkeypatch.setattr(local_vector_store, "LOCAL_IVF_MIN_VECTORS", 100)
+    rng = np.random.default_rng(9)
+    centers = rng.normal(size=(8, DIM))
+    embeddings = (np.repeat(centers, 50, axis=0) + rng.normal(scale=0.05, size=(400, DIM))).astype(np.float32)
+    store.add(make_nodes(embeddings))
+
+    collection = local_vector_store._get_collection(store._path)
+    assert collection.snapshot.ivf is not None
+    recalled = 0
+    for query in embeddings[::40]:
+        result = store.query(VectorStoreQuery(query_embedding=query.tolist(), similarity_top_k=5))
+        expected_ids, _ = brute_force_top_k(embeddings, query, 5)
+        recalled += len(set(result.ids) & set(expected_ids))
+    assert recalled / (10 * 5) >= 0.9
+
+def test_upsert_replaces_by_id_and_delete_removes(store):
+    store.add(make_nodes(np.eye(DIM, dtype=np.float32)[:3]))
+    replacement = TextNode(id_="n0", text="replaced", embedding=np.eye(DIM)[5].tolist())
+    store.add([replacement])
+
+    result = store.query(VectorStoreQuery(query_embedding=np.eye(DIM)[5].tolist(), similarity_top_k=1))
+    assert result.ids == ["n0"] and result.nodes[0].get_content() == "replaced"
+    assert len(store.get_metadata_values("missing")) == 3
+
+    store.delete_nodes(["n1"])
+    assert sorted(store.get_metadata_values("missing")) == ["n0", "n2"]
+    store.clear()
+    assert not store.exists()
+    assert store.query(VectorStoreQuery(query_embedding=np.eye(DIM)[0].tolist(), similarity_top_k=1)).ids == []
+
+def test_writes_publish_new_versions_that_other_views_pick_up(store):
+    store.add(make_nodes(np.eye(DIM, dtype=np.float32)[:2]))
+    view = local_vector_store._Collection(store._path)
+    view.load()
+    first_version = view.snapshot.version
+
+    store.add(make_nodes(np.eye(DIM, dtype=np.float32)[2:4], prefix="m"))
+    view.load()
+    assert view.snapshot.version == first_version + 1
+    assert len(view.snapshot.ids) == len(view.snapshot.embeddings) == 4
+
+def test_a_write_in_progress_does_not_block_other_collections(tmp_path, monkeypatch):
+    writing = LocalVectorStore("pdf-index-1", persist_dir=str(tmp_path))
+    other = LocalVectorStore("pdf-index-2", persist_dir=str(tmp_path))
+    writing.add(make_nodes(np.eye(DIM, dtype=np.float32)[:2]))
+    other.add(make_nodes(np.eye(DIM, dtype=np.float32)[:2]))
+
+    # Hold the next write inside its IVF rebuild until the queries below have finished
+    entered, release = threading.Event(), threading.Event()
+    build_ivf = local_vector_store._build_ivf
+
+    def slow_build_ivf(embeddings):
+        entered.set()
+        release.wait(5)
+        return build_ivf(embeddings)
+
+    monkeypatch.setattr(local_vector_store, "LOCAL_IVF_MIN_VECTORS", 3)
+    monkeypatch.setattr(local_vector_store, "_build_ivf", slow_build_ivf)
+    writer = threading.Thread(target=writing.add, args=(make_nodes(np.eye(DIM, dtype=np.float32)[2:4], prefix="m"),))
+    writer.start()
+    try:
+        assert entered.wait(5)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(other.query, VectorStoreQuery(query_embedding=np.eye(DIM)[1].tolist(), similarity_top_k=1))
+            assert future.result(timeout=2).ids == ["n1"]
+            # Queries on the collection being written are served from its last published snapshot
+            future = executor.submit(writing.query, VectorStoreQuery(query_embedding=np.eye(DIM)[0].tolist(), similarity_top_k=1))
+            assert future.result(timeout=2).ids == ["n0"]
+    finally:
+        release.set()
+        writer.join()
+    assert len(writing.get_metadata_values("missing")) == 4
+
+def test_queries_during_writes_see_consistent_snapshots(store):
+    # Node i of generation g has embedding e_i and text "g i": ids, texts and rows must always agree
+    def generation(g, count):
+        return [TextNode(id_=f"n{i}", text=f"{g} {i}", embedding=np.eye(DIM)[i].tolist()) for i in range(count)]
+
+    store.add(generation(0, DIM))
+    stop = threading.Event()
+    errors = []
+
+    def write():
+        for g in range(1, 30):
+            store.delete_nodes([f"n{i}" for i in range(g % 4, DIM, 4)])
+            store.add(generation(g, DIM))
+        stop.set()
+
+    def read():
+        rng = np.random.default_rng()
+        while not stop.is_set():
+            i = int(rng.integers(DIM))
+            try:
+                result = store.query(VectorStoreQuery(query_embedding=np.eye(DIM)[i].tolist(), similarity_top_k=1))
+            except Exception as e:
+                errors.append(e)
+                return
+            if result.ids and result.similarities[0] > 0.99:
+                node = result.nodes[0]
+                if result.ids[0] != f"n{i}" or node.get_content().split()[1] != str(i):
+                    errors.append(AssertionError((i, result.ids, node.get_content())))
+                    return
+
+    readers = [threading.Thread(target=read) for _ in range(3)]
+    for reader in readers:
+        reader.start()
+    write()
+    for reader in readers:
+        reader.join()
+    assert errors == []
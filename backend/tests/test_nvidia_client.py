@@ -0,0 +1,70 @@
+# tests/test_nvidia_client.py
+
+import httpx
+import pytest
+from pydantic import PrivateAttr
+from llama_index.core.embeddings import MockEmbedding
+from utils import nvidia_client
+from utils.nvidia_client import RateLimitedEmbedding, error_status_code
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+class CountingLimiter:
+    def __init__(self):
+        self.acquired = 0
+
+    def acquire(self):
+        self.acquired += 1
+
+class FlakyEmbedding(MockEmbedding):
+    """Mock embedding that fails its first query embeddings with the given status codes."""
+
+    _failures: list = PrivateAttr()
+
+    def __init__(self, failures):
+        super().__init__(embed_dim=4)
+        self._failures = list(failures)
+
+    def _get_query_embedding(self, query):
+        if self._failures:
+            raise StatusError(self._failures.pop(0))
+        return super()._get_query_embedding(query)
+
+@pytest.fixture(autouse=True)
+def no_backoff_sleep(monkeypatch):
+    monkeypatch.setattr(nvidia_client.time, "sleep", lambda seconds: None)
+
+def test_every_query_embedding_attempt_waits_for_the_limiter():
+    limiter = CountingLimiter()
+    embedding = RateLimitedEmbedding(FlakyEmbedding([429, 503]), limiter=limiter, max_retries=3)
+    assert embedding.get_query_embedding("equity risk premium") == [0.5] * 4
+    assert limiter.acquired == 3
+
+def test_non_retryable_errors_and_exhausted_retries_are_raised():
+    limiter = CountingLimiter()
+    with pytest.raises(StatusError):
+        RateLimitedEmbedding(FlakyEmbedding([400]), limiter=limiter).get_query_embedding("q")
+    assert limiter.acquired == 1
+
+    with pytest.raises(StatusError):
+        RateLimitedEmbedding(FlakyEmbedding([429] * 3), limiter=limiter, max_retries=1).get_query_embedding("q")
+    assert limiter.acquired == 3
+
+def test_llm_http_client_waits_for_the_limiter_on_every_request(monkeypatch):
+    limiter = CountingLimiter()
+    monkeypatch.setattr(nvidia_client, "nvidia_rate_limiter", limiter)
+    client = nvidia_client._rate_limited_http_client()
+    request = httpx.Request("POST", "https://integrate.api.nvidia.com/v1/chat/completions")
+    for _ in range(2):
+        for hook in client.event_hooks["request"]:
+            hook(request)
+    client.close()
+    assert limiter.acquired == 2
+
+def test_error_status_code():
+    assert error_status_code(StatusError(503)) == 503
+    assert error_status_code(Exception("Error code: 429 - Too Many Requests")) == 429
+    assert error_status_code(ValueError("bad input")) is None
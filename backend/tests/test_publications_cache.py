@@ -0,0 +1,107 @@
+# tests/test_publications_cache.py
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils.publications_cache import PublicationsCache, etag_matches
+
+ROWS = [{"ID": 1, "TITLE": "Equity Risk Premium"}, {"ID": 2, "TITLE": "Fixed Income Outlook"}]
+
+class CountingLoader:
+    """load_rows stand-in that counts its calls and can be held open until released."""
+
+    def __init__(self, rows=ROWS, block=False):
+        self.rows = rows
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+        if not block:
+            self.release.set()
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        return self.rows
+
+def test_concurrent_misses_share_one_load():
+    cache = PublicationsCache()
+    load = CountingLoader(block=True)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [executor.submit(cache.get, load, "page=1") for _ in range(8)]
+        assert load.started.wait(5)
+        time.sleep(0.05)
+        load.release.set()
+        snapshots = [future.result() for future in futures]
+
+    assert load.calls == 1
+    assert all(snapshot is snapshots[0] for snapshot in snapshots)
+    assert cache.stats()["misses"] == 1 and cache.stats()["hits"] == 7
+
+def test_etag_follows_the_body():
+    first = PublicationsCache().get(CountingLoader())
+    same = PublicationsCache().get(CountingLoader([dict(row) for row in ROWS]))
+    changed = PublicationsCache().get(CountingLoader(ROWS[:1]))
+    assert first.etag == same.etag != changed.etag
+    assert first.body == b'[{"ID":1,"TITLE":"Equity Risk Premium"},{"ID":2,"TITLE":"Fixed Income Outlook"}]'
+
+    assert etag_matches(first.etag, first.etag)
+    assert etag_matches(f'"stale", W/{first.etag}', first.etag)
+    assert etag_matches("*", first.etag)
+    assert not etag_matches(changed.etag, first.etag)
+    assert not etag_matches(None, first.etag)
+
+def test_load_overlapping_invalidation_is_not_stored():
+    cache = PublicationsCache()
+
+    def load_during_dag_run():
+        cache.invalidate()
+        return ROWS
+
+    assert cache.get(load_during_dag_run).rows == ROWS
+    load = CountingLoader()
+    cache.get(load)
+    cache.get(load)
+    assert load.calls == 1
+    assert cache.stats()["invalidations"] == 1
+
+def test_ttl_and_invalidate_force_a_reload():
+    cache = PublicationsCache(ttl_seconds=0.05)
+    load = CountingLoader()
+    cache.get(load)
+    cache.get(load)
+    assert load.calls == 1
+    time.sleep(0.1)
+    cache.get(load)
+    assert load.calls == 2
+    cache.invalidate()
+    cache.get(load)
+    assert load.calls == 3
+
+def test_least_recently_used_key_is_evicted():
+    cache = PublicationsCache(max_entries=2)
+    loads = {key: CountingLoader([{"page": key}]) for key in ("a", "b", "c")}
+    cache.get(loads["a"], "a")
+    cache.get(loads["b"], "b")
+    cache.get(loads["a"], "a")
+    cache.get(loads["c"], "c")
+
+    cache.get(loads["a"], "a")
+    cache.get(loads["b"], "b")
+    assert loads["a"].calls == 1
+    assert loads["b"].calls == 2
+    assert cache.stats()["evictions"] == 2
+    assert cache.stats()["entries"] == 2
+
+def test_lookups_that_found_nothing_expire_after_the_miss_ttl():
+    cache = PublicationsCache(ttl_seconds=60, miss_ttl_seconds=0.05)
+    missing, found = CountingLoader(rows=None), CountingLoader()
+    cache.get(missing, ("publication", 3))
+    cache.get(found, ("publication", 1))
+    assert cache.get(missing, ("publication", 3)).rows is None
+    assert missing.calls == 1
+    time.sleep(0.1)
+    # The record may have been loaded meanwhile; the hit on an existing record is still cached
+    cache.get(missing, ("publication", 3))
+    cache.get(found, ("publication", 1))
+    assert missing.calls == 2 and found.calls == 1
@@ -0,0 +1,87 @@
+# tests/test_scratch_space.py
+
+import os
+import shutil
+import subprocess
+import sys
+import threading
+from collections import namedtuple
+import pytest
+from utils import scratch_space
+from utils.scratch_space import ScratchSpaceManager, ScratchQuotaExceeded, PROCESS_TOKEN
+
+MIB = 1024 ** 2
+
+@pytest.fixture(autouse=True)
+def small_reservations(monkeypatch):
+    monkeypatch.setattr(scratch_space, "SCRATCH_MIN_RESERVATION_BYTES", 0)
+    monkeypatch.setattr(scratch_space, "SCRATCH_POLL_INTERVAL_SECONDS", 0.02)
+
+@pytest.fixture
+def root(tmp_path):
+    return str(tmp_path / "scratch")
+
+def write_file(directory, nbytes, name="data.bin"):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, name), "wb") as f:
+        f.write(b"\0" * nbytes)
+
+def foreign_dir(root, pid):
+    return os.path.join(root, f"{pid}-othertoken-ingest-0")
+
+def test_directories_of_other_processes_count_against_the_quota(root):
+    manager = ScratchSpaceManager(root=root, quota_bytes=10 * MIB)
+    # A live server process (our parent) is using 8 MiB of the shared root
+    write_file(foreign_dir(root, os.getppid()), 8 * MIB)
+
+    with pytest.raises(ScratchQuotaExceeded):
+        with manager.scratch_dir(expected_bytes=4 * MIB, timeout=0.1):
+            pass
+    with manager.scratch_dir(expected_bytes=1 * MIB, timeout=0.1) as path:
+        assert os.path.isdir(path)
+    assert not os.path.exists(path)
+
+def test_a_directory_that_outgrows_its_reservation_counts_with_its_measured_size(root):
+    manager = ScratchSpaceManager(root=root, quota_bytes=10 * MIB)
+    with manager.scratch_dir(expected_bytes=1 * MIB) as path:
+        write_file(path, 6 * MIB)
+        assert manager.stats()["used_bytes"] == 6 * MIB
+        with pytest.raises(ScratchQuotaExceeded):
+            with manager.scratch_dir(expected_bytes=5 * MIB, timeout=0.1):
+                pass
+    with manager.scratch_dir(expected_bytes=5 * MIB, timeout=0.1):
+        pass
+
+def test_waiting_ingestions_are_admitted_once_another_process_frees_space(root):
+    manager = ScratchSpaceManager(root=root, quota_bytes=10 * MIB)
+    other = foreign_dir(root, os.getppid())
+    write_file(other, 8 * MIB)
+    timer = threading.Timer(0.2, shutil.rmtree, args=(other,))
+    timer.start()
+    try:
+        with manager.scratch_dir(expected_bytes=4 * MIB, timeout=5):
+            assert not os.path.exists(other)
+    finally:
+        timer.cancel()
+
+def test_reservations_also_need_free_disk_space(root, monkeypatch):
+    manager = ScratchSpaceManager(root=root, quota_bytes=100 * MIB)
+    usage = namedtuple("usage", "total used free")
+    monkeypatch.setattr(scratch_space.shutil, "disk_usage", lambda path: usage(100 * MIB, 97 * MIB, 3 * MIB))
+
+    with manager.scratch_dir(expected_bytes=2 * MIB, timeout=0.1):
+        # The first directory has not written its 2 MiB yet, so only 1 MiB is left for others
+        with pytest.raises(ScratchQuotaExceeded):
+            with manager.scratch_dir(expected_bytes=2 * MIB, timeout=0.1):
+                pass
+
+def test_orphaned_directories_are_removed_at_startup(root):
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    orphans = [foreign_dir(root, exited.pid), os.path.join(root, f"{os.getpid()}-earliertoken-ingest-0")]
+    live = [foreign_dir(root, os.getppid()), os.path.join(root, f"{os.getpid()}-{PROCESS_TOKEN}-ingest-0")]
+    for path in orphans + live:
+        write_file(path, 1)
+
+    ScratchSpaceManager(root=root, quota_bytes=10 * MIB)
+    assert [os.path.exists(path) for path in orphans + live] == [False, False, True, True]
@@ -0,0 +1,45 @@
+# tests/test_snowflake_pool.py
+
+import pytest
+
+errors = pytest.importorskip("snowflake.connector.errors")
+from utils.snowflake_pool import SnowflakeConnectionPool
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def is_closed(self):
+        return self.closed
+
+    def close(self):
+        self.closed = True
+
+def make_pool():
+    connections = []
+
+    def connect():
+        connections.append(FakeConnection())
+        return connections[-1]
+
+    return SnowflakeConnectionPool(connect=connect, size=1, timeout=1), connections
+
+def test_statement_error_keeps_the_connection():
+    pool, connections = make_pool()
+    with pytest.raises(errors.ProgrammingError):
+        with pool.connection():
+            raise errors.ProgrammingError("SQL compilation error", errno=1003)
+    with pool.connection() as connection:
+        assert connection is connections[0]
+    assert pool.stats()["discarded"] == 0
+
+@pytest.mark.parametrize("errno", [390112, 390114])
+def test_expired_session_discards_the_connection(errno):
+    pool, connections = make_pool()
+    with pytest.raises(errors.ProgrammingError):
+        with pool.connection():
+            raise errors.ProgrammingError("Authentication token has expired", errno=errno)
+    assert connections[0].closed
+    with pool.connection() as connection:
+        assert connection is connections[1]
+    assert pool.stats()["discarded"] == 1
@@ -0,0 +1,35 @@
+# utils/concurrency.py
+
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+# Blocking calls made from async handlers run on bounded pools instead of the event loop.
+# Short calls (S3, Snowflake, vector-store lookups, LLM queries) and PDF ingestion use
+# separate pools, so an ingestion can never take the threads queries need.
+BLOCKING_IO_MAX_WORKERS = int(os.getenv("BLOCKING_IO_MAX_WORKERS", "32"))
+
+# Every ingestion runs as a job of utils.ingestion_jobs on this one pool (the synchronous
+# /process-pdf and /reload-pdf endpoints submit a job and wait for it). Each ingestion parses
+# pages with up to PDF_PARSE_MAX_WORKERS processes, so at most INGESTION_MAX_WORKERS * PDF_PARSE_MAX_WORKERS parse processes exist at once.
+INGESTION_MAX_WORKERS = int(os.getenv("INGESTION_MAX_WORKERS", "2"))
+
+io_executor = ThreadPoolExecutor(max_workers=BLOCKING_IO_MAX_WORKERS, thread_name_prefix="blocking-io")
+ingestion_executor = ThreadPoolExecutor(max_workers=INGESTION_MAX_WORKERS, thread_name_prefix="ingestion")
+
+# Marks the end of an iterator consumed through `iterate_blocking`
+_EXHAUSTED = object()
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking call on the I/O pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(io_executor, functools.partial(func, *args, **kwargs))
+
+async def iterate_blocking(iterator):
+    """Consume a blocking iterator (e.g. an LLM token stream) on the I/O pool, one item at a time."""
+    while True:
+        item = await run_blocking(next, iterator, _EXHAUSTED)
+        if item is _EXHAUSTED:
+            break
+        yield item
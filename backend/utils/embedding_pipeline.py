@@ -0,0 +1,133 @@
+# utils/embedding_pipeline.py
+
+import os
+import time
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from llama_index.core.schema import MetadataMode
+from utils.nvidia_client import nvidia_rate_limiter, error_status_code
+from utils.instrumentation import remote_call_span, count
+
+# Embedding tuning knobs
+EMBED_TOKEN_BUDGET = int(os.getenv("EMBED_TOKEN_BUDGET", "8000"))
+EMBED_MIN_TOKEN_BUDGET = int(os.getenv("EMBED_MIN_TOKEN_BUDGET", "500"))
+EMBED_MAX_BATCH_SIZE = int(os.getenv("EMBED_MAX_BATCH_SIZE", "50"))
+EMBED_MAX_IN_FLIGHT = int(os.getenv("EMBED_MAX_IN_FLIGHT", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+
+# Rough characters-per-token ratio used to estimate batch sizes without a tokenizer
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text):
+    """Estimate the number of tokens in a text."""
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+class AdaptiveBatchSizer:
+    """
+    Token budget per batch that shrinks on 413/429 responses and slowly grows back on success.
+
+    This is additive-increase / multiplicative-decrease, so a burst of rate limiting halves the
+    batch size quickly while a run of successes recovers it one step at a time.
+    """
+
+    def __init__(self, token_budget=EMBED_TOKEN_BUDGET, min_token_budget=EMBED_MIN_TOKEN_BUDGET):
+        self.max_token_budget = token_budget
+        self.min_token_budget = min_token_budget
+        self.token_budget = token_budget
+        self._lock = threading.Lock()
+
+    def shrink(self):
+        with self._lock:
+            self.token_budget = max(self.min_token_budget, self.token_budget // 2)
+
+    def grow(self):
+        with self._lock:
+            self.token_budget = min(self.max_token_budget, self.token_budget + self.max_token_budget // 10)
+
+def _next_batch(pending, sizer):
+    """Pop the next batch of (node, text) pairs that fits in the current token budget."""
+    batch = []
+    batch_tokens = 0
+    while pending and len(batch) < EMBED_MAX_BATCH_SIZE:
+        tokens = estimate_tokens(pending[0][1])
+        if batch and batch_tokens + tokens > sizer.token_budget:
+            break
+        batch.append(pending.popleft())
+        batch_tokens += tokens
+    return batch
+
+def _embed_batch(embed_model, texts):
+    """Embed one batch once the shared NVIDIA rate limiter allows another request."""
+    nvidia_rate_limiter.acquire()
+    with remote_call_span("embeddings", texts=len(texts)):
+        embeddings = embed_model.get_text_embedding_batch(texts)
+    count("embedded_chunks", len(texts))
+    return embeddings
+
+def embed_nodes(nodes, embed_model, max_in_flight=None, sizer=None, progress=None):
+    """
+    Embed nodes in token-budgeted batches with several batches in flight at once.
+
+    Batches that fail with 413 (payload too large) or 429 (rate limited) are put back
+    in the queue and re-split with a smaller token budget. Returns a stats dict with
+    the number of embeddings, requests, retries and the achieved embeddings/sec.
+    `progress("embed", done, total)` is called after every successful batch.
+    """
+    max_in_flight = max_in_flight or EMBED_MAX_IN_FLIGHT
+    sizer = sizer or AdaptiveBatchSizer()
+    pending = deque(
+        (node, node.get_content(metadata_mode=MetadataMode.EMBED))
+        for node in nodes if node.embedding is None
+    )
+    total = len(pending)
+    stats = {"embeddings": 0, "requests": 0, "retries": 0}
+    start_time = time.perf_counter()
+    consecutive_failures = 0
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        in_flight = {}
+        while pending or in_flight:
+            while pending and len(in_flight) < max_in_flight:
+                batch = _next_batch(pending, sizer)
+                # Each batch runs in a copy of the caller's context, so its spans keep the pdf_id
+                future = executor.submit(contextvars.copy_context().run, _embed_batch, embed_model, [text for _, text in batch])
+                in_flight[future] = batch
+                stats["requests"] += 1
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch = in_flight.pop(future)
+                try:
+                    embeddings = future.result()
+                except Exception as e:
+                    status_code = error_status_code(e)
+                    consecutive_failures += 1
+                    if status_code not in (413, 429) or consecutive_failures > EMBED_MAX_RETRIES:
+                        raise
+                    if status_code == 413 and len(batch) == 1:
+                        raise
+                    sizer.shrink()
+                    stats["retries"] += 1
+                    print(f"Embedding batch of {len(batch)} failed with {status_code}; "
+                          f"retrying with a token budget of {sizer.token_budget}")
+                    if status_code == 429:
+                        time.sleep(min(2 ** consecutive_failures, 30))
+                    pending.extendleft(reversed(batch))
+                    continue
+
+                consecutive_failures = 0
+                sizer.grow()
+                for (node, _), embedding in zip(batch, embeddings):
+                    node.embedding = embedding
+                stats["embeddings"] += len(batch)
+                if progress:
+                    progress("embed", stats["embeddings"], total)
+
+    elapsed = time.perf_counter() - start_time
+    stats["seconds"] = elapsed
+    stats["embeddings_per_second"] = stats["embeddings"] / elapsed if elapsed > 0 else 0.0
+    print(f"Embedded {stats['embeddings']} chunks in {elapsed:.1f}s "
+          f"({stats['embeddings_per_second']:.1f} embeddings/sec, {stats['requests']} requests, {stats['retries']} retries)")
+    return stats
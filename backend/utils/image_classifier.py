@@ -0,0 +1,92 @@
+# utils/image_classifier.py
+
+from io import BytesIO
+import numpy as np
+from PIL import Image
+
+# Local image classes; photos and logos never need a remote model call
+PHOTO, LOGO, CHART, UNCERTAIN = "photo", "logo", "chart", "uncertain"
+SKIP_REMOTE_CLASSES = {PHOTO, LOGO}
+
+# Heuristic thresholds, tuned to only decide on obvious cases and defer everything else
+THUMBNAIL_SIZE = 256
+LOGO_MAX_AREA = 160 * 160
+LOGO_MAX_DISTINCT_COLORS = 8
+BANNER_ASPECT_RATIO = 5.0
+# Small or banner-shaped images are only logos if they also look like flat artwork;
+# small inline charts and sparklines still reach DePlot or NeVA
+SMALL_LOGO_MAX_DISTINCT_COLORS = 16
+PHOTO_MIN_DISTINCT_COLORS = 200
+PHOTO_MAX_TOP16_SHARE = 0.5
+CHART_MIN_BACKGROUND_SHARE = 0.5
+CHART_MIN_TOP16_SHARE = 0.9
+CHART_MIN_BACKGROUND_BRIGHTNESS = 200
+CHART_EDGE_DENSITY_RANGE = (0.01, 0.2)
+EDGE_THRESHOLD = 40
+
+def compute_image_statistics(image_content):
+    """Compute cheap colour, edge and shape statistics of an image with NumPy."""
+    img = Image.open(BytesIO(image_content))
+    width, height = img.size
+    img = img.convert("RGB")
+    img.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+    rgb = np.asarray(img, dtype=np.int32)
+
+    # Colour histogram over 4 bits per channel (4096 bins)
+    quantized = rgb >> 4
+    codes = (quantized[..., 0] << 8) | (quantized[..., 1] << 4) | quantized[..., 2]
+    counts = np.bincount(codes.ravel(), minlength=4096)
+    total = counts.sum()
+    sorted_counts = np.sort(counts)[::-1]
+    dominant_code = int(counts.argmax())
+    dominant_rgb = np.array([dominant_code >> 8, (dominant_code >> 4) & 0xF, dominant_code & 0xF]) * 16 + 8
+
+    # Edge density from horizontal and vertical intensity gradients
+    gray = rgb.mean(axis=2)
+    horizontal_edges = np.abs(np.diff(gray, axis=1)) > EDGE_THRESHOLD
+    vertical_edges = np.abs(np.diff(gray, axis=0)) > EDGE_THRESHOLD
+    edge_density = (horizontal_edges.mean() + vertical_edges.mean()) / 2 if gray.size > 1 else 0.0
+
+    return {
+        "width": width,
+        "height": height,
+        "aspect_ratio": width / height if height else 0.0,
+        "distinct_colors": int((counts > total * 0.001).sum()),
+        "background_share": float(sorted_counts[0] / total),
+        "background_brightness": float(dominant_rgb.mean()),
+        "top16_share": float(sorted_counts[:16].sum() / total),
+        "edge_density": float(edge_density)
+    }
+
+def classify_image_locally(image_content):
+    """
+    Pre-classify an image as a photo, logo, chart or uncertain using local statistics only.
+
+    Only obvious cases are decided locally; anything ambiguous is returned as
+    `UNCERTAIN` so that the remote model makes the call. Size and shape alone never
+    rule an image out: small or banner-shaped images that look like charts are still
+    described.
+    """
+    try:
+        stats = compute_image_statistics(image_content)
+    except Exception as e:
+        print(f"Error computing image statistics: {e}")
+        return UNCERTAIN
+
+    if (stats["background_share"] >= CHART_MIN_BACKGROUND_SHARE
+            and stats["background_brightness"] >= CHART_MIN_BACKGROUND_BRIGHTNESS
+            and stats["top16_share"] >= CHART_MIN_TOP16_SHARE
+            and CHART_EDGE_DENSITY_RANGE[0] <= stats["edge_density"] <= CHART_EDGE_DENSITY_RANGE[1]):
+        return CHART
+
+    aspect_ratio = stats["aspect_ratio"]
+    small = stats["width"] * stats["height"] <= LOGO_MAX_AREA
+    banner = aspect_ratio >= BANNER_ASPECT_RATIO or (aspect_ratio and aspect_ratio <= 1 / BANNER_ASPECT_RATIO)
+    if ((small or banner) and stats["distinct_colors"] <= SMALL_LOGO_MAX_DISTINCT_COLORS
+            and stats["edge_density"] <= CHART_EDGE_DENSITY_RANGE[1]):
+        return LOGO
+    if stats["distinct_colors"] <= LOGO_MAX_DISTINCT_COLORS and stats["edge_density"] < CHART_EDGE_DENSITY_RANGE[0]:
+        return LOGO
+    if stats["distinct_colors"] >= PHOTO_MIN_DISTINCT_COLORS and stats["top16_share"] <= PHOTO_MAX_TOP16_SHARE:
+        return PHOTO
+    return UNCERTAIN
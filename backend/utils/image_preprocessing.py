@@ -0,0 +1,166 @@
+# utils/image_preprocessing.py
+
+import os
+import time
+import base64
+import hashlib
+import threading
+from io import BytesIO
+from collections import OrderedDict
+from dataclasses import dataclass
+from PIL import Image
+
+# Longest side sent to the vision models; NeVA and DePlot downsample larger inputs anyway
+VLM_MAX_IMAGE_SIDE = int(os.getenv("VLM_MAX_IMAGE_SIDE", "1024"))
+
+# NVIDIA endpoints only accept inline base64 images up to this many characters
+VLM_MAX_B64_CHARS = int(os.getenv("VLM_MAX_B64_CHARS", "180000"))
+
+# JPEG quality starts high and is lowered step by step until the image fits the inline limit
+VLM_JPEG_QUALITY = int(os.getenv("VLM_JPEG_QUALITY", "85"))
+VLM_MIN_JPEG_QUALITY = 50
+JPEG_QUALITY_STEP = 10
+DOWNSCALE_STEP = 0.75
+
+# Images with at most this many colours (tables, line charts, diagrams) are tried as PNG first,
+# which keeps text edges sharp and is usually smaller than JPEG for flat colours
+PNG_MAX_COLORS = 256
+
+# In-memory cache of encoded images, so NeVA, DePlot and retries never re-encode the same image
+VLM_ENCODED_CACHE_MAX_BYTES = int(os.getenv("VLM_ENCODED_CACHE_MAX_BYTES", str(64 * 1024 ** 2)))
+
+# Assumed upload bandwidth, only used to estimate the upload time saved by smaller payloads
+VLM_UPLOAD_BYTES_PER_SECOND = float(os.getenv("VLM_UPLOAD_BYTES_PER_SECOND", str(2 * 1024 ** 2)))
+
+# Part of the response cache key: responses obtained with other preprocessing settings are not reused
+PREPROCESSING_SIGNATURE = f"max_side={VLM_MAX_IMAGE_SIDE};max_b64={VLM_MAX_B64_CHARS};quality={VLM_JPEG_QUALITY}"
+
+@dataclass
+class EncodedImage:
+    """An image ready to be inlined into a VLM payload."""
+    b64: str
+    mime_type: str
+    original_bytes: int
+    encoded_bytes: int
+    encode_seconds: float
+
+def _encode(img, image_format, quality=None):
+    buffered = BytesIO()
+    if image_format == "PNG":
+        img.save(buffered, format="PNG", optimize=True)
+    else:
+        img.save(buffered, format="JPEG", quality=quality, optimize=True)
+    return buffered.getvalue()
+
+def _b64_length(nbytes):
+    return 4 * ((nbytes + 2) // 3)
+
+def _encode_within_limit(img, max_b64_chars):
+    """Return (bytes, mime type), lowering JPEG quality and then resolution until the payload fits."""
+    if img.getcolors(PNG_MAX_COLORS) is not None:
+        png = _encode(img.convert("P", palette=Image.ADAPTIVE) if img.mode == "RGB" else img, "PNG")
+        if _b64_length(len(png)) <= max_b64_chars:
+            return png, "image/png"
+
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    while True:
+        quality = VLM_JPEG_QUALITY
+        while True:
+            jpeg = _encode(img, "JPEG", quality)
+            if _b64_length(len(jpeg)) <= max_b64_chars or quality <= VLM_MIN_JPEG_QUALITY:
+                break
+            quality = max(VLM_MIN_JPEG_QUALITY, quality - JPEG_QUALITY_STEP)
+        if _b64_length(len(jpeg)) <= max_b64_chars or min(img.size) <= 64:
+            return jpeg, "image/jpeg"
+        img = img.resize((max(1, int(img.width * DOWNSCALE_STEP)), max(1, int(img.height * DOWNSCALE_STEP))), Image.LANCZOS)
+
+class ImagePreprocessor:
+    """
+    Downscales and re-encodes images for the vision models, with a byte-bounded LRU cache.
+
+    Images are resized to `max_side` and encoded as PNG (few colours) or JPEG with the
+    highest quality that fits the inline payload limit. Counters track the bytes saved
+    against the original images and the encoding time saved by cache hits.
+    """
+
+    def __init__(self, max_side=VLM_MAX_IMAGE_SIDE, max_b64_chars=VLM_MAX_B64_CHARS, cache_max_bytes=VLM_ENCODED_CACHE_MAX_BYTES):
+        self.max_side = max_side
+        self.max_b64_chars = max_b64_chars
+        self.cache_max_bytes = cache_max_bytes
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "images": 0,
+            "cache_hits": 0,
+            "original_bytes": 0,
+            "encoded_bytes": 0,
+            "encode_seconds": 0.0,
+            "encode_seconds_saved": 0.0
+        }
+
+    def encode(self, image_content):
+        """Return the `EncodedImage` for raw image bytes, encoding it only on the first request."""
+        key = hashlib.sha256(image_content).digest()
+        with self._lock:
+            encoded = self._cache.get(key)
+            if encoded is not None:
+                self._cache.move_to_end(key)
+                self._stats["cache_hits"] += 1
+                self._stats["encode_seconds_saved"] += encoded.encode_seconds
+                return encoded
+
+        start_time = time.perf_counter()
+        img = Image.open(BytesIO(image_content))
+        original_format = img.format
+        # JPEGs that already fit (e.g. rendered table crops) are sent as they are, without decoding them
+        if (original_format == "JPEG" and max(img.size) <= self.max_side
+                and _b64_length(len(image_content)) <= self.max_b64_chars):
+            return self._remember(key, image_content, image_content, "image/jpeg", start_time)
+        img.load()
+        resized = max(img.size) > self.max_side
+        if resized:
+            img.thumbnail((self.max_side, self.max_side), Image.LANCZOS)
+        if img.mode not in ("RGB", "L", "P"):
+            img = img.convert("RGB")
+        data, mime_type = _encode_within_limit(img, self.max_b64_chars)
+        # Small JPEG/PNG originals that already fit are sent untouched if re-encoding does not help
+        if (not resized and original_format in ("JPEG", "PNG") and len(image_content) <= len(data)
+                and _b64_length(len(image_content)) <= self.max_b64_chars):
+            data, mime_type = image_content, f"image/{original_format.lower()}"
+        return self._remember(key, image_content, data, mime_type, start_time)
+
+    def _remember(self, key, image_content, data, mime_type, start_time):
+        """Build the `EncodedImage` for `data`, count it and add it to the cache."""
+        encoded = EncodedImage(
+            b64=base64.b64encode(data).decode("utf-8"),
+            mime_type=mime_type,
+            original_bytes=len(image_content),
+            encoded_bytes=len(data),
+            encode_seconds=time.perf_counter() - start_time
+        )
+
+        with self._lock:
+            self._stats["images"] += 1
+            self._stats["original_bytes"] += encoded.original_bytes
+            self._stats["encoded_bytes"] += encoded.encoded_bytes
+            self._stats["encode_seconds"] += encoded.encode_seconds
+            if key not in self._cache:
+                self._cache[key] = encoded
+                self._cache_bytes += len(encoded.b64)
+            while self._cache_bytes > self.cache_max_bytes and self._cache:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted.b64)
+        return encoded
+
+    def stats(self):
+        """Return the counters plus bytes saved and an estimate of the upload time saved."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["bytes_saved"] = stats["original_bytes"] - stats["encoded_bytes"]
+        stats["estimated_upload_seconds_saved"] = stats["bytes_saved"] / VLM_UPLOAD_BYTES_PER_SECOND
+        return stats
+
+# Process-wide preprocessor shared by the sync helpers and the async enrichment stage
+image_preprocessor = ImagePreprocessor()
@@ -0,0 +1,94 @@
+# utils/incremental_index.py
+
+import json
+import hashlib
+from collections import Counter
+from llama_index.core.schema import MetadataMode, RelatedNodeInfo
+from utils.embedding_pipeline import embed_nodes
+from utils.instrumentation import stage_span
+from utils.vector_store import get_metadata_values, upsert_nodes, delete_nodes, delete_collection
+
+# Metadata key holding the content hash of a chunk; it is excluded from the embedded and LLM text
+CHUNK_HASH_KEY = "chunk_hash"
+
+def chunk_id(i, document):
+    """
+    Deterministic node id for the i-th chunk of a document, e.g. `publication_12-page3-block2-chunk0`.
+
+    Used as the splitter's `id_func`, so re-parsing the same document yields the same ids
+    and a chunk's vector is replaced in place instead of being added next to the old one.
+    """
+    return f"{document.id_}-chunk{i}"
+
+def compute_chunk_hash(node, embed_model_name):
+    """SHA-256 of a chunk's text, metadata and embedding model: equal hashes mean the stored vector is current."""
+    metadata = {key: value for key, value in node.metadata.items() if key != CHUNK_HASH_KEY}
+    payload = json.dumps(
+        {"model": embed_model_name, "text": node.get_content(metadata_mode=MetadataMode.NONE), "metadata": metadata},
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def stamp_chunk_hashes(nodes, embed_model_name):
+    """Store the chunk hash in every node's metadata, hidden from the embedded and LLM text."""
+    for node in nodes:
+        node.metadata[CHUNK_HASH_KEY] = compute_chunk_hash(node, embed_model_name)
+        if CHUNK_HASH_KEY not in node.excluded_embed_metadata_keys:
+            node.excluded_embed_metadata_keys.append(CHUNK_HASH_KEY)
+        if CHUNK_HASH_KEY not in node.excluded_llm_metadata_keys:
+            node.excluded_llm_metadata_keys.append(CHUNK_HASH_KEY)
+    return nodes
+
+def assign_content_ids(nodes, prefix):
+    """
+    Re-id stamped nodes by content, e.g. `research-notes-12-3f2a9c0e4b7d1a65`, keeping their links consistent.
+
+    For free-form text such as research notes, where an edit near the start would shift every
+    positional `chunk_id` after it, so that unchanged chunks keep their ids (and vectors)
+    wherever they move. Repeated identical chunks get an occurrence suffix (`-2`, `-3`, ...).
+    """
+    occurrences = Counter()
+    new_ids = {}
+    for node in nodes:
+        digest = node.metadata[CHUNK_HASH_KEY][:16]
+        occurrences[digest] += 1
+        suffix = f"-{occurrences[digest]}" if occurrences[digest] > 1 else ""
+        new_ids[node.node_id] = f"{prefix}-{digest}{suffix}"
+    for node in nodes:
+        node.id_ = new_ids[node.node_id]
+        for relationship in node.relationships.values():
+            if isinstance(relationship, RelatedNodeInfo) and relationship.node_id in new_ids:
+                relationship.node_id = new_ids[relationship.node_id]
+    return nodes
+
+def sync_collection(index_type, pdf_id, nodes, embed_model=None, progress=None):
+    """
+    Make a collection hold exactly `nodes`, writing only what changed.
+
+    The stored chunk hashes are diffed against the new ones: nodes whose id is new or whose
+    hash differs are embedded (if `embed_model` is given and they carry no embedding yet) and upserted, ids that are no longer
+    produced are deleted, and unchanged chunks are not touched. Nodes must carry stable ids
+    (`chunk_id` or `assign_content_ids`) and chunk hashes (`stamp_chunk_hashes`). Returns the number of unchanged,
+    upserted and deleted vectors.
+    """
+    existing = get_metadata_values(index_type, pdf_id, CHUNK_HASH_KEY)
+    if not nodes:
+        if existing:
+            delete_collection(index_type, pdf_id)
+        return {"unchanged": 0, "upserted": 0, "deleted": len(existing)}
+
+    node_ids = {node.node_id for node in nodes}
+    changed = [node for node in nodes if existing.get(node.node_id) != node.metadata[CHUNK_HASH_KEY]]
+    stale = [node_id for node_id in existing if node_id not in node_ids]
+
+    if embed_model is not None and changed:
+        with stage_span("embed", chunks=len(changed)):
+            embed_nodes(changed, embed_model, progress=progress)
+    if changed:
+        upsert_nodes(index_type, pdf_id, changed)
+    delete_nodes(index_type, pdf_id, stale)
+
+    stats = {"unchanged": len(nodes) - len(changed), "upserted": len(changed), "deleted": len(stale)}
+    print(f"Synced {index_type}-{pdf_id}: {stats['upserted']} upserted, {stats['deleted']} deleted, {stats['unchanged']} unchanged")
+    return stats
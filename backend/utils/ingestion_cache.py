@@ -0,0 +1,138 @@
+# utils/ingestion_cache.py
+
+import os
+import json
+import shutil
+import sqlite3
+import hashlib
+import threading
+import time
+from llama_index.core.schema import TextNode
+
+# Bump this whenever get_pdf_documents changes the shape or content of its output,
+# so that entries produced by an older parser are never served again
+PARSER_VERSION = "6"
+
+# Persistent cache location (kept outside .cache, which only holds per-ingestion scratch space)
+INGESTION_CACHE_DIR = os.getenv("INGESTION_CACHE_DIR", os.path.join(os.getcwd(), ".ingestion_cache"))
+INGESTION_CACHE_MAX_BYTES = int(os.getenv("INGESTION_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+def compute_cache_key(pdf_content, *version_parts):
+    """
+    Build a content-addressed cache key from the PDF bytes plus parser and model versions.
+
+    Nodes carry the ids and file name of the publication they were parsed for, so callers
+    include the publication ID among `version_parts`.
+    """
+    digest = hashlib.sha256(pdf_content)
+    digest.update(f"|parser={PARSER_VERSION}".encode("utf-8"))
+    for part in version_parts:
+        digest.update(f"|{part}".encode("utf-8"))
+    return digest.hexdigest()
+
+def _directory_size(path):
+    """Return the total size in bytes of all files below a directory."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+class IngestionCache:
+    """
+    Disk-backed, size-bounded LRU cache of processed PDFs.
+
+    Each entry is a directory named after the cache key holding the chunked nodes (with
+    the embeddings computed so far), which is all a repeat ingestion needs to update the
+    index. Parsed documents and table/image artifacts are not kept: the artifacts live in
+    the per-ingestion scratch directory (and in S3 when uploads are enabled). A small
+    SQLite manifest tracks entry sizes and last access times so that eviction survives restarts.
+    """
+
+    def __init__(self, cache_dir=INGESTION_CACHE_DIR, max_bytes=INGESTION_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(self.cache_dir, "manifest.db"), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, size_bytes INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key):
+        """Look up a processed PDF by cache key; returns its nodes on a hit and `None` on a miss."""
+        entry_dir = self._entry_dir(key)
+        with self._lock:
+            row = self._conn.execute("SELECT key FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or not os.path.isdir(entry_dir):
+                return None
+            self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+
+        try:
+            with open(os.path.join(entry_dir, "nodes.json"), "r", encoding="utf-8") as f:
+                nodes = [TextNode.from_dict(n) for n in json.load(f)]
+        except Exception as e:
+            print(f"Error reading ingestion cache entry {key}: {e}")
+            self.delete(key)
+            return None
+
+        return nodes
+
+    def put(self, key, nodes):
+        """Store the nodes of a processed PDF."""
+        entry_dir = self._entry_dir(key)
+        staging_dir = f"{entry_dir}.tmp-{os.getpid()}-{threading.get_ident()}"
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        os.makedirs(staging_dir)
+
+        try:
+            with open(os.path.join(staging_dir, "nodes.json"), "w", encoding="utf-8") as f:
+                json.dump([node.to_dict() for node in nodes], f)
+            size_bytes = _directory_size(staging_dir)
+
+            with self._lock:
+                # Write to a staging directory first so readers never see a partial entry
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                os.replace(staging_dir, entry_dir)
+                now = time.time()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, size_bytes, created_at, last_access) VALUES (?, ?, ?, ?)",
+                    (key, size_bytes, now, now)
+                )
+                self._conn.commit()
+                self._evict()
+        except Exception as e:
+            print(f"Error writing ingestion cache entry {key}: {e}")
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+    def delete(self, key):
+        """Remove a single entry from the cache."""
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._conn.commit()
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+
+    def _evict(self):
+        """Evict least recently used entries until the cache fits in `max_bytes`. Caller holds the lock."""
+        total = self._conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size_bytes in self._conn.execute(
+            "SELECT key, size_bytes FROM entries ORDER BY last_access ASC"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            total -= size_bytes
+        self._conn.commit()
+
+# Process-wide cache instance shared by the routers
+ingestion_cache = IngestionCache()
@@ -0,0 +1,219 @@
+# utils/ingestion_jobs.py
+
+import os
+import json
+import asyncio
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from utils.concurrency import ingestion_executor
+from utils.scratch_space import PROCESS_TOKEN, pid_alive
+
+# Persisted job table; jobs run on the shared ingestion pool (see INGESTION_MAX_WORKERS)
+INGESTION_JOBS_DB = os.getenv("INGESTION_JOBS_DB", os.path.join(os.getcwd(), ".ingestion_jobs", "jobs.db"))
+
+# Progress updates are written to the job table at most this often per job
+PROGRESS_WRITE_INTERVAL_SECONDS = 0.5
+
+# How often `wait` re-reads a job that is still queued or running
+JOB_POLL_INTERVAL_SECONDS = 0.5
+
+# Job states
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+JOB_COLUMNS = (
+    "job_id", "pdf_id", "pdf_link", "reload", "status", "stage", "progress", "error", "error_status",
+    "result", "owner_pid", "owner_token", "created_at", "updated_at"
+)
+
+# Columns added after the first version of the table, created on existing databases at startup
+_ADDED_COLUMNS = (("error_status", "INTEGER"), ("result", "TEXT"), ("owner_pid", "INTEGER"), ("owner_token", "TEXT"))
+
+def _is_orphaned(owner_pid, owner_token):
+    """Whether a job's owning process is gone (or the PID now belongs to a later process)."""
+    if owner_pid is None:
+        return True
+    if owner_pid == os.getpid():
+        return owner_token != PROCESS_TOKEN
+    return not pid_alive(owner_pid)
+
+class JobProgress:
+    """
+    Progress callback handed to the ingestion pipeline.
+
+    Calling `progress(stage, done, total)` records per-stage counters (e.g. pages parsed,
+    images described, chunks embedded) and persists them, throttled, to the job table.
+    """
+
+    def __init__(self, manager, job_id):
+        self.manager = manager
+        self.job_id = job_id
+        self.stages = {}
+        self.current_stage = None
+        self._last_write = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, stage, done=0, total=0):
+        with self._lock:
+            stage_changed = stage != self.current_stage
+            self.current_stage = stage
+            self.stages[stage] = {"done": done, "total": total}
+            now = time.monotonic()
+            if not stage_changed and done < total and now - self._last_write < PROGRESS_WRITE_INTERVAL_SECONDS:
+                return
+            self._last_write = now
+            stage, stages = self.current_stage, dict(self.stages)
+        self.manager._update(self.job_id, stage=stage, progress=json.dumps(stages))
+
+class IngestionJobManager:
+    """
+    Background ingestion queue backed by the shared ingestion pool and a persisted SQLite job table.
+
+    Submitting a PDF returns a job id immediately. Concurrent submissions for a pdf_id that
+    already has a queued or running job are deduplicated onto that job, unless a reload is
+    requested and that job is not one: the reload is then queued as a new job. Jobs for the
+    same pdf_id run one after the other; a follow-up job is only handed to the pool once the
+    previous one has finished, so it never holds a worker while it waits.
+
+    Each job records the process that owns it (PID plus a per-boot token). Several server
+    processes can share the table: a process only marks a queued or running job as failed
+    when its owner is no longer running. Per-PDF ordering holds within the owning process.
+    """
+
+    def __init__(self, db_path=INGESTION_JOBS_DB, executor=ingestion_executor):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._executor = executor
+        # pdf_id -> (job_id, run) of its running job followed by the jobs queued behind it
+        self._pdf_queues = {}
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, pdf_id TEXT NOT NULL, pdf_link TEXT NOT NULL, reload INTEGER NOT NULL, "
+            "status TEXT NOT NULL, stage TEXT, progress TEXT NOT NULL DEFAULT '{}', error TEXT, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for name, column_type in _ADDED_COLUMNS:
+            if name not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {column_type}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_pdf_id ON jobs (pdf_id, status)")
+        self._conn.commit()
+        self._fail_orphaned_jobs()
+
+    def _fail_orphaned_jobs(self):
+        """Mark queued or running jobs whose owning process has stopped as failed; they will never finish."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_id, owner_pid, owner_token FROM jobs WHERE status IN (?, ?)", ACTIVE_STATES
+            ).fetchall()
+            orphaned = [(job_id,) for job_id, owner_pid, owner_token in rows if _is_orphaned(owner_pid, owner_token)]
+            self._conn.executemany(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE job_id = ?",
+                [(FAILED, "Interrupted by a server restart.", time.time(), job_id) for job_id, in orphaned]
+            )
+            self._conn.commit()
+        if orphaned:
+            print(f"Marked {len(orphaned)} interrupted ingestion job(s) as failed")
+
+    def _update(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id))
+            self._conn.commit()
+
+    def _select(self, where, params):
+        return self._conn.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE {where}", params).fetchone()
+
+    def _row_to_job(self, row):
+        if row is None:
+            return None
+        job = dict(zip(JOB_COLUMNS, row))
+        del job["owner_pid"], job["owner_token"]
+        job["reload"] = bool(job["reload"])
+        job["progress"] = json.loads(job["progress"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def get(self, job_id):
+        """Return a job record, or None if the job id is unknown."""
+        with self._lock:
+            row = self._select("job_id = ?", (job_id,))
+        return self._row_to_job(row)
+
+    async def wait(self, job_id, poll_interval=JOB_POLL_INTERVAL_SECONDS):
+        """Wait until a job has succeeded or failed, whichever process runs it, and return its record."""
+        job = self.get(job_id)
+        while job is not None and job["status"] in ACTIVE_STATES:
+            await asyncio.sleep(poll_interval)
+            job = self.get(job_id)
+        return job
+
+    def submit(self, pdf_id, pdf_link, run, reload=False):
+        """
+        Queue `run(progress)` as an ingestion job for a PDF and return its job record.
+
+        If the PDF already has a queued or running job that satisfies the request (any job
+        for a normal submission, a reload job for a reload), that job is returned instead.
+        The value returned by `run` is stored as the job's `result`.
+        """
+        with self._lock:
+            where = "pdf_id = ? AND status IN (?, ?)" + (" AND reload = 1" if reload else "")
+            row = self._select(where + " ORDER BY created_at DESC LIMIT 1", (pdf_id, *ACTIVE_STATES))
+            if row is not None:
+                job = dict(zip(JOB_COLUMNS, row))
+                if not _is_orphaned(job["owner_pid"], job["owner_token"]):
+                    return self._row_to_job(row)
+                # Its process died after this one started: the job will never finish
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE job_id = ?",
+                    (FAILED, "Interrupted by a server restart.", time.time(), job["job_id"])
+                )
+            job_id = uuid.uuid4().hex
+            now = time.time()
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, pdf_id, pdf_link, reload, status, owner_pid, owner_token, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, pdf_id, pdf_link, int(reload), QUEUED, os.getpid(), PROCESS_TOKEN, now, now)
+            )
+            self._conn.commit()
+            # A job queued behind another one for the same PDF is started when that one finishes
+            queue = self._pdf_queues.setdefault(pdf_id, deque())
+            queue.append((job_id, run))
+            start = len(queue) == 1
+
+        if start:
+            self._executor.submit(self._run_job, job_id, pdf_id, run)
+        return self.get(job_id)
+
+    def _run_job(self, job_id, pdf_id, run):
+        try:
+            self._update(job_id, status=RUNNING)
+            try:
+                result = run(JobProgress(self, job_id))
+            except Exception as e:
+                detail = getattr(e, "detail", None) or str(e)
+                print(f"Ingestion job {job_id} failed: {detail}")
+                self._update(job_id, status=FAILED, error=detail, error_status=getattr(e, "status_code", 500))
+            else:
+                self._update(job_id, status=SUCCEEDED, result=json.dumps(result, default=str))
+        finally:
+            self._start_next(pdf_id)
+
+    def _start_next(self, pdf_id):
+        """Hand the next job queued for a PDF to the pool, behind the jobs of other PDFs."""
+        with self._lock:
+            queue = self._pdf_queues[pdf_id]
+            queue.popleft()
+            if not queue:
+                del self._pdf_queues[pdf_id]
+                return
+            job_id, run = queue[0]
+        self._executor.submit(self._run_job, job_id, pdf_id, run)
+
+# Process-wide job manager shared by the routers
+ingestion_jobs = IngestionJobManager()
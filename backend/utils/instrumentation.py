@@ -0,0 +1,265 @@
+# utils/instrumentation.py
+
+import os
+import time
+import math
+import threading
+import contextvars
+from contextlib import contextmanager
+
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+# Set OTEL_TRACES_ENABLED=1 to also emit OpenTelemetry spans; the tracer provider and exporter are
+# configured by the deployment (e.g. `opentelemetry-instrument uvicorn ...`), otherwise spans are no-ops
+OTEL_TRACES_ENABLED = os.getenv("OTEL_TRACES_ENABLED", "0") == "1"
+TRACER_NAME = "cfa-backend.ingestion"
+
+# Histogram buckets in seconds, from a single PyMuPDF call up to a full ingestion
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# Histogram buckets in bytes for request/response payload sizes
+SIZE_BUCKETS = tuple(256 * 4 ** i for i in range(9))  # 256 B .. 16 MiB
+
+# Prometheus text exposition format served by /metrics
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_tracer = trace.get_tracer(TRACER_NAME) if trace is not None and OTEL_TRACES_ENABLED else None
+
+# PDF being ingested by the current thread, attached to every span it opens
+current_pdf_id = contextvars.ContextVar("current_pdf_id", default=None)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    """Base class of the labelled metrics: one value per combination of label values."""
+
+    metric_type = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.metric_type}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_samples(key, value) for key, value in items)
+        return "\n".join(line for line in lines if line)
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    metric_type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _render_samples(self, key, value):
+        return f"{self.name}_total{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+class Gauge(_Metric):
+    """Value that goes up and down, e.g. the number of requests in flight."""
+
+    metric_type = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def _render_samples(self, key, value):
+        return f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+class Histogram(_Metric):
+    """Cumulative bucket counts plus the sum and count of the observed values."""
+
+    metric_type = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def _render_samples(self, key, value):
+        counts, total = value
+        lines = [
+            f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', _format_value(bound))])} {count}"
+            for bound, count in zip(self.buckets, counts)
+        ]
+        lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {counts[-1]}")
+        return "\n".join(lines)
+
+class MetricsRegistry:
+    """
+    Process-local set of metrics rendered in the Prometheus text format.
+
+    Each uvicorn worker process has its own registry, so scrape every worker (or run one).
+    Page-parsing processes do not export anything themselves: their records are merged
+    into the parent's registry (see `drain_records` / `merge_records`).
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+# Process-wide registry served by the /metrics endpoint
+metrics_registry = MetricsRegistry()
+
+stage_seconds = metrics_registry.histogram(
+    "ingestion_stage_seconds", "Wall time of ingestion stages (download, parse, find_tables, embed, index, ...)", ("stage", "status")
+)
+remote_call_seconds = metrics_registry.histogram(
+    "remote_call_seconds", "Latency of calls to NVIDIA, Pinecone and other remote services", ("endpoint", "status")
+)
+items_processed = metrics_registry.counter(
+    "ingestion_items", "Items processed by the ingestion pipeline (pages, tables, images, chunks, ...)", ("item",)
+)
+
+_METRICS_BY_KIND = {"stage": (stage_seconds, "stage"), "remote": (remote_call_seconds, "endpoint")}
+
+# In page-parsing worker processes records are buffered and shipped back with each page's result
+_worker_records = None
+
+def enable_worker_recording():
+    """Buffer spans and counts in this (worker) process until `drain_records` is called."""
+    global _worker_records
+    _worker_records = []
+
+def drain_records():
+    """Return and clear the records buffered by this worker process."""
+    global _worker_records
+    records, _worker_records = _worker_records or [], []
+    return records
+
+def _record(kind, name, start_ns, end_ns, status):
+    metric, label = _METRICS_BY_KIND[kind]
+    metric.observe((end_ns - start_ns) / 1e9, **{label: name, "status": status})
+
+def merge_records(records):
+    """Replay the records of a worker process into this process's metrics and traces."""
+    pdf_id = current_pdf_id.get()
+    for record in records:
+        if record[0] == "count":
+            _, item, amount = record
+            items_processed.inc(amount, item=item)
+            continue
+        kind, name, start_ns, end_ns, status, attributes = record
+        _record(kind, name, start_ns, end_ns, status)
+        if _tracer is not None:
+            if pdf_id is not None:
+                attributes.setdefault("pdf_id", pdf_id)
+            otel_span = _tracer.start_span(name, start_time=start_ns, attributes=attributes)
+            if status == "error":
+                otel_span.set_status(trace.Status(trace.StatusCode.ERROR))
+            otel_span.end(end_time=end_ns)
+
+@contextmanager
+def _span(kind, name, attributes):
+    attributes = {key: value for key, value in attributes.items() if value is not None}
+    pdf_id = current_pdf_id.get()
+    if pdf_id is not None:
+        attributes.setdefault("pdf_id", pdf_id)
+    otel_context = _tracer.start_as_current_span(name, attributes=attributes) if _tracer is not None and _worker_records is None else None
+    otel_span = otel_context.__enter__() if otel_context is not None else None
+    start_ns = time.time_ns()
+    outcome = {"status": "ok"}
+    try:
+        yield outcome
+    except BaseException as e:
+        outcome["status"] = "error"
+        if otel_span is not None:
+            otel_span.record_exception(e)
+        raise
+    finally:
+        end_ns = time.time_ns()
+        status = outcome["status"]
+        if _worker_records is not None:
+            _worker_records.append((kind, name, start_ns, end_ns, status, attributes))
+        else:
+            _record(kind, name, start_ns, end_ns, status)
+        if otel_context is not None:
+            otel_span.set_attribute("status", status)
+            if status == "error":
+                otel_span.set_status(trace.Status(trace.StatusCode.ERROR))
+            otel_context.__exit__(None, None, None)
+
+def stage_span(stage, **attributes):
+    """
+    Time a pipeline stage (recorded in `ingestion_stage_seconds`); attributes such as `page` go to the trace.
+
+    Yields an outcome dict: set `outcome["status"]` to label the observation (exceptions set "error").
+    """
+    return _span("stage", stage, attributes)
+
+def remote_call_span(endpoint, **attributes):
+    """Time a call to a remote service (recorded in `remote_call_seconds`)."""
+    return _span("remote", endpoint, attributes)
+
+def count(item, amount=1):
+    """Count processed items, e.g. `count("pages", 12)`."""
+    if _worker_records is not None:
+        _worker_records.append(("count", item, amount))
+    else:
+        items_processed.inc(amount, item=item)
+
+@contextmanager
+def ingestion_context(pdf_id):
+    """Attach `pdf_id` to every span opened by the current thread while ingesting a PDF."""
+    token = current_pdf_id.set(str(pdf_id))
+    try:
+        yield
+    finally:
+        current_pdf_id.reset(token)
@@ -0,0 +1,107 @@
+# utils/layout_analysis.py
+
+import numpy as np
+
+# Blocks starting in the top or ending in the bottom 10% of a page are treated as headers/footers
+HEADER_FOOTER_MARGIN = 0.1
+
+# Text blocks within this fraction of the page height above/below a table or image are its caption
+CAPTION_DISTANCE = 0.1
+
+# Text blocks are grouped into chunks of at most this many characters
+GROUP_CHAR_COUNT = 500
+
+def rects_to_array(rects):
+    """Stack (x0, y0, x1, y1) rectangles (tuples or fitz.Rect) into an (n, 4) float array."""
+    return np.array([tuple(rect)[:4] for rect in rects], dtype=np.float64).reshape(-1, 4)
+
+def intersects_any(rects, others):
+    """
+    For every rectangle in `rects`, check whether it intersects any rectangle in `others`.
+
+    Matches `fitz.Rect.intersects`: the overlap must have a positive area and empty
+    rectangles never intersect. Both arguments are (n, 4) arrays; one broadcast pass.
+    """
+    if len(rects) == 0 or len(others) == 0:
+        return np.zeros(len(rects), dtype=bool)
+    a = rects[:, None, :]
+    b = others[None, :, :]
+    overlap = (
+        (np.minimum(a[..., 2], b[..., 2]) > np.maximum(a[..., 0], b[..., 0]))
+        & (np.minimum(a[..., 3], b[..., 3]) > np.maximum(a[..., 1], b[..., 1]))
+    )
+    non_empty_a = (rects[:, 2] > rects[:, 0]) & (rects[:, 3] > rects[:, 1])
+    non_empty_b = (others[:, 2] > others[:, 0]) & (others[:, 3] > others[:, 1])
+    return (overlap & non_empty_b[None, :]).any(axis=1) & non_empty_a
+
+class PageLayout:
+    """
+    Text-block geometry of one page held in NumPy arrays.
+
+    `blocks` keeps the body text blocks (in reading order) as returned by PyMuPDF;
+    `coords` holds their (x0, y0, x1, y1) rows, so caption search and overlap tests
+    are array operations instead of per-block `fitz.Rect` loops.
+    """
+
+    def __init__(self, raw_blocks, page_height, margin=HEADER_FOOTER_MARGIN):
+        self.page_height = page_height
+        coords = rects_to_array(raw_blocks)
+        is_text = np.array([block[-1] == 0 for block in raw_blocks], dtype=bool)
+        # Mask out image blocks and blocks in the header/footer bands in one pass
+        keep = is_text & (coords[:, 1] >= page_height * margin) & (coords[:, 3] <= page_height * (1 - margin))
+        self.blocks = [block for block, kept in zip(raw_blocks, keep) if kept]
+        self.coords = coords[keep]
+        self.has_text = np.array([bool(block[4]) for block in self.blocks], dtype=bool)
+        self.char_counts = np.array([len(block[4]) for block in self.blocks], dtype=np.int64)
+
+    @classmethod
+    def from_page(cls, page):
+        """Build the layout of a PyMuPDF page from its sorted text blocks."""
+        return cls(page.get_text("blocks", sort=True), page.rect.height)
+
+    def text_around(self, bbox, threshold_percentage=CAPTION_DISTANCE):
+        """
+        Return the text directly above and below a table or image bounding box.
+
+        The nearest qualifying block after the item (in reading order) ends the search,
+        and the text above is the first non-empty block before it, as in a sequential scan.
+        """
+        if not self.blocks:
+            return "", ""
+        x0, y0, x1, y1 = tuple(bbox)[:4]
+        block_y0, block_y1 = self.coords[:, 1], self.coords[:, 3]
+        vertical_distance = np.minimum(np.abs(block_y1 - y0), np.abs(block_y0 - y1))
+        near = vertical_distance <= self.page_height * threshold_percentage
+
+        below = np.flatnonzero(near & (block_y0 > y1))
+        end = below[0] if len(below) else len(self.blocks)
+        above = np.flatnonzero(near[:end] & (block_y1[:end] < y0) & self.has_text[:end])
+
+        before_text = self.blocks[above[0]][4] if len(above) else ""
+        after_text = self.blocks[below[0]][4] if len(below) else ""
+        return before_text, after_text
+
+    def group_blocks(self, char_count_threshold=GROUP_CHAR_COUNT):
+        """
+        Greedily group consecutive blocks into chunks of at most `char_count_threshold` characters.
+
+        Returns `(heading_block, content)` pairs, where the heading is the first block of each group.
+        Each group boundary depends on the previous one, so this is a single linear pass.
+        """
+        groups = []
+        start, current_char_count = 0, 0
+        for i, block_char_count in enumerate(self.char_counts.tolist()):
+            if i > start and current_char_count + block_char_count > char_count_threshold:
+                groups.append((start, i))
+                start, current_char_count = i, 0
+            current_char_count += block_char_count
+        if self.blocks:
+            groups.append((start, len(self.blocks)))
+        return [
+            (self.blocks[first], "\n".join(block[4] for block in self.blocks[first:last]))
+            for first, last in groups
+        ]
+
+    def heading_coords(self, groups):
+        """Coordinates of the heading block of every group, as an (n, 4) array."""
+        return rects_to_array([heading_block for heading_block, _ in groups])
@@ -0,0 +1,347 @@
+# utils/local_vector_store.py
+
+import os
+import json
+import fcntl
+import shutil
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, List, Optional
+import numpy as np
+from pydantic import PrivateAttr
+from llama_index.core.vector_stores.types import BasePydanticVectorStore, VectorStoreQuery, VectorStoreQueryResult
+from llama_index.core.vector_stores.utils import node_to_metadata_dict, metadata_dict_to_node
+
+# Local collections live under this directory, one sub-directory per collection (e.g. pdf-index-12)
+LOCAL_VECTOR_STORE_DIR = os.getenv("LOCAL_VECTOR_STORE_DIR", os.path.join(os.getcwd(), ".local_vectorstore"))
+
+# Collections with at least this many vectors get an IVF index; smaller ones are searched exhaustively
+LOCAL_IVF_MIN_VECTORS = int(os.getenv("LOCAL_IVF_MIN_VECTORS", "20000"))
+LOCAL_IVF_NPROBE = int(os.getenv("LOCAL_IVF_NPROBE", "8"))
+IVF_KMEANS_ITERATIONS = 10
+
+# Each write goes to a fresh `v{n}` directory and is published by atomically replacing the
+# CURRENT pointer; the previous version is kept for readers that are still opening it
+CURRENT_POINTER = "CURRENT"
+LEGACY_FILES = ("manifest.json", "nodes.json", "embeddings.f32", "ivf.npz")
+KEPT_VERSIONS = 2
+LOAD_ATTEMPTS = 3
+
+# Loaded collections shared across store instances, keyed by collection directory. The lock only
+# guards this registry; each collection has its own locks, so a write never blocks other collections
+_loaded_collections = {}
+_collections_lock = threading.Lock()
+
+def _normalize(matrix):
+    """L2-normalize rows so that cosine similarity becomes a dot product."""
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def _build_ivf(embeddings):
+    """Cluster normalized embeddings with spherical k-means and return (centroids, order, offsets)."""
+    n_lists = max(1, int(np.sqrt(len(embeddings))))
+    rng = np.random.default_rng(0)
+    centroids = embeddings[rng.choice(len(embeddings), n_lists, replace=False)].copy()
+    for _ in range(IVF_KMEANS_ITERATIONS):
+        assignments = np.argmax(embeddings @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, embeddings)
+        counts = np.bincount(assignments, minlength=n_lists)
+        non_empty = counts > 0
+        centroids[non_empty] = _normalize(sums[non_empty])
+    assignments = np.argmax(embeddings @ centroids.T, axis=1)
+    order = np.argsort(assignments, kind="stable")
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=n_lists))])
+    return centroids.astype(np.float32), order.astype(np.int64), offsets.astype(np.int64)
+
+@dataclass(frozen=True)
+class _Snapshot:
+    """
+    One published version of a collection: ids, metadata, embeddings and IVF lists.
+
+    Snapshots are never modified after they are built; a reload swaps in a new one with a
+    single assignment, so a query that reads `collection.snapshot` once sees consistent rows.
+    """
+    version: Optional[int]
+    ids: list
+    metadata: list
+    embeddings: np.ndarray
+    ivf: Optional[tuple] = None
+
+    def candidate_rows(self, query_embedding, nprobe):
+        """Rows to score exactly: all rows, or the rows of the `nprobe` closest IVF lists."""
+        if self.ivf is None:
+            return None
+        centroids, order, offsets = self.ivf
+        lists = np.argsort(centroids @ query_embedding)[::-1][:nprobe]
+        return np.concatenate([order[offsets[i]:offsets[i + 1]] for i in lists])
+
+_EMPTY_SNAPSHOT = _Snapshot(version=None, ids=[], metadata=[], embeddings=np.zeros((0, 0), dtype=np.float32))
+
+class _Collection:
+    """
+    In-memory view of a collection: the snapshot of its live version.
+
+    On disk a collection is a set of immutable version directories (`v1`, `v2`, ...)
+    and a CURRENT file naming the live one. Writers hold the collection's thread lock and
+    an exclusive file lock while they read, modify and publish a version, so threads and
+    processes sharing the directory never lose each other's updates; readers only ever
+    see a complete version.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.snapshot = _EMPTY_SNAPSHOT
+        self._write_lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    @property
+    def current_path(self):
+        return os.path.join(self.path, CURRENT_POINTER)
+
+    def _version_dir(self, version):
+        # Version 0 is a collection written before versioning, with its files in the collection directory
+        return os.path.join(self.path, f"v{version}") if version else self.path
+
+    def current_version(self):
+        """Number of the live version, or None if the collection was never written."""
+        try:
+            with open(self.current_path, "r", encoding="utf-8") as f:
+                return int(f.read().strip())
+        except FileNotFoundError:
+            return 0 if os.path.exists(os.path.join(self.path, "manifest.json")) else None
+
+    @contextmanager
+    def write_lock(self):
+        """Serialize writers across threads and processes and hand them an up-to-date view."""
+        with self._write_lock:
+            os.makedirs(self.path, exist_ok=True)
+            with open(os.path.join(self.path, ".lock"), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    self.load()
+                    yield self
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def load(self):
+        """(Re)load the collection from disk if a newer version was published since the last load."""
+        with self._load_lock:
+            for attempt in range(LOAD_ATTEMPTS):
+                version = self.current_version()
+                if version is None:
+                    self.snapshot = _EMPTY_SNAPSHOT
+                    return
+                if version == self.snapshot.version:
+                    return
+                try:
+                    self.snapshot = self._read_version(version)
+                    return
+                except FileNotFoundError:
+                    # The version was superseded and pruned while being opened; read the new one
+                    if attempt == LOAD_ATTEMPTS - 1:
+                        raise
+
+    def _read_version(self, version):
+        version_dir = self._version_dir(version)
+        with open(os.path.join(version_dir, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        with open(os.path.join(version_dir, "nodes.json"), "r", encoding="utf-8") as f:
+            nodes = json.load(f)
+        count, dim = manifest["count"], manifest["dim"]
+        if count:
+            embeddings = np.memmap(os.path.join(version_dir, "embeddings.f32"), dtype=np.float32, mode="r", shape=(count, dim))
+        else:
+            embeddings = np.zeros((0, dim), dtype=np.float32)
+        ivf = None
+        if manifest.get("ivf"):
+            with np.load(os.path.join(version_dir, "ivf.npz")) as ivf_file:
+                ivf = (ivf_file["centroids"], ivf_file["order"], ivf_file["offsets"])
+        return _Snapshot(
+            version=version,
+            ids=[node["id"] for node in nodes],
+            metadata=[node["metadata"] for node in nodes],
+            embeddings=embeddings,
+            ivf=ivf
+        )
+
+    def save(self, ids, metadata, embeddings):
+        """Write and publish a new version of the collection. Caller holds `write_lock()`."""
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        use_ivf = len(ids) >= LOCAL_IVF_MIN_VECTORS
+        version = (self.current_version() or 0) + 1
+        version_dir = self._version_dir(version)
+        shutil.rmtree(version_dir, ignore_errors=True)
+        os.makedirs(version_dir)
+
+        embeddings.tofile(os.path.join(version_dir, "embeddings.f32"))
+        if use_ivf:
+            centroids, order, offsets = _build_ivf(embeddings)
+            np.savez(os.path.join(version_dir, "ivf.npz"), centroids=centroids, order=order, offsets=offsets)
+        with open(os.path.join(version_dir, "nodes.json"), "w", encoding="utf-8") as f:
+            json.dump([{"id": node_id, "metadata": meta} for node_id, meta in zip(ids, metadata)], f)
+        dim = embeddings.shape[1] if embeddings.ndim == 2 else 0
+        with open(os.path.join(version_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": version, "count": len(ids), "dim": dim, "ivf": use_ivf}, f)
+
+        # Publish the complete version with a single atomic rename
+        with open(self.current_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(str(version))
+        os.replace(self.current_path + ".tmp", self.current_path)
+
+        for name in LEGACY_FILES:
+            if os.path.exists(os.path.join(self.path, name)):
+                os.remove(os.path.join(self.path, name))
+        for name in os.listdir(self.path):
+            if name.startswith("v") and name[1:].isdigit() and int(name[1:]) <= version - KEPT_VERSIONS:
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+        self.load()
+
+def _get_collection(path):
+    """Return the shared, up-to-date in-memory view of a collection directory."""
+    with _collections_lock:
+        collection = _loaded_collections.get(path)
+        if collection is None:
+            collection = _loaded_collections[path] = _Collection(path)
+    collection.load()
+    return collection
+
+class LocalVectorStore(BasePydanticVectorStore):
+    """
+    In-process vector store keeping one memory-mapped float32 matrix per collection.
+
+    Queries run an exact cosine top-k with a single vectorized matmul; collections with
+    at least `LOCAL_IVF_MIN_VECTORS` vectors are searched through an IVF index instead.
+    """
+
+    stores_text: bool = True
+    collection_name: str
+    persist_dir: str = LOCAL_VECTOR_STORE_DIR
+    nprobe: int = LOCAL_IVF_NPROBE
+
+    _path: str = PrivateAttr()
+
+    def __init__(self, collection_name, persist_dir=LOCAL_VECTOR_STORE_DIR, nprobe=LOCAL_IVF_NPROBE, **kwargs):
+        super().__init__(collection_name=collection_name, persist_dir=persist_dir, nprobe=nprobe, **kwargs)
+        self._path = os.path.join(persist_dir, collection_name)
+
+    @classmethod
+    def class_name(cls):
+        return "LocalVectorStore"
+
+    @property
+    def client(self) -> Any:
+        return None
+
+    def exists(self):
+        """Check whether the collection holds any vectors."""
+        return len(_get_collection(self._path).snapshot.ids) > 0
+
+    def add(self, nodes, **add_kwargs) -> List[str]:
+        """Insert or replace nodes by id."""
+        if not nodes:
+            return []
+        with _get_collection(self._path).write_lock() as collection:
+            snapshot = collection.snapshot
+            ids = list(snapshot.ids)
+            metadata = list(snapshot.metadata)
+            embeddings = np.array(snapshot.embeddings, dtype=np.float32)
+            new_embeddings = _normalize(np.array([node.get_embedding() for node in nodes], dtype=np.float32))
+            if embeddings.size == 0:
+                embeddings = np.zeros((0, new_embeddings.shape[1]), dtype=np.float32)
+
+            positions = {node_id: i for i, node_id in enumerate(ids)}
+            appended = []
+            for node, embedding in zip(nodes, new_embeddings):
+                node_metadata = node_to_metadata_dict(node, remove_text=False, flat_metadata=False)
+                if node.node_id in positions:
+                    row = positions[node.node_id]
+                    metadata[row] = node_metadata
+                    embeddings[row] = embedding
+                else:
+                    positions[node.node_id] = len(ids)
+                    ids.append(node.node_id)
+                    metadata.append(node_metadata)
+                    appended.append(embedding)
+            if appended:
+                embeddings = np.vstack([embeddings, np.array(appended, dtype=np.float32)])
+            collection.save(ids, metadata, embeddings)
+        return [node.node_id for node in nodes]
+
+    def delete(self, ref_doc_id, **delete_kwargs) -> None:
+        """Delete all nodes that belong to a source document."""
+        with _get_collection(self._path).write_lock() as collection:
+            snapshot = collection.snapshot
+            keep = [i for i, meta in enumerate(snapshot.metadata) if meta.get("ref_doc_id") != ref_doc_id]
+            if len(keep) == len(snapshot.ids):
+                return
+            collection.save(
+                [snapshot.ids[i] for i in keep],
+                [snapshot.metadata[i] for i in keep],
+                np.asarray(snapshot.embeddings)[keep]
+            )
+
+    def delete_nodes(self, node_ids=None, filters=None, **delete_kwargs) -> None:
+        """Delete nodes by id."""
+        if not node_ids:
+            return
+        node_ids = set(node_ids)
+        with _get_collection(self._path).write_lock() as collection:
+            snapshot = collection.snapshot
+            keep = [i for i, node_id in enumerate(snapshot.ids) if node_id not in node_ids]
+            if len(keep) == len(snapshot.ids):
+                return
+            collection.save(
+                [snapshot.ids[i] for i in keep],
+                [snapshot.metadata[i] for i in keep],
+                np.asarray(snapshot.embeddings)[keep]
+            )
+
+    def get_metadata_values(self, key):
+        """Return `{node_id: metadata[key]}` for every node of the collection."""
+        snapshot = _get_collection(self._path).snapshot
+        return {node_id: meta.get(key) for node_id, meta in zip(snapshot.ids, snapshot.metadata)}
+
+    def clear(self):
+        """Remove the whole collection from disk."""
+        if os.path.isdir(self._path):
+            collection = _get_collection(self._path)
+            with collection.write_lock():
+                # Unpublish first, so readers in other processes see an empty collection
+                try:
+                    os.remove(os.path.join(self._path, CURRENT_POINTER))
+                except FileNotFoundError:
+                    pass
+                collection.load()
+            shutil.rmtree(self._path, ignore_errors=True)
+        with _collections_lock:
+            _loaded_collections.pop(self._path, None)
+
+    def query(self, query: VectorStoreQuery, **kwargs) -> VectorStoreQueryResult:
+        """Return the top-k nodes by cosine similarity."""
+        # Read the snapshot once: a concurrent reload swaps in a new one without touching this one
+        snapshot = _get_collection(self._path).snapshot
+        if not snapshot.ids or query.query_embedding is None:
+            return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+
+        query_embedding = _normalize(np.asarray(query.query_embedding, dtype=np.float32))
+        rows = snapshot.candidate_rows(query_embedding, self.nprobe)
+        if rows is None:
+            scores = snapshot.embeddings @ query_embedding
+            rows = np.arange(len(scores))
+        else:
+            scores = snapshot.embeddings[rows] @ query_embedding
+
+        top_k = min(query.similarity_top_k, len(scores))
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+
+        nodes, similarities, ids = [], [], []
+        for i in top:
+            row = int(rows[i])
+            nodes.append(metadata_dict_to_node(snapshot.metadata[row]))
+            similarities.append(float(scores[i]))
+            ids.append(snapshot.ids[row])
+        return VectorStoreQueryResult(nodes=nodes, similarities=similarities, ids=ids)
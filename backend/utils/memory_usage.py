@@ -0,0 +1,83 @@
+# utils/memory_usage.py
+
+import os
+import sys
+import resource
+import threading
+import contextvars
+
+# How often the resident set size is sampled while a MemoryTracker is active
+MEMORY_SAMPLE_INTERVAL_SECONDS = float(os.getenv("MEMORY_SAMPLE_INTERVAL_SECONDS", "0.05"))
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+# The tracker of the ingestion running in the current context, which worker peaks are reported to
+_current_tracker = contextvars.ContextVar("memory_tracker", default=None)
+
+def peak_rss_bytes():
+    """High-water mark of the resident set size of this process."""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+    return usage if sys.platform == "darwin" else usage * 1024
+
+def current_rss_bytes():
+    """Current resident set size of this process, falling back to the high-water mark off Linux."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return peak_rss_bytes()
+
+class MemoryTracker:
+    """
+    Context manager that records the peak RSS reached while a block of work runs.
+
+    The process-wide `ru_maxrss` high-water mark cannot be reset, so a background thread
+    samples the current RSS instead. Other threads of the process (e.g. concurrent
+    ingestions) count towards the same RSS, so the peak is an upper bound for the block.
+    Page parsing workers are separate processes: each reports its own high-water mark with
+    its results (see `record_worker_peak_rss`), and the largest of them is reported as
+    `page_workers_peak_rss_bytes`.
+    """
+
+    def __init__(self, interval=MEMORY_SAMPLE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.start_rss_bytes = 0
+        self.peak_rss_bytes = 0
+        self.page_workers_peak_rss_bytes = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._token = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_rss_bytes = max(self.peak_rss_bytes, current_rss_bytes())
+
+    def __enter__(self):
+        self.start_rss_bytes = self.peak_rss_bytes = current_rss_bytes()
+        self._thread = threading.Thread(target=self._sample, name="memory-tracker", daemon=True)
+        self._thread.start()
+        self._token = _current_tracker.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak_rss_bytes = max(self.peak_rss_bytes, current_rss_bytes())
+        _current_tracker.reset(self._token)
+        return False
+
+    def stats(self):
+        """Return the start and peak RSS and the growth over the tracked block, in bytes."""
+        return {
+            "start_rss_bytes": self.start_rss_bytes,
+            "peak_rss_bytes": self.peak_rss_bytes,
+            "peak_rss_growth_bytes": self.peak_rss_bytes - self.start_rss_bytes,
+            "page_workers_peak_rss_bytes": self.page_workers_peak_rss_bytes
+        }
+
+def record_worker_peak_rss(nbytes):
+    """Report the RSS high-water mark of a worker process to the active MemoryTracker, if any."""
+    tracker = _current_tracker.get()
+    if tracker is not None:
+        tracker.page_workers_peak_rss_bytes = max(tracker.page_workers_peak_rss_bytes, nbytes)
@@ -0,0 +1,219 @@
+# utils/nvidia_client.py
+
+import os
+import re
+import time
+import random
+import asyncio
+import threading
+from typing import Any
+from urllib.parse import urlparse
+import httpx
+from pydantic import PrivateAttr
+from llama_index.core.embeddings import BaseEmbedding
+from utils.instrumentation import remote_call_span
+
+# Connection pooling, timeouts and retries for every call to the NVIDIA API. Retries happen in
+# exactly one layer per call path, and every attempt passes through the rate limiter.
+NVIDIA_HTTP_POOL_SIZE = int(os.getenv("NVIDIA_HTTP_POOL_SIZE", "16"))
+NVIDIA_CONNECT_TIMEOUT = float(os.getenv("NVIDIA_CONNECT_TIMEOUT", "10"))
+NVIDIA_READ_TIMEOUT = float(os.getenv("NVIDIA_READ_TIMEOUT", "120"))
+NVIDIA_MAX_RETRIES = int(os.getenv("NVIDIA_MAX_RETRIES", "3"))
+NVIDIA_BACKOFF_FACTOR = float(os.getenv("NVIDIA_BACKOFF_FACTOR", "1.0"))
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+# Client-side rate limit shared by all NVIDIA calls of this process (VLM enrichment, embedding
+# batches, query LLM and query embeddings, summaries). On by default at 120 requests/minute with bursts of 20:
+# set it to the account's quota, or to 0 to disable the limiter.
+NVIDIA_RATE_LIMIT_PER_MINUTE = float(os.getenv("NVIDIA_RATE_LIMIT_PER_MINUTE", "120"))
+NVIDIA_RATE_LIMIT_BURST = int(os.getenv("NVIDIA_RATE_LIMIT_BURST", "20"))
+
+# Default models
+NVIDIA_LLM_MODEL = "nvidia/llama-3.1-nemotron-51b-instruct"
+NVIDIA_EMBED_MODEL = "nvidia/nv-embedqa-e5-v5"
+
+class RateLimiter:
+    """
+    Token bucket refilled at `rate_per_minute`, holding at most `burst` tokens.
+
+    `reserve()` takes a token and returns how long the caller must wait before using it,
+    so the same bucket can be shared by threads (`acquire`) and coroutines (`acquire_async`).
+    """
+
+    def __init__(self, rate_per_minute=NVIDIA_RATE_LIMIT_PER_MINUTE, burst=NVIDIA_RATE_LIMIT_BURST):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        if self.rate_per_second <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate_per_second)
+            self.updated_at = now
+            # Tokens may go negative: later callers queue up behind earlier reservations
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate_per_second
+
+    def acquire(self):
+        """Block the calling thread until a request may be sent."""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        """Wait, without blocking the event loop, until a request may be sent."""
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+# Process-wide limiter shared by the async enrichment stage, the embedding pipeline and the query clients
+nvidia_rate_limiter = RateLimiter()
+
+def endpoint_name(url):
+    """Short metric label for an NVIDIA endpoint URL, e.g. `neva-22b`, `deplot` or `completions`."""
+    return urlparse(url).path.rstrip("/").rsplit("/", 1)[-1]
+
+def get_nvidia_headers():
+    """Build the authorization headers for the NVIDIA API."""
+    api_key = os.getenv("NVIDIA_API_KEY")
+
+    if not api_key:
+        raise ValueError("NVIDIA API Key is not set. Please set the NVIDIA_API_KEY environment variable.")
+
+    return {
+        "Authorization": f"Bearer {api_key}",
+        "Accept": "application/json"
+    }
+
+def retry_delay(attempt, retry_after=None):
+    """Seconds to wait before retry `attempt + 1`: the server's Retry-After if given, else exponential backoff with jitter."""
+    try:
+        if retry_after is not None:
+            return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    return NVIDIA_BACKOFF_FACTOR * 2 ** attempt + random.uniform(0, 0.5)
+
+def error_status_code(error):
+    """Extract an HTTP status code from an NVIDIA client exception, if there is one."""
+    for candidate in (error, getattr(error, "response", None)):
+        status_code = getattr(candidate, "status_code", None)
+        if isinstance(status_code, int):
+            return status_code
+    match = re.search(r"\b(413|429)\b", str(error))
+    return int(match.group(1)) if match else None
+
+def _rate_limited_http_client():
+    """
+    Pooled httpx client for the OpenAI-compatible LlamaIndex LLM.
+
+    Its request hook waits for the rate limiter, so every HTTP attempt, including the
+    retries of the OpenAI SDK, is limited. The routers call the LLM synchronously.
+    """
+    return httpx.Client(
+        limits=httpx.Limits(max_connections=NVIDIA_HTTP_POOL_SIZE, max_keepalive_connections=NVIDIA_HTTP_POOL_SIZE),
+        timeout=httpx.Timeout(NVIDIA_READ_TIMEOUT, connect=NVIDIA_CONNECT_TIMEOUT),
+        event_hooks={"request": [lambda request: nvidia_rate_limiter.acquire()]}
+    )
+
+class RateLimitedEmbedding(BaseEmbedding):
+    """
+    Query-side embedding client: each request waits for the rate limiter.
+
+    The wrapped client is created without retries of its own; 429/5xx failures are retried
+    here with backoff, so every attempt goes through the limiter.
+    """
+
+    _embedding: Any = PrivateAttr()
+    _limiter: Any = PrivateAttr()
+    _max_retries: int = PrivateAttr()
+
+    def __init__(self, embedding, limiter=None, max_retries=NVIDIA_MAX_RETRIES, **kwargs):
+        super().__init__(model_name=embedding.model_name, embed_batch_size=embedding.embed_batch_size, **kwargs)
+        self._embedding = embedding
+        self._limiter = limiter or nvidia_rate_limiter
+        self._max_retries = max_retries
+
+    def _call(self, embed, *args):
+        for attempt in range(self._max_retries + 1):
+            self._limiter.acquire()
+            try:
+                with remote_call_span("embeddings", attempt=attempt):
+                    return embed(*args)
+            except Exception as e:
+                if error_status_code(e) not in RETRYABLE_STATUS_CODES or attempt == self._max_retries:
+                    raise
+            time.sleep(retry_delay(attempt))
+
+    def _get_query_embedding(self, query):
+        return self._call(self._embedding.get_query_embedding, query)
+
+    def _get_text_embedding(self, text):
+        return self._call(self._embedding.get_text_embedding, text)
+
+    def _get_text_embeddings(self, texts):
+        return self._call(self._embedding.get_text_embedding_batch, texts)
+
+    async def _aget_query_embedding(self, query):
+        return self._get_query_embedding(query)
+
+# Shared LlamaIndex/LangChain clients, created on first use and keyed by their settings.
+# Their packages are imported lazily so spawned page-parsing workers do not load them.
+_clients = {}
+_clients_lock = threading.Lock()
+
+def _get_client(key, factory):
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = factory()
+        return _clients[key]
+
+def get_llm(model=NVIDIA_LLM_MODEL):
+    """Return the shared LlamaIndex NVIDIA LLM client for a model; every request it sends is rate-limited."""
+    from llama_index.llms.nvidia import NVIDIA
+    return _get_client(
+        ("llm", model),
+        lambda: NVIDIA(
+            model=model, timeout=NVIDIA_READ_TIMEOUT, max_retries=NVIDIA_MAX_RETRIES,
+            http_client=_rate_limited_http_client()
+        )
+    )
+
+def get_embedding_model(model=NVIDIA_EMBED_MODEL, embed_batch_size=50, max_retries=NVIDIA_MAX_RETRIES):
+    """
+    Return the shared LlamaIndex NVIDIA embedding client for a model and batch size.
+
+    Ingestion passes `max_retries=0`: `embedding_pipeline.embed_nodes` retries failed
+    batches itself, through the rate limiter.
+    """
+    from llama_index.embeddings.nvidia import NVIDIAEmbedding
+    return _get_client(
+        ("embedding", model, embed_batch_size, max_retries),
+        lambda: NVIDIAEmbedding(
+            model=model, truncate="END", embed_batch_size=embed_batch_size,
+            timeout=NVIDIA_READ_TIMEOUT, max_retries=max_retries
+        )
+    )
+
+def get_query_embedding_model(model=NVIDIA_EMBED_MODEL, embed_batch_size=50):
+    """Return the shared, rate-limited embedding client used for queries (`Settings.embed_model`)."""
+    embedding = get_embedding_model(model, embed_batch_size=embed_batch_size, max_retries=0)
+    return _get_client(("query-embedding", model, embed_batch_size), lambda: RateLimitedEmbedding(embedding))
+
+def get_chat_client(model=NVIDIA_LLM_MODEL, temperature=0.5, top_p=1, max_tokens=1024):
+    """Return the shared LangChain ChatNVIDIA client for a model and sampling settings."""
+    from langchain_nvidia_ai_endpoints import ChatNVIDIA
+    return _get_client(
+        ("chat", model, temperature, top_p, max_tokens),
+        lambda: ChatNVIDIA(
+            model=model,
+            api_key=os.getenv("NVIDIA_API_KEY"),
+            temperature=temperature,
+            top_p=top_p,
+            max_tokens=max_tokens
+        )
+    )
@@ -2,148 +2,256 @@
 
 import os
 import fitz
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from llama_index.core import Document
-from utils.helper_functions import (
-    extract_text_around_item, process_text_blocks, 
-    is_graph, process_graph, clear_cache_directory
-)
-
-# Define a hidden .cache directory for storing temporary and vectorstore files
-CACHE_DIR = os.path.join(os.getcwd(), ".cache")
-VECTORSTORE_DIR = os.path.join(CACHE_DIR, "vectorstore")
-TMP_DIR = os.path.join(CACHE_DIR, "tmp")
-
-# Create .cache directory if it doesn't exist
-os.makedirs(CACHE_DIR, exist_ok=True)
-os.makedirs(VECTORSTORE_DIR, exist_ok=True)
-os.makedirs(TMP_DIR, exist_ok=True)
-
-def get_pdf_documents(pdf_file, force_fresh=True):
-    """Process a PDF file and extract text, tables, and images."""
-    # Clear the cache before processing
-    if force_fresh:
-        clear_cache_directory(CACHE_DIR)
+from utils.layout_analysis import PageLayout, intersects_any, rects_to_array
+from utils.vlm_enrichment import EnrichmentTask, enrich_documents, CAPTION_PLACEHOLDER
+from utils.table_artifacts import render_table_crop, serialize_table_data, save_artifact
+from utils.instrumentation import stage_span, count, enable_worker_recording, drain_records, merge_records
+from utils.memory_usage import peak_rss_bytes, record_worker_peak_rss
+
+# Sub-directories of the output directory holding the table and image artifacts.
+# Document metadata stores artifact paths relative to the output directory.
+TABLE_REFERENCES_DIR = "table_references"
+IMAGE_REFERENCES_DIR = "image_references"
+TABLE_DATA_CONTENT_TYPES = {"parquet": "application/vnd.apache.parquet", "csv": "text/csv"}
+
+# Number of worker processes used to parse pages in parallel (1 disables the process pool)
+PDF_PARSE_MAX_WORKERS = int(os.getenv("PDF_PARSE_MAX_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Per-worker document handle; PyMuPDF documents cannot be shared between processes,
+# so every worker opens its own copy of the PDF once in its initializer
+_worker_pdf = None
+_worker_filename = None
+_worker_output_dir = None
+
+def _init_page_worker(pdf_content, filename, output_dir):
+    """Open the PDF once per worker process."""
+    global _worker_pdf, _worker_filename, _worker_output_dir
+    _worker_pdf = fitz.open(stream=pdf_content, filetype="pdf")
+    _worker_filename = filename
+    _worker_output_dir = output_dir
+    enable_worker_recording()
+
+def _parse_page_in_worker(pagenum):
+    """Parse a single page using the worker's own document handle, returning its timing records and peak RSS too."""
+    with stage_span("parse_page", page=pagenum):
+        page_docs, page_tasks = parse_page(_worker_pdf, pagenum, _worker_filename, _worker_output_dir)
+    return page_docs, page_tasks, drain_records(), peak_rss_bytes()
+
+def get_pdf_documents(pdf_content, filename, output_dir, max_workers=None, progress=None, transport=None):
+    """
+    Process an in-memory PDF and extract text, tables, and images.
+
+    `pdf_content` (bytes or bytearray) is handed to PyMuPDF as-is, without a temporary
+    file. `filename` only names the documents: their IDs are `<filename stem>-page<n>-...`.
+
+    Table and image artifacts are written below `output_dir`, which must be private
+    to this call (see `utils.scratch_space`) so concurrent ingestions never collide.
+
+    Pages are parsed in parallel by a pool of `max_workers` processes (defaults to
+    `PDF_PARSE_MAX_WORKERS`). Results are merged back in page order, so the output
+    and document IDs are identical to a sequential run. Table and image descriptions
+    are produced afterwards in a single concurrent enrichment stage.
+
+    If given, `progress(stage, done, total)` is called as pages are parsed ("parse")
+    and as tables and images are described ("enrich"). `transport` is passed on to
+    `enrich_documents`.
+    """
     all_pdf_documents = []
-    ongoing_tables = {}
+    enrichment_tasks = []
+
+    if max_workers is None:
+        max_workers = PDF_PARSE_MAX_WORKERS
 
     try:
-        f = fitz.open(stream=pdf_file.read(), filetype="pdf")
+        f = fitz.open(stream=pdf_content, filetype="pdf")
     except Exception as e:
         print(f"Error opening or processing the PDF file: {e}")
         return []
 
-    for i in range(len(f)):
-        page = f[i]
-        text_blocks = [block for block in page.get_text("blocks", sort=True) 
-                       if block[-1] == 0 and not (block[1] < page.rect.height * 0.1 or block[3] > page.rect.height * 0.9)]
-        grouped_text_blocks = process_text_blocks(text_blocks)
-        
-        table_docs, table_bboxes, ongoing_tables = parse_all_tables(pdf_file.name, page, i, text_blocks, ongoing_tables)
-        all_pdf_documents.extend(table_docs)
-
-        image_docs = parse_all_images(pdf_file.name, page, i, text_blocks)
-        all_pdf_documents.extend(image_docs)
-
-        for text_block_ctr, (heading_block, content) in enumerate(grouped_text_blocks, 1):
-            heading_bbox = fitz.Rect(heading_block[:4])
-            if not any(heading_bbox.intersects(table_bbox) for table_bbox in table_bboxes):
-                bbox = {"x1": heading_block[0], "y1": heading_block[1], "x2": heading_block[2], "x3": heading_block[3]}
-                text_doc = Document(
-                    text=f"{heading_block[4]}\n{content}",
-                    metadata={**bbox, "type": "text", "page_num": i, "source": f"{pdf_file.name[:-4]}-page{i}-block{text_block_ctr}"},
-                    id_=f"{pdf_file.name[:-4]}-page{i}-block{text_block_ctr}"
-                )
-                all_pdf_documents.append(text_doc)
+    page_count = len(f)
+    with stage_span("parse", pages=page_count):
+        if max_workers <= 1 or page_count < 2:
+            for i in range(page_count):
+                with stage_span("parse_page", page=i):
+                    page_docs, page_tasks = parse_page(f, i, filename, output_dir)
+                all_pdf_documents.extend(page_docs)
+                enrichment_tasks.extend(page_tasks)
+                if progress:
+                    progress("parse", i + 1, page_count)
+        else:
+            f.close()
+            # Use "spawn" so workers never inherit a forked copy of the server's threads or fitz state
+            with ProcessPoolExecutor(
+                max_workers=min(max_workers, page_count),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_page_worker,
+                initargs=(pdf_content, filename, output_dir)
+            ) as executor:
+                # map() yields results in submission order, which keeps the documents in page order
+                results = executor.map(_parse_page_in_worker, range(page_count))
+                for pages_parsed, (page_docs, page_tasks, records, worker_rss) in enumerate(results, 1):
+                    all_pdf_documents.extend(page_docs)
+                    enrichment_tasks.extend(page_tasks)
+                    merge_records(records)
+                    record_worker_peak_rss(worker_rss)
+                    if progress:
+                        progress("parse", pages_parsed, page_count)
+
+    if not f.is_closed:
+        f.close()
+    count("pages", page_count)
+    for doc_type in ("text", "table", "image"):
+        count(f"{doc_type}_documents", sum(1 for doc in all_pdf_documents if doc.metadata.get("type") == doc_type))
 
-    f.close()
+    # Describe all table and image crops concurrently once every page has been parsed
+    with stage_span("enrich", items=len(enrichment_tasks)):
+        enrich_documents(all_pdf_documents, enrichment_tasks, progress=progress, transport=transport)
 
-       # Add these lines at the end of the function
-    print("Vectorstore contents:", os.listdir(VECTORSTORE_DIR))
-    print("Table references:", os.listdir(os.path.join(VECTORSTORE_DIR, "table_references")))
-    print("Image references:", os.listdir(os.path.join(VECTORSTORE_DIR, "image_references")))
+    for references_dir in (TABLE_REFERENCES_DIR, IMAGE_REFERENCES_DIR):
+        references_path = os.path.join(output_dir, references_dir)
+        if os.path.isdir(references_path):
+            print(f"{references_dir}: {len(os.listdir(references_path))} files")
 
     return all_pdf_documents
 
-def parse_all_tables(filename, page, pagenum, text_blocks, ongoing_tables):
-    """Extract tables from a PDF page."""
+def parse_page(f, i, filename, output_dir):
+    """
+    Extract the table, image and text documents of a single page.
+
+    Returns the page's documents and the enrichment tasks for its table and image crops;
+    table and image captions stay as placeholders until `enrich_documents` fills them in.
+    """
+    page_documents = []
+    page = f[i]
+    # Header/footer masking happens once, on the page's block coordinate arrays
+    layout = PageLayout.from_page(page)
+    grouped_text_blocks = layout.group_blocks()
+
+    table_docs, table_bboxes, table_tasks = parse_all_tables(filename, page, i, layout, output_dir)
+    page_documents.extend(table_docs)
+
+    image_docs, image_tasks = parse_all_images(filename, page, i, layout, output_dir)
+    page_documents.extend(image_docs)
+
+    # Test every group heading against every table in one broadcast
+    overlaps_table = intersects_any(layout.heading_coords(grouped_text_blocks), rects_to_array(table_bboxes))
+    for text_block_ctr, ((heading_block, content), in_table) in enumerate(zip(grouped_text_blocks, overlaps_table), 1):
+        if not in_table:
+            bbox = {"x1": heading_block[0], "y1": heading_block[1], "x2": heading_block[2], "x3": heading_block[3]}
+            text_doc = Document(
+                text=f"{heading_block[4]}\n{content}",
+                metadata={**bbox, "type": "text", "page_num": i, "source": f"{filename[:-4]}-page{i}-block{text_block_ctr}"},
+                id_=f"{filename[:-4]}-page{i}-block{text_block_ctr}"
+            )
+            page_documents.append(text_doc)
+
+    return page_documents, table_tasks + image_tasks
+
+def parse_all_tables(filename, page, pagenum, layout, output_dir):
+    """Extract tables from a PDF page, collecting their crops for VLM enrichment."""
     table_docs = []
+    enrichment_tasks = []
     table_bboxes = []
     try:
-        tables = page.find_tables(horizontal_strategy="lines_strict", vertical_strategy="lines_strict")
+        with stage_span("find_tables", page=pagenum):
+            tables = page.find_tables(horizontal_strategy="lines_strict", vertical_strategy="lines_strict")
         for tab in tables:
             if not tab.header.external:
                 pandas_df = tab.to_pandas()
-                tablerefdir = os.path.join(VECTORSTORE_DIR, "table_references")
-                os.makedirs(tablerefdir, exist_ok=True)
-                df_xlsx_path = os.path.join(tablerefdir, f"table{len(table_docs)+1}-page{pagenum}.xlsx")
-                pandas_df.to_excel(df_xlsx_path)
+                table_stem = f"table{len(table_docs)+1}-page{pagenum}"
+                table_data, table_data_format = serialize_table_data(pandas_df)
+                df_path = os.path.join(TABLE_REFERENCES_DIR, f"{table_stem}.{table_data_format}")
+                df_uri = save_artifact(output_dir, df_path, table_data, TABLE_DATA_CONTENT_TYPES[table_data_format], filename[:-4])
                 bbox = fitz.Rect(tab.bbox)
                 table_bboxes.append(bbox)
 
-                before_text, after_text = extract_text_around_item(text_blocks, bbox, page.rect.height)
+                before_text, after_text = layout.text_around(bbox)
 
-                table_img = page.get_pixmap(clip=bbox)
-                table_img_path = os.path.join(tablerefdir, f"table{len(table_docs)+1}-page{pagenum}.jpg")
-                table_img.save(table_img_path)
-                description = process_graph(table_img.tobytes())
+                # Render and encode the crop once; disk and S3 store the same JPEG bytes, which also
+                # go to the VLM unchanged unless they exceed its size limits (see image_preprocessing)
+                with stage_span("render_table", page=pagenum):
+                    table_img = render_table_crop(page, bbox)
+                table_img_path = os.path.join(TABLE_REFERENCES_DIR, f"{table_stem}.jpg")
+                img_uri = save_artifact(output_dir, table_img_path, table_img, "image/jpeg", filename[:-4])
 
-                caption = before_text.replace("\n", " ") + description + after_text.replace("\n", " ")
+                source = f"{filename[:-4]}-page{pagenum}-table{len(table_docs)+1}"
                 if before_text == "" and after_text == "":
+                    # Without surrounding text the header names are the caption, so no VLM call is needed
                     caption = " ".join(tab.header.names)
+                else:
+                    caption = CAPTION_PLACEHOLDER
+                    enrichment_tasks.append(EnrichmentTask(source, "table", table_img, before_text, after_text))
                 table_metadata = {
-                    "source": f"{filename[:-4]}-page{pagenum}-table{len(table_docs)+1}",
-                    "dataframe": df_xlsx_path,
+                    "source": source,
+                    "dataframe": df_path,
                     "image": table_img_path,
                     "caption": caption,
                     "type": "table",
                     "page_num": pagenum
                 }
+                # S3 copies of the artifacts, when uploads are enabled (kept out of the embedded text)
+                artifact_uris = {key: uri for key, uri in (("dataframe_uri", df_uri), ("image_uri", img_uri)) if uri}
+                table_metadata.update(artifact_uris)
                 all_cols = ", ".join(list(pandas_df.columns.values))
-                doc = Document(text=f"This is a table with the caption: {caption}\nThe columns are {all_cols}", metadata=table_metadata)
+                doc = Document(
+                    text=f"This is a table with the caption: {caption}\nThe columns are {all_cols}",
+                    metadata=table_metadata,
+                    excluded_embed_metadata_keys=list(artifact_uris),
+                    excluded_llm_metadata_keys=list(artifact_uris),
+                    id_=table_metadata["source"]
+                )
                 table_docs.append(doc)
     except Exception as e:
         print(f"Error during table extraction: {e}")
-    return table_docs, table_bboxes, ongoing_tables
+    return table_docs, table_bboxes, enrichment_tasks
 
-def parse_all_images(filename, page, pagenum, text_blocks):
-    """Extract images from a PDF page."""
+def parse_all_images(filename, page, pagenum, layout, output_dir):
+    """Extract images from a PDF page, collecting them for VLM enrichment."""
     image_docs = []
+    enrichment_tasks = []
     image_info_list = page.get_image_info(xrefs=True)
     page_rect = page.rect
+    seen_xrefs = set()
 
     for image_info in image_info_list:
         xref = image_info['xref']
-        if xref == 0:
+        # Skip inline images and repeated placements of the same image on this page
+        if xref == 0 or xref in seen_xrefs:
             continue
+        seen_xrefs.add(xref)
 
         img_bbox = fitz.Rect(image_info['bbox'])
         if img_bbox.width < page_rect.width / 20 or img_bbox.height < page_rect.height / 20:
             continue
 
-        extracted_image = page.parent.extract_image(xref)
+        with stage_span("extract_image", page=pagenum):
+            extracted_image = page.parent.extract_image(xref)
         image_data = extracted_image["image"]
-        imgrefpath = os.path.join(VECTORSTORE_DIR, "image_references")
-        os.makedirs(imgrefpath, exist_ok=True)
-        image_path = os.path.join(imgrefpath, f"image{xref}-page{pagenum}.png")
-        with open(image_path, "wb") as img_file:
+        os.makedirs(os.path.join(output_dir, IMAGE_REFERENCES_DIR), exist_ok=True)
+        image_path = os.path.join(IMAGE_REFERENCES_DIR, f"image{xref}-page{pagenum}.png")
+        with open(os.path.join(output_dir, image_path), "wb") as img_file:
             img_file.write(image_data)
 
-        before_text, after_text = extract_text_around_item(text_blocks, img_bbox, page.rect.height)
+        before_text, after_text = layout.text_around(img_bbox)
         if before_text == "" and after_text == "":
             continue
 
-        image_description = " "
-        if is_graph(image_data):
-            image_description = process_graph(image_data)
-
-        caption = before_text.replace("\n", " ") + image_description + after_text.replace("\n", " ")
+        source = f"{filename[:-4]}-page{pagenum}-image{xref}"
+        enrichment_tasks.append(EnrichmentTask(source, "image", image_data, before_text, after_text))
 
         image_metadata = {
-            "source": f"{filename[:-4]}-page{pagenum}-image{xref}",
+            "source": source,
             "image": image_path,
-            "caption": caption,
+            "caption": CAPTION_PLACEHOLDER,
             "type": "image",
             "page_num": pagenum
         }
-        image_docs.append(Document(text="This is an image with the caption: " + caption, metadata=image_metadata))
-    return image_docs
+        image_docs.append(Document(
+            text="This is an image with the caption: " + CAPTION_PLACEHOLDER,
+            metadata=image_metadata,
+            id_=image_metadata["source"]
+        ))
+    return image_docs, enrichment_tasks
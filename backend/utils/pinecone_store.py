@@ -0,0 +1,235 @@
+# utils/pinecone_store.py
+
+import os
+import time
+import threading
+from pinecone import Pinecone, ServerlessSpec
+from pinecone.exceptions import NotFoundException
+from llama_index.core.vector_stores.utils import node_to_metadata_dict
+from llama_index.vector_stores.pinecone import PineconeVectorStore
+from utils.vector_store import get_collection_name
+
+# Storage mode: "index" creates one serverless index per collection (e.g. pdf-index-12),
+# "namespace" stores every collection as a namespace of a single shared index
+PINECONE_STORAGE_MODE = os.getenv("PINECONE_STORAGE_MODE", "index")
+PINECONE_SHARED_INDEX = os.getenv("PINECONE_SHARED_INDEX", "cfa-publications")
+PINECONE_UPSERT_BATCH_SIZE = int(os.getenv("PINECONE_UPSERT_BATCH_SIZE", "200"))
+PINECONE_UPSERT_THREADS = int(os.getenv("PINECONE_UPSERT_THREADS", "8"))
+# Ids per fetch (sent in the query string) and per delete request
+PINECONE_FETCH_BATCH_SIZE = 100
+PINECONE_DELETE_BATCH_SIZE = 1000
+EMBED_DIMENSION = 1024
+
+# How often the index registry is refreshed in the background, and the minimum gap
+# between forced refreshes triggered by lookups of unknown collections
+INDEX_REGISTRY_TTL_SECONDS = float(os.getenv("INDEX_REGISTRY_TTL_SECONDS", "30"))
+INDEX_REGISTRY_MIN_REFRESH_SECONDS = float(os.getenv("INDEX_REGISTRY_MIN_REFRESH_SECONDS", "2"))
+
+# Initialize Pinecone
+pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+
+# Data-plane handles are cached because pc.Index() resolves the host through the control plane
+_index_handles = {}
+_index_handles_lock = threading.Lock()
+
+class IndexRegistry:
+    """
+    In-memory set of existing index (or namespace) names, refreshed in a background thread.
+
+    Lookups are answered from memory so hot paths never wait on the control plane.
+    Our own create/delete calls update the set immediately; an unknown name triggers
+    at most one forced refresh every `min_refresh_seconds`, so collections created by
+    other workers are picked up without waiting for the next background refresh.
+    """
+
+    def __init__(self, fetch_names, ttl_seconds=INDEX_REGISTRY_TTL_SECONDS, min_refresh_seconds=INDEX_REGISTRY_MIN_REFRESH_SECONDS):
+        self.fetch_names = fetch_names
+        self.ttl_seconds = ttl_seconds
+        self.min_refresh_seconds = min_refresh_seconds
+        self._names = None
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._thread = None
+
+    def _start_background_refresh(self):
+        """Start the refresh thread on first use."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._refresh_loop, name="pinecone-index-registry", daemon=True)
+            self._thread.start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.ttl_seconds)
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing Pinecone index registry: {e}")
+
+    def refresh(self):
+        """Force a refresh from Pinecone (concurrent callers share a single fetch)."""
+        with self._refresh_lock:
+            names = set(self.fetch_names())
+            with self._lock:
+                self._names = names
+                self._refreshed_at = time.monotonic()
+
+    def contains(self, name):
+        """Check whether a name exists, refreshing only on first use or for unknown names."""
+        with self._lock:
+            self._start_background_refresh()
+            names = self._names
+            refreshed_at = self._refreshed_at
+        if names is None:
+            self.refresh()
+        elif name in names:
+            return True
+        elif time.monotonic() - refreshed_at >= self.min_refresh_seconds:
+            self.refresh()
+        with self._lock:
+            return name in self._names
+
+    def add(self, name):
+        with self._lock:
+            if self._names is not None:
+                self._names.add(name)
+
+    def discard(self, name):
+        with self._lock:
+            if self._names is not None:
+                self._names.discard(name)
+
+def _fetch_shared_index_namespaces():
+    """Names of the non-empty namespaces of the shared index."""
+    if not index_registry.contains(PINECONE_SHARED_INDEX):
+        return []
+    namespaces = _get_index(PINECONE_SHARED_INDEX).describe_index_stats().get("namespaces", {})
+    return [name for name, stats in namespaces.items() if stats.get("vector_count", 0) > 0]
+
+# Registries of existing indexes and of the namespaces of the shared index
+index_registry = IndexRegistry(lambda: pc.list_indexes().names())
+namespace_registry = IndexRegistry(_fetch_shared_index_namespaces)
+
+def use_namespaces():
+    """Return True when all collections share one index, one namespace per collection."""
+    return PINECONE_STORAGE_MODE == "namespace"
+
+def _locate(index_type, pdf_id):
+    """Return the (index name, namespace) pair for a collection in the configured storage mode."""
+    collection_name = get_collection_name(index_type, pdf_id)
+    if use_namespaces():
+        return PINECONE_SHARED_INDEX, collection_name
+    return collection_name, None
+
+def _get_index(index_name):
+    """Return a cached data-plane handle with a thread pool for parallel upserts."""
+    with _index_handles_lock:
+        if index_name not in _index_handles:
+            _index_handles[index_name] = pc.Index(index_name, pool_threads=PINECONE_UPSERT_THREADS)
+        return _index_handles[index_name]
+
+def _ensure_index(index_name):
+    """Create a serverless index if it does not exist yet."""
+    if not index_registry.contains(index_name):
+        pc.create_index(
+            name=index_name,
+            dimension=EMBED_DIMENSION,
+            metric="cosine",
+            spec=ServerlessSpec(cloud="aws", region="us-east-1")
+        )
+        index_registry.add(index_name)
+
+def collection_exists(index_type, pdf_id):
+    """Check whether a collection has been indexed."""
+    index_name, namespace = _locate(index_type, pdf_id)
+    if namespace is None:
+        return index_registry.contains(index_name)
+    # A namespace only exists while it holds vectors, so the registry tracks non-empty namespaces
+    return namespace_registry.contains(namespace)
+
+def refresh_registry():
+    """Force a refresh of the cached index and namespace names."""
+    index_registry.refresh()
+    if use_namespaces():
+        namespace_registry.refresh()
+
+def delete_collection(index_type, pdf_id):
+    """Delete a collection's index, or all vectors of its namespace."""
+    index_name, namespace = _locate(index_type, pdf_id)
+    if namespace is None:
+        if index_registry.contains(index_name):
+            pc.delete_index(index_name)
+        index_registry.discard(index_name)
+        with _index_handles_lock:
+            _index_handles.pop(index_name, None)
+        return
+    try:
+        _get_index(index_name).delete(delete_all=True, namespace=namespace)
+    except NotFoundException:
+        pass
+    namespace_registry.discard(namespace)
+
+def get_vector_store(index_type, pdf_id):
+    """Build a LlamaIndex vector store for querying a collection."""
+    index_name, namespace = _locate(index_type, pdf_id)
+    return PineconeVectorStore(index_name=index_name, namespace=namespace)
+
+def upsert_nodes(index_type, pdf_id, nodes):
+    """
+    Upsert embedded nodes into a collection with large, parallel batches.
+
+    Vectors use the same id/values/metadata layout as `PineconeVectorStore.add`, so
+    collections written here are queried through `get_vector_store` as before.
+    """
+    index_name, namespace = _locate(index_type, pdf_id)
+    _ensure_index(index_name)
+    index = _get_index(index_name)
+
+    vectors = [
+        {
+            "id": node.node_id,
+            "values": node.get_embedding(),
+            "metadata": node_to_metadata_dict(node, remove_text=False, flat_metadata=True)
+        }
+        for node in nodes
+    ]
+    batches = [vectors[i:i + PINECONE_UPSERT_BATCH_SIZE] for i in range(0, len(vectors), PINECONE_UPSERT_BATCH_SIZE)]
+
+    # Send every batch asynchronously on the index's thread pool, then wait for all of them
+    async_results = [index.upsert(vectors=batch, namespace=namespace, async_req=True) for batch in batches]
+    for async_result in async_results:
+        async_result.get()
+    if namespace is not None:
+        namespace_registry.add(namespace)
+
+    print(f"Upserted {len(vectors)} vectors into {index_name}{f'/{namespace}' if namespace else ''} in {len(batches)} batches")
+
+def get_metadata_values(index_type, pdf_id, key):
+    """
+    Return `{vector_id: metadata[key]}` for every vector of a collection.
+
+    Ids are paged with `list` (serverless indexes) and their metadata is read with
+    batched `fetch` calls; a collection that does not exist yet is empty.
+    """
+    index_name, namespace = _locate(index_type, pdf_id)
+    if not collection_exists(index_type, pdf_id):
+        return {}
+    index = _get_index(index_name)
+    try:
+        vector_ids = [vector_id for page in index.list(namespace=namespace) for vector_id in page]
+        values = {}
+        for i in range(0, len(vector_ids), PINECONE_FETCH_BATCH_SIZE):
+            response = index.fetch(ids=vector_ids[i:i + PINECONE_FETCH_BATCH_SIZE], namespace=namespace)
+            for vector_id, vector in response.vectors.items():
+                values[vector_id] = (vector.metadata or {}).get(key)
+    except NotFoundException:
+        return {}
+    return values
+
+def delete_vectors(index_type, pdf_id, vector_ids):
+    """Delete vectors of a collection by id."""
+    index_name, namespace = _locate(index_type, pdf_id)
+    index = _get_index(index_name)
+    for i in range(0, len(vector_ids), PINECONE_DELETE_BATCH_SIZE):
+        index.delete(ids=vector_ids[i:i + PINECONE_DELETE_BATCH_SIZE], namespace=namespace)
+    print(f"Deleted {len(vector_ids)} vectors from {index_name}{f'/{namespace}' if namespace else ''}")
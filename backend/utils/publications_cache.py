@@ -0,0 +1,129 @@
+# utils/publications_cache.py
+
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+# How long the publication list is served from memory before Snowflake is queried again.
+# The Airflow load DAG invalidates it explicitly, so the TTL only bounds staleness after
+# out-of-band changes (e.g. a worker process the invalidation request did not reach).
+PUBLICATIONS_CACHE_TTL_SECONDS = float(os.getenv("PUBLICATIONS_CACHE_TTL_SECONDS", "600"))
+
+# Empty results (e.g. a lookup of a publication ID that does not exist yet) are only kept this
+# long, so a record loaded after the lookup shows up quickly even without an invalidation
+PUBLICATIONS_CACHE_MISS_TTL_SECONDS = float(os.getenv("PUBLICATIONS_CACHE_MISS_TTL_SECONDS", "15"))
+
+# Distinct queries (page, filter and projection combinations) kept; the least recently used is evicted
+PUBLICATIONS_CACHE_MAX_ENTRIES = int(os.getenv("PUBLICATIONS_CACHE_MAX_ENTRIES", "256"))
+
+@dataclass
+class CatalogueSnapshot:
+    """A query result (rows or a page of them) plus its serialized JSON body and ETag."""
+    rows: list
+    body: bytes
+    etag: str
+    loaded_at: float
+    ttl_seconds: float
+
+def etag_matches(if_none_match, etag):
+    """Check an If-None-Match header against an ETag (weak comparison, as for GET requests)."""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+class PublicationsCache:
+    """
+    In-process cache of publication query results with a TTL and explicit invalidation.
+
+    Results are keyed by the query that produced them (e.g. a page with its filters and
+    projection) and bounded to `max_entries`. Concurrent misses for the same key share a
+    single Snowflake query. Empty results (None) expire after `miss_ttl_seconds` instead
+    of the full TTL. A load that overlaps an `invalidate()` call is returned to its
+    caller but not stored, so data read before a DAG run can never outlive the
+    invalidation that followed it.
+    """
+
+    def __init__(self, ttl_seconds=PUBLICATIONS_CACHE_TTL_SECONDS, max_entries=PUBLICATIONS_CACHE_MAX_ENTRIES,
+                 miss_ttl_seconds=PUBLICATIONS_CACHE_MISS_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.miss_ttl_seconds = miss_ttl_seconds
+        self.max_entries = max_entries
+        self._snapshots = OrderedDict()
+        self._load_locks = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+
+    def _fresh_snapshot(self, key):
+        snapshot = self._snapshots.get(key)
+        if snapshot is None:
+            return None
+        if time.monotonic() - snapshot.loaded_at > snapshot.ttl_seconds:
+            del self._snapshots[key]
+            return None
+        self._snapshots.move_to_end(key)
+        return snapshot
+
+    def _store(self, key, snapshot):
+        self._snapshots[key] = snapshot
+        self._snapshots.move_to_end(key)
+        while len(self._snapshots) > self.max_entries:
+            self._snapshots.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def get(self, load_rows, key=None):
+        """Return the cached snapshot for `key`, calling `load_rows()` (JSON-serializable) on a miss."""
+        with self._lock:
+            snapshot = self._fresh_snapshot(key)
+            if snapshot is not None:
+                self._stats["hits"] += 1
+                return snapshot
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                # Another thread may have loaded this key while this one waited
+                snapshot = self._fresh_snapshot(key)
+                if snapshot is not None:
+                    self._stats["hits"] += 1
+                    return snapshot
+                self._stats["misses"] += 1
+                generation = self._generation
+
+            try:
+                rows = load_rows()
+            finally:
+                with self._lock:
+                    if self._load_locks.get(key) is load_lock:
+                        del self._load_locks[key]
+            body = json.dumps(rows, default=str, separators=(",", ":")).encode("utf-8")
+            snapshot = CatalogueSnapshot(
+                rows=rows,
+                body=body,
+                etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+                loaded_at=time.monotonic(),
+                ttl_seconds=self.ttl_seconds if rows is not None else self.miss_ttl_seconds
+            )
+            with self._lock:
+                if generation == self._generation:
+                    self._store(key, snapshot)
+            return snapshot
+
+    def invalidate(self):
+        """Drop every cached result; the next requests reload them from Snowflake."""
+        with self._lock:
+            self._snapshots.clear()
+            self._generation += 1
+            self._stats["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "entries": len(self._snapshots)}
+
+# Process-wide cache used by the Snowflake router
+publications_cache = PublicationsCache()
@@ -0,0 +1,84 @@
+# utils/query_engine_cache.py
+
+import os
+import time
+import threading
+from collections import OrderedDict
+
+# Cache sizing: number of (index_type, pdf_id) entries and how long a handle stays fresh
+QUERY_ENGINE_CACHE_SIZE = int(os.getenv("QUERY_ENGINE_CACHE_SIZE", "32"))
+QUERY_ENGINE_CACHE_TTL_SECONDS = float(os.getenv("QUERY_ENGINE_CACHE_TTL_SECONDS", "1800"))
+
+class QueryEngineCache:
+    """
+    Process-wide LRU cache of ready-to-use index handles and query engines.
+
+    Entries are keyed by `(index_type, pdf_id)` and hold the loaded index plus one query
+    engine per distinct set of engine options. Entries expire after `ttl_seconds` and
+    must be invalidated whenever the underlying collection is rebuilt.
+    """
+
+    def __init__(self, max_entries=QUERY_ENGINE_CACHE_SIZE, ttl_seconds=QUERY_ENGINE_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_entry(self, key):
+        """Return a fresh entry for a key, dropping it if it has expired. Caller holds the lock."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry["created_at"] > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get_query_engine(self, index_type, pdf_id, load_index, **engine_kwargs):
+        """
+        Return a cached query engine, building the index with `load_index()` on a miss.
+
+        `engine_kwargs` are passed to `index.as_query_engine` and distinguish engines
+        sharing the same index (e.g. different response modes or streaming).
+        """
+        key = (index_type, str(pdf_id))
+        engine_key = tuple(sorted(engine_kwargs.items()))
+
+        with self._lock:
+            entry = self._get_entry(key)
+            if entry is not None and engine_key in entry["engines"]:
+                return entry["engines"][engine_key]
+            index = entry["index"] if entry is not None else None
+
+        # Build outside the lock so that a slow cold start does not block warm lookups
+        if index is None:
+            index = load_index()
+        query_engine = index.as_query_engine(**engine_kwargs)
+
+        with self._lock:
+            entry = self._get_entry(key)
+            if entry is None:
+                entry = {"created_at": time.monotonic(), "index": index, "engines": {}}
+                self._entries[key] = entry
+            entry["engines"][engine_key] = query_engine
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return query_engine
+
+    def contains(self, index_type, pdf_id):
+        """Check whether a fresh entry exists, i.e. the collection is known to be loaded."""
+        with self._lock:
+            return self._get_entry((index_type, str(pdf_id))) is not None
+
+    def invalidate(self, index_type, pdf_id):
+        """Drop the cached handles of a collection after it has been rebuilt or deleted."""
+        with self._lock:
+            self._entries.pop((index_type, str(pdf_id)), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# Process-wide cache instance shared by the routers
+query_engine_cache = QueryEngineCache()
@@ -0,0 +1,83 @@
+# utils/request_metrics.py
+
+import time
+from starlette.routing import Match
+from utils.instrumentation import metrics_registry, LATENCY_BUCKETS, SIZE_BUCKETS
+
+# Request-level metrics, labelled by route template (e.g. /s3/fetch-image/{file_key:path}) rather than
+# the raw path, so the number of series stays bounded
+request_duration_seconds = metrics_registry.histogram(
+    "http_request_duration_seconds", "Time from receiving a request to sending the last response byte",
+    ("method", "route", "status"), LATENCY_BUCKETS
+)
+time_to_first_byte_seconds = metrics_registry.histogram(
+    "http_time_to_first_byte_seconds", "Time from receiving a request to sending the response headers (useful for streaming routes)",
+    ("method", "route"), LATENCY_BUCKETS
+)
+request_size_bytes = metrics_registry.histogram(
+    "http_request_size_bytes", "Size of request bodies", ("method", "route"), SIZE_BUCKETS
+)
+response_size_bytes = metrics_registry.histogram(
+    "http_response_size_bytes", "Size of response bodies", ("method", "route", "status"), SIZE_BUCKETS
+)
+requests_in_flight = metrics_registry.gauge(
+    "http_requests_in_flight", "Requests currently being handled", ("method", "route")
+)
+
+UNMATCHED_ROUTE = "unmatched"
+
+def route_template(scope):
+    """Path template of the route that will handle a request, or `unmatched`."""
+    app = scope.get("app")
+    for route in getattr(getattr(app, "router", None), "routes", ()):
+        match, _ = route.matches(scope)
+        if match != Match.NONE:
+            return getattr(route, "path", UNMATCHED_ROUTE)
+    return UNMATCHED_ROUTE
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware recording latency, payload sizes, status codes and in-flight requests per route.
+
+    Implemented at the ASGI level so streamed responses (e.g. /rag/query-stream) are measured
+    until their last chunk without being buffered. Requests that fail with an unhandled
+    exception are recorded with status 500, the response the server sends for them.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(scope)
+        start = time.perf_counter()
+        sizes = {"request": 0, "response": 0}
+        status = "500"
+
+        async def receive_counting():
+            message = await receive()
+            if message["type"] == "http.request":
+                sizes["request"] += len(message.get("body", b""))
+            return message
+
+        async def send_counting(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+                time_to_first_byte_seconds.observe(time.perf_counter() - start, method=method, route=route)
+            elif message["type"] == "http.response.body":
+                sizes["response"] += len(message.get("body", b""))
+            await send(message)
+
+        requests_in_flight.inc(method=method, route=route)
+        try:
+            await self.app(scope, receive_counting, send_counting)
+        finally:
+            requests_in_flight.dec(method=method, route=route)
+            request_duration_seconds.observe(time.perf_counter() - start, method=method, route=route, status=status)
+            request_size_bytes.observe(sizes["request"], method=method, route=route)
+            response_size_bytes.observe(sizes["response"], method=method, route=route, status=status)
@@ -0,0 +1,112 @@
+# utils/response_cache.py
+
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+import time
+
+# Disk-backed memoization of NVIDIA model responses (kept outside .cache, which only holds per-ingestion scratch space)
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", os.path.join(os.getcwd(), ".response_cache", "responses.db"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(256 * 1024 ** 2)))
+
+# Expired entries are purged every this many writes
+PURGE_INTERVAL = 100
+
+class ResponseCache:
+    """
+    SQLite-backed cache of model responses keyed by image hash, model and prompt.
+
+    Entries expire after `ttl_seconds`, and the least recently used entries are evicted
+    once the stored responses exceed `max_bytes`. Hit and miss counters are kept per process.
+    """
+
+    def __init__(self, path=RESPONSE_CACHE_PATH, ttl_seconds=RESPONSE_CACHE_TTL_SECONDS, max_bytes=RESPONSE_CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, response TEXT NOT NULL, size_bytes INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model, prompt, image_content=None):
+        """Build a cache key from the model, the prompt (or payload template) and the image bytes."""
+        digest = hashlib.sha256()
+        if image_content is not None:
+            digest.update(hashlib.sha256(image_content).digest())
+        if not isinstance(prompt, str):
+            prompt = json.dumps(prompt, sort_keys=True)
+        digest.update(f"|{model}|{prompt}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the cached response for a key, or None if it is missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, model, response):
+        """Store a response and enforce the TTL and size limits."""
+        now = time.time()
+        size_bytes = len(response.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size_bytes, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, size_bytes, now, now)
+            )
+            self._writes += 1
+            if self._writes % PURGE_INTERVAL == 0:
+                self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Evict least recently used responses until the cache fits in `max_bytes`. Caller holds the lock."""
+        total = self._conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size_bytes in self._conn.execute(
+            "SELECT key, size_bytes FROM responses ORDER BY last_access ASC"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size_bytes
+
+    def stats(self):
+        """Return hit/miss counters and the current size of the cache."""
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "size_bytes": total
+        }
+
+# Process-wide cache instance shared by the sync and async NVIDIA helpers
+response_cache = ResponseCache()
@@ -0,0 +1,116 @@
+# utils/sampling_profiler.py
+
+import os
+import re
+import sys
+import time
+import threading
+from collections import Counter
+
+# The /debug/profiler endpoints are only served when SAMPLING_PROFILER_ENABLED=1
+SAMPLING_PROFILER_ENABLED = os.getenv("SAMPLING_PROFILER_ENABLED", "0") == "1"
+PROFILER_INTERVAL_SECONDS = float(os.getenv("PROFILER_INTERVAL_SECONDS", "0.01"))
+
+# Distinct stacks kept per session; further new stacks are counted under "[other]"
+PROFILER_MAX_STACKS = int(os.getenv("PROFILER_MAX_STACKS", "20000"))
+PROFILER_MAX_DEPTH = 64
+
+def _thread_group(name):
+    """Strip worker numbers, so e.g. all `blocking-io_3` threads share one root frame."""
+    return re.sub(r"[_-]?\d+$", "", name) or name
+
+def _collapse(frame):
+    """`module:function;...` from the outermost to the innermost frame."""
+    names = []
+    while frame is not None and len(names) < PROFILER_MAX_DEPTH:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler for every thread of the process.
+
+    A background thread reads `sys._current_frames()` every `interval` seconds and counts
+    each collapsed stack, so the overhead is one stack walk per thread per sample and
+    nothing is instrumented. Output uses the collapsed-stack format understood by
+    flamegraph.pl and speedscope. Page-parsing worker processes are not sampled.
+    """
+
+    def __init__(self, interval=PROFILER_INTERVAL_SECONDS, max_stacks=PROFILER_MAX_STACKS):
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self._stacks = Counter()
+        self._samples = 0
+        self._started_at = None
+        self._stopped_at = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=None):
+        """Start a new session (clearing the previous one); returns False if one is already running."""
+        with self._lock:
+            if self.running:
+                return False
+            self.interval = interval or self.interval
+            self._stacks = Counter()
+            self._samples = 0
+            self._started_at = time.time()
+            self._stopped_at = None
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        """Stop the running session; its samples stay available until the next start."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        with self._lock:
+            if self._started_at is not None and self._stopped_at is None:
+                self._stopped_at = time.time()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            frames = sys._current_frames()
+            with self._lock:
+                self._samples += 1
+                for thread_id, frame in frames.items():
+                    if thread_id == own_id:
+                        continue
+                    stack = f"{_thread_group(thread_names.get(thread_id, 'unknown'))};{_collapse(frame)}"
+                    if stack not in self._stacks and len(self._stacks) >= self.max_stacks:
+                        stack = "[other]"
+                    self._stacks[stack] += 1
+
+    def stats(self):
+        with self._lock:
+            end = self._stopped_at or time.time()
+            return {
+                "running": self.running,
+                "interval_seconds": self.interval,
+                "samples": self._samples,
+                "distinct_stacks": len(self._stacks),
+                "duration_seconds": end - self._started_at if self._started_at else 0.0
+            }
+
+    def top_stacks(self, limit=None):
+        """Return `(stack, samples)` pairs, most frequent first."""
+        with self._lock:
+            return self._stacks.most_common(limit)
+
+    def collapsed(self, limit=None):
+        """Samples in collapsed-stack format, one `stack count` line per stack."""
+        return "".join(f"{stack} {samples}\n" for stack, samples in self.top_stacks(limit))
+
+# Process-wide profiler toggled through the /debug/profiler endpoints
+sampling_profiler = SamplingProfiler()
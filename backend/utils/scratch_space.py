@@ -0,0 +1,153 @@
+# utils/scratch_space.py
+
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Every ingestion gets its own directory below this root, removed as soon as the ingestion ends
+SCRATCH_ROOT = os.getenv("SCRATCH_ROOT", os.path.join(os.getcwd(), ".cache", "scratch"))
+
+# Disk space the scratch root may use, measured across all server processes that share it.
+# Each ingestion reserves SCRATCH_RESERVATION_FACTOR times the PDF size (at least the minimum)
+# and is only admitted once its reservation fits under the quota next to the bytes already on
+# disk (and the reservations of this process' ingestions that have not used them yet) and the
+# file system has that much space free. It waits up to SCRATCH_WAIT_TIMEOUT_SECONDS, re-measuring
+# every SCRATCH_POLL_INTERVAL_SECONDS, as other processes free space without notifying this one.
+SCRATCH_QUOTA_BYTES = int(os.getenv("SCRATCH_QUOTA_BYTES", str(4 * 1024 ** 3)))
+SCRATCH_RESERVATION_FACTOR = int(os.getenv("SCRATCH_RESERVATION_FACTOR", "4"))
+SCRATCH_MIN_RESERVATION_BYTES = int(os.getenv("SCRATCH_MIN_RESERVATION_BYTES", str(64 * 1024 ** 2)))
+SCRATCH_WAIT_TIMEOUT_SECONDS = float(os.getenv("SCRATCH_WAIT_TIMEOUT_SECONDS", "300"))
+SCRATCH_POLL_INTERVAL_SECONDS = 1.0
+
+# Distinguishes this process from an earlier one with the same PID (e.g. the server of a
+# restarted container, which is PID 1 every time)
+PROCESS_TOKEN = uuid.uuid4().hex[:12]
+
+class ScratchQuotaExceeded(Exception):
+    """Raised when a scratch directory cannot be reserved under the disk quota in time."""
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _directory_bytes(path):
+    """Total size of the files below `path`; files removed while walking are skipped."""
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, filename)).st_size
+            except OSError:
+                pass
+    return total
+
+class ScratchSpaceManager:
+    """
+    Hands out isolated, self-cleaning scratch directories under a shared disk quota.
+
+    Directories are named `<pid>-<process token>-<prefix>-<uuid>`, so concurrent ingestions
+    never touch each other's files, and directories orphaned by a crashed process are removed
+    at startup, even when that process had the same PID as this one.
+
+    The quota is enforced on the measured size of the scratch root, so directories of other
+    server processes sharing the root count too, as does a directory that outgrows its
+    reservation. The reservations of this process' own directories are held back until they
+    are used, and an ingestion is also only admitted while the file system has room for it.
+    """
+
+    def __init__(self, root=SCRATCH_ROOT, quota_bytes=SCRATCH_QUOTA_BYTES):
+        self.root = root
+        self.quota_bytes = quota_bytes
+        # Path -> reserved bytes of this process' live scratch directories
+        self._reservations = {}
+        self._condition = threading.Condition()
+        os.makedirs(self.root, exist_ok=True)
+        self._remove_orphans()
+
+    def _remove_orphans(self):
+        """Delete scratch directories left behind by processes that are no longer running."""
+        for name in os.listdir(self.root):
+            pid, _, rest = name.partition("-")
+            if not pid.isdigit():
+                continue
+            if int(pid) == os.getpid():
+                # Our PID but not our token: left by an earlier process that had the same PID
+                orphaned = rest.split("-", 1)[0] != PROCESS_TOKEN
+            else:
+                orphaned = not pid_alive(int(pid))
+            if orphaned:
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+    def _committed_bytes(self):
+        """Bytes on disk below the root, counting each of our own directories as at least its reservation."""
+        committed = sum(max(reserved, _directory_bytes(path)) for path, reserved in self._reservations.items())
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if path not in self._reservations:
+                committed += _directory_bytes(path)
+        return committed
+
+    def _fits(self, nbytes):
+        if self._committed_bytes() + nbytes > self.quota_bytes:
+            return False
+        unused_reservations = sum(max(0, reserved - _directory_bytes(path)) for path, reserved in self._reservations.items())
+        return shutil.disk_usage(self.root).free - unused_reservations >= nbytes
+
+    def _reserve(self, path, nbytes, timeout):
+        # A single reservation larger than the whole quota still runs, once the root is otherwise empty
+        nbytes = min(nbytes, self.quota_bytes)
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while not self._fits(nbytes):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise ScratchQuotaExceeded(
+                        f"Scratch disk quota exhausted: {self._committed_bytes()} of {self.quota_bytes} bytes used or "
+                        f"reserved, {len(self._reservations)} ingestions of this process running."
+                    )
+                self._condition.wait(min(remaining, SCRATCH_POLL_INTERVAL_SECONDS))
+            self._reservations[path] = nbytes
+            os.makedirs(path)
+
+    def _release(self, path):
+        shutil.rmtree(path, ignore_errors=True)
+        with self._condition:
+            self._reservations.pop(path, None)
+            self._condition.notify_all()
+
+    @contextmanager
+    def scratch_dir(self, expected_bytes=0, prefix="ingest", timeout=SCRATCH_WAIT_TIMEOUT_SECONDS):
+        """
+        Reserve quota and yield a fresh directory that is deleted on exit.
+
+        Blocks until `expected_bytes` (at least `SCRATCH_MIN_RESERVATION_BYTES`) fit under
+        the quota and in the free disk space, and raises `ScratchQuotaExceeded` if that takes
+        longer than `timeout`.
+        """
+        path = os.path.join(self.root, f"{os.getpid()}-{PROCESS_TOKEN}-{prefix}-{uuid.uuid4().hex}")
+        self._reserve(path, max(SCRATCH_MIN_RESERVATION_BYTES, expected_bytes), timeout)
+        try:
+            yield path
+        finally:
+            self._release(path)
+
+    def stats(self):
+        """Return this process' active scratch directories and reserved bytes, and the measured usage of the root."""
+        with self._condition:
+            return {
+                "active": len(self._reservations),
+                "reserved_bytes": sum(self._reservations.values()),
+                "used_bytes": _directory_bytes(self.root),
+                "quota_bytes": self.quota_bytes
+            }
+
+# Process-wide scratch space shared by all ingestions
+scratch_space = ScratchSpaceManager()
@@ -0,0 +1,156 @@
+# utils/snowflake_pool.py
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+import snowflake.connector
+from snowflake.connector.errors import ProgrammingError, DataError, IntegrityError
+
+# At most this many open connections per process; callers wait for a free one beyond that
+SNOWFLAKE_POOL_SIZE = int(os.getenv("SNOWFLAKE_POOL_SIZE", "4"))
+SNOWFLAKE_POOL_TIMEOUT_SECONDS = float(os.getenv("SNOWFLAKE_POOL_TIMEOUT_SECONDS", "30"))
+
+# Idle connections are checked with `SELECT 1` (answered by the cloud services layer, so it does
+# not resume the warehouse) before reuse, and replaced once older than the maximum age
+SNOWFLAKE_HEALTH_CHECK_IDLE_SECONDS = float(os.getenv("SNOWFLAKE_HEALTH_CHECK_IDLE_SECONDS", "60"))
+SNOWFLAKE_CONNECTION_MAX_AGE_SECONDS = float(os.getenv("SNOWFLAKE_CONNECTION_MAX_AGE_SECONDS", "3600"))
+
+# ProgrammingError codes meaning the session itself is gone (session or master token expired),
+# not that the statement was wrong: such connections must be discarded
+SNOWFLAKE_SESSION_EXPIRED_ERRNOS = (390112, 390114)
+
+class SnowflakePoolTimeout(Exception):
+    """Raised when no pooled connection becomes available within the timeout."""
+
+def connect():
+    """Open a new Snowflake connection (credentials from environment variables)."""
+    return snowflake.connector.connect(
+        user=os.getenv("SNOWFLAKE_USER"),
+        password=os.getenv("SNOWFLAKE_PASSWORD"),
+        account=os.getenv("SNOWFLAKE_ACCOUNT"),
+        role=os.getenv("SNOWFLAKE_ROLE"),
+        warehouse=os.getenv("SNOWFLAKE_WAREHOUSE", "WH_PUBLICATIONS_ETL"),
+        database=os.getenv("SNOWFLAKE_DATABASE", "DB_CFA_PUBLICATIONS"),
+        schema=os.getenv("SNOWFLAKE_SCHEMA", "CFA_PUBLICATIONS")
+    )
+
+class _PooledConnection:
+    def __init__(self, connection):
+        self.connection = connection
+        self.created_at = time.monotonic()
+        self.released_at = self.created_at
+
+class SnowflakeConnectionPool:
+    """
+    Bounded pool of Snowflake connections shared by the request threads.
+
+    Connections are opened lazily and reused most-recently-released first, so a quiet
+    process keeps a single warm session instead of paying the authentication handshake
+    on every request. Connections that fail their health check, exceed `max_age_seconds`
+    or raise a connection or session-expiry error while in use are closed instead of being returned.
+    """
+
+    def __init__(self, connect=connect, size=SNOWFLAKE_POOL_SIZE, timeout=SNOWFLAKE_POOL_TIMEOUT_SECONDS,
+                 health_check_idle_seconds=SNOWFLAKE_HEALTH_CHECK_IDLE_SECONDS, max_age_seconds=SNOWFLAKE_CONNECTION_MAX_AGE_SECONDS):
+        self.connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.health_check_idle_seconds = health_check_idle_seconds
+        self.max_age_seconds = max_age_seconds
+        self._idle = []
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._stats = {"opened": 0, "reused": 0, "discarded": 0}
+
+    def _is_healthy(self, pooled):
+        now = time.monotonic()
+        if now - pooled.created_at > self.max_age_seconds or pooled.connection.is_closed():
+            return False
+        if now - pooled.released_at < self.health_check_idle_seconds:
+            return True
+        try:
+            cursor = pooled.connection.cursor()
+            try:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+            finally:
+                cursor.close()
+            return True
+        except Exception as e:
+            print(f"Discarding unhealthy Snowflake connection: {e}")
+            return False
+
+    def _close(self, pooled):
+        with self._lock:
+            self._stats["discarded"] += 1
+        try:
+            pooled.connection.close()
+        except Exception:
+            pass
+
+    def _acquire(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise SnowflakePoolTimeout(f"No Snowflake connection available within {self.timeout}s")
+        try:
+            while True:
+                with self._lock:
+                    pooled = self._idle.pop() if self._idle else None
+                if pooled is None:
+                    pooled = _PooledConnection(self.connect())
+                    with self._lock:
+                        self._stats["opened"] += 1
+                    return pooled
+                if self._is_healthy(pooled):
+                    with self._lock:
+                        self._stats["reused"] += 1
+                    return pooled
+                self._close(pooled)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _release(self, pooled, broken):
+        try:
+            if broken or pooled.connection.is_closed():
+                self._close(pooled)
+            else:
+                pooled.released_at = time.monotonic()
+                with self._lock:
+                    self._idle.append(pooled)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a `with` block."""
+        pooled = self._acquire()
+        broken = False
+        try:
+            yield pooled.connection
+        except ProgrammingError as e:
+            # Statement-level errors leave the session usable, an expired session does not
+            broken = getattr(e, "errno", None) in SNOWFLAKE_SESSION_EXPIRED_ERRNOS
+            raise
+        except (DataError, IntegrityError):
+            raise
+        except BaseException:
+            # Anything else (network, authentication, session expiry) may have broken the connection
+            broken = True
+            raise
+        finally:
+            self._release(pooled, broken)
+
+    def close_all(self):
+        """Close every idle connection (connections in use are closed when they are returned)."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            self._close(pooled)
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "idle": len(self._idle), "size": self.size}
+
+# Process-wide pool used by the Snowflake router
+snowflake_pool = SnowflakeConnectionPool()
@@ -0,0 +1,75 @@
+# utils/table_artifacts.py
+
+import os
+import threading
+import fitz
+
+try:
+    import pyarrow  # noqa: F401  (enables DataFrame.to_parquet)
+except ImportError:
+    pyarrow = None
+
+# Table crops are rendered once at this resolution and encoded once as JPEG; the same
+# buffer is written to disk, optionally uploaded to S3 and sent to the VLM (which only
+# re-encodes crops larger than VLM_MAX_IMAGE_SIDE or the inline payload limit)
+TABLE_RENDER_DPI = int(os.getenv("TABLE_RENDER_DPI", "150"))
+TABLE_JPEG_QUALITY = int(os.getenv("TABLE_JPEG_QUALITY", "85"))
+
+# Set TABLE_ARTIFACTS_S3_PREFIX to also upload table crops and data to S3_BUCKET_NAME
+TABLE_ARTIFACTS_S3_PREFIX = os.getenv("TABLE_ARTIFACTS_S3_PREFIX", "")
+
+# Table data is written as Parquet when pyarrow is installed, otherwise as CSV
+TABLE_DATA_FORMAT = "parquet" if pyarrow is not None else "csv"
+
+# One S3 client per process (page workers are separate processes), created on first upload
+_s3_client = None
+_s3_client_lock = threading.Lock()
+
+def render_table_crop(page, bbox, dpi=TABLE_RENDER_DPI, quality=TABLE_JPEG_QUALITY):
+    """Render a table region once and return it as JPEG bytes."""
+    pixmap = page.get_pixmap(clip=fitz.Rect(bbox), dpi=dpi)
+    return pixmap.tobytes(output="jpeg", jpg_quality=quality)
+
+def serialize_table_data(dataframe):
+    """Serialize a table to Parquet (or CSV) bytes and return `(data, file extension)`."""
+    if TABLE_DATA_FORMAT == "parquet":
+        # Parquet needs string column names; PyMuPDF may produce duplicate or numeric headers
+        dataframe = dataframe.copy()
+        dataframe.columns = [str(column) for column in dataframe.columns]
+        return dataframe.to_parquet(engine="pyarrow", index=False), "parquet"
+    return dataframe.to_csv(index=False).encode("utf-8"), "csv"
+
+def _get_s3_client():
+    global _s3_client
+    with _s3_client_lock:
+        if _s3_client is None:
+            import boto3
+            _s3_client = boto3.client(
+                "s3",
+                aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+                aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+                region_name=os.getenv("AWS_REGION")
+            )
+        return _s3_client
+
+def save_artifact(output_dir, relative_path, data, content_type, s3_folder=None):
+    """
+    Write an artifact below `output_dir` and, if configured, upload the same bytes to S3.
+
+    Returns the S3 URI of the upload, or None when S3 uploads are disabled or fail.
+    """
+    path = os.path.join(output_dir, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+    bucket_name = os.getenv("S3_BUCKET_NAME")
+    if not TABLE_ARTIFACTS_S3_PREFIX or not bucket_name:
+        return None
+    key = "/".join(part.strip("/") for part in (TABLE_ARTIFACTS_S3_PREFIX, s3_folder or "", relative_path) if part)
+    try:
+        _get_s3_client().put_object(Bucket=bucket_name, Key=key, Body=data, ContentType=content_type)
+    except Exception as e:
+        print(f"Error uploading table artifact {key} to S3: {e}")
+        return None
+    return f"s3://{bucket_name}/{key}"
@@ -0,0 +1,79 @@
+# utils/vector_store.py
+
+import os
+from utils.local_vector_store import LocalVectorStore
+from utils.instrumentation import remote_call_span
+
+# Vector store backend: "pinecone" (default) or "local" for the in-process, memory-mapped store
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "pinecone")
+
+def use_local_backend():
+    """Return True when collections are stored in the local in-process vector store."""
+    return VECTOR_STORE_BACKEND == "local"
+
+def get_collection_name(index_type, pdf_id):
+    """Name of the collection for a PDF, e.g. `pdf-index-12` or `research-notes-12`."""
+    return f"{index_type}-{pdf_id}"
+
+def _pinecone_store():
+    # Imported lazily so that the local backend runs without Pinecone credentials or network access
+    from utils import pinecone_store
+    return pinecone_store
+
+def _call_span(operation, **attributes):
+    """Span for a vector store call, labelled e.g. `pinecone.upsert` or `local.delete`."""
+    return remote_call_span(f"{'local' if use_local_backend() else 'pinecone'}.{operation}", **attributes)
+
+def _local_store(index_type, pdf_id):
+    return LocalVectorStore(collection_name=get_collection_name(index_type, pdf_id))
+
+def collection_exists(index_type, pdf_id):
+    """Check whether a collection has been indexed."""
+    if use_local_backend():
+        return _local_store(index_type, pdf_id).exists()
+    return _pinecone_store().collection_exists(index_type, pdf_id)
+
+def refresh_collection_registry():
+    """Force a refresh of the cached collection names (a no-op for the local backend)."""
+    if not use_local_backend():
+        _pinecone_store().refresh_registry()
+
+def delete_collection(index_type, pdf_id):
+    """Delete a collection and all of its vectors."""
+    if use_local_backend():
+        _local_store(index_type, pdf_id).clear()
+    else:
+        _pinecone_store().delete_collection(index_type, pdf_id)
+
+def get_vector_store(index_type, pdf_id):
+    """Build a LlamaIndex vector store for querying a collection."""
+    if use_local_backend():
+        return _local_store(index_type, pdf_id)
+    return _pinecone_store().get_vector_store(index_type, pdf_id)
+
+def upsert_nodes(index_type, pdf_id, nodes):
+    """Insert or replace embedded nodes in a collection."""
+    with _call_span("upsert", vectors=len(nodes)):
+        if use_local_backend():
+            _local_store(index_type, pdf_id).add(nodes)
+            print(f"Upserted {len(nodes)} vectors into local collection {get_collection_name(index_type, pdf_id)}")
+        else:
+            _pinecone_store().upsert_nodes(index_type, pdf_id, nodes)
+
+def get_metadata_values(index_type, pdf_id, key):
+    """Return `{node_id: metadata[key]}` for every node of a collection (empty if it does not exist)."""
+    with _call_span("fetch_metadata"):
+        if use_local_backend():
+            return _local_store(index_type, pdf_id).get_metadata_values(key)
+        return _pinecone_store().get_metadata_values(index_type, pdf_id, key)
+
+def delete_nodes(index_type, pdf_id, node_ids):
+    """Delete individual nodes of a collection by id."""
+    if not node_ids:
+        return
+    with _call_span("delete", vectors=len(node_ids)):
+        if use_local_backend():
+            _local_store(index_type, pdf_id).delete_nodes(node_ids)
+            print(f"Deleted {len(node_ids)} vectors from local collection {get_collection_name(index_type, pdf_id)}")
+        else:
+            _pinecone_store().delete_vectors(index_type, pdf_id, list(node_ids))
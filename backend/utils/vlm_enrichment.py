@@ -0,0 +1,268 @@
+# utils/vlm_enrichment.py
+
+import os
+import time
+import asyncio
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from collections import Counter
+from utils.response_cache import response_cache
+from utils.image_preprocessing import image_preprocessor, PREPROCESSING_SIGNATURE
+from utils.nvidia_client import (
+    get_nvidia_headers, endpoint_name, nvidia_rate_limiter, retry_delay,
+    RETRYABLE_STATUS_CODES, NVIDIA_CONNECT_TIMEOUT, NVIDIA_HTTP_POOL_SIZE, NVIDIA_LLM_MODEL
+)
+from utils.instrumentation import remote_call_span
+from utils.image_classifier import classify_image_locally, SKIP_REMOTE_CLASSES, CHART
+
+# NVIDIA AI Foundation endpoints used for image and chart understanding
+NEVA_URL = "https://ai.api.nvidia.com/v1/vlm/nvidia/neva-22b"
+DEPLOT_URL = "https://ai.api.nvidia.com/v1/vlm/google/deplot"
+CHAT_COMPLETIONS_URL = "https://integrate.api.nvidia.com/v1/chat/completions"
+CHART_LLM_MODEL = NVIDIA_LLM_MODEL
+CHART_EXPLANATION_PROMPT = "Your responsibility is to explain charts. You are an expert in describing the responses of linearized tables into plain English text for LLMs to use. Explain the following linearized table: "
+GRAPH_KEYWORDS = ["graph", "plot", "chart", "table"]
+
+# Enrichment tuning knobs
+VLM_MAX_CONCURRENCY = int(os.getenv("VLM_MAX_CONCURRENCY", "8"))
+VLM_MAX_RETRIES = int(os.getenv("VLM_MAX_RETRIES", "3"))
+VLM_REQUEST_TIMEOUT = float(os.getenv("VLM_REQUEST_TIMEOUT", "60"))
+VLM_DOCUMENT_TIME_BUDGET = float(os.getenv("VLM_DOCUMENT_TIME_BUDGET", "600"))
+
+# Placeholder left in table/image documents until their description is available
+CAPTION_PLACEHOLDER = "{caption}"
+
+@dataclass
+class EnrichmentTask:
+    """A table or image crop collected during parsing, waiting for its VLM description."""
+    doc_id: str
+    kind: str  # "table" or "image"
+    image_content: bytes
+    before_text: str
+    after_text: str
+
+def image_cache_template(build_payload):
+    """Payload template plus preprocessing settings, used in response cache keys for image endpoints."""
+    return [build_payload(""), PREPROCESSING_SIGNATURE]
+
+def is_graph_description(description):
+    """Check whether an image description mentions a graph, plot, chart, or table."""
+    return any(keyword in description.lower() for keyword in GRAPH_KEYWORDS)
+
+def build_describe_image_payload(image_b64, mime_type="image/jpeg"):
+    """Build the NeVA request payload for describing an image."""
+    return {
+        "messages": [
+            {
+                "role": "user",
+                "content": f'Describe what you see in this image. <img src="data:{mime_type};base64,{image_b64}" />'
+            }
+        ],
+        "max_tokens": 1024,
+        "temperature": 0.20,
+        "top_p": 0.70,
+        "seed": 0,
+        "stream": False
+    }
+
+def build_deplot_payload(image_b64, mime_type="image/jpeg"):
+    """Build the DePlot request payload for extracting the data table of a chart."""
+    return {
+        "messages": [
+            {
+                "role": "user",
+                "content": f'Generate the underlying data table of the figure below: <img src="data:{mime_type};base64,{image_b64}" />'
+            }
+        ],
+        "max_tokens": 1024,
+        "temperature": 0.20,
+        "top_p": 0.20,
+        "stream": False
+    }
+
+def build_chart_explanation_prompt(linearized_table, image_description=None):
+    """Build the LLM prompt explaining a chart, optionally grounded by an existing image description."""
+    prompt = CHART_EXPLANATION_PROMPT + linearized_table
+    if image_description:
+        prompt += f"\nFor context, the figure has been described as: {image_description}"
+    return prompt
+
+async def _post_with_retries(client, url, payload, stats=None):
+    """POST a payload to an NVIDIA endpoint, retrying rate limits and transient failures with backoff."""
+    if stats is not None:
+        stats["remote_calls"] += 1
+    for attempt in range(VLM_MAX_RETRIES + 1):
+        try:
+            await nvidia_rate_limiter.acquire_async()
+            with remote_call_span(endpoint_name(url), attempt=attempt) as call:
+                response = await client.post(url, headers=get_nvidia_headers(), json=payload)
+                call["status"] = str(response.status_code)
+            if response.status_code == 200:
+                response_data = response.json()
+                if "choices" not in response_data or not response_data["choices"]:
+                    raise ValueError(f"No content generated by {url}. 'choices' key missing in API response.")
+                return response_data["choices"][0]["message"]["content"]
+            if response.status_code not in RETRYABLE_STATUS_CODES or attempt == VLM_MAX_RETRIES:
+                raise ValueError(f"Failed to communicate with NVIDIA API: {response.status_code} - {response.text}")
+        except httpx.TransportError:
+            if attempt == VLM_MAX_RETRIES:
+                raise
+            await asyncio.sleep(retry_delay(attempt))
+            continue
+        # Exponential backoff with jitter (~1s, 2s, 4s, ...), or the server's Retry-After
+        await asyncio.sleep(retry_delay(attempt, response.headers.get("Retry-After")))
+
+async def _post_image_with_cache(client, url, build_payload, image_content, stats=None):
+    """Call an image endpoint, memoizing the response by image hash, model and payload template."""
+    cache_key = response_cache.make_key(url, image_cache_template(build_payload), image_content)
+    cached_response = response_cache.get(cache_key)
+    if cached_response is not None:
+        if stats is not None:
+            stats["cache_hits"] += 1
+        return cached_response
+
+    encoded = await asyncio.to_thread(image_preprocessor.encode, image_content)
+    response = await _post_with_retries(client, url, build_payload(encoded.b64, encoded.mime_type), stats)
+    response_cache.set(cache_key, url, response)
+    return response
+
+async def describe_image_async(client, image_content, stats=None):
+    """Generate a description of an image using NeVA."""
+    return await _post_image_with_cache(client, NEVA_URL, build_describe_image_payload, image_content, stats)
+
+async def process_graph_async(client, image_content, image_description=None, stats=None):
+    """Extract the data table of a chart with DePlot and explain it with the LLM."""
+    linearized_table = await _post_image_with_cache(client, DEPLOT_URL, build_deplot_payload, image_content, stats)
+    prompt = build_chart_explanation_prompt(linearized_table, image_description)
+    cache_key = response_cache.make_key(CHART_LLM_MODEL, prompt)
+    cached_response = response_cache.get(cache_key)
+    if cached_response is not None:
+        if stats is not None:
+            stats["cache_hits"] += 1
+        return cached_response
+
+    payload = {
+        "model": CHART_LLM_MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "max_tokens": 1024,
+        "stream": False
+    }
+    response = await _post_with_retries(client, CHAT_COMPLETIONS_URL, payload, stats)
+    response_cache.set(cache_key, CHART_LLM_MODEL, response)
+    return response
+
+async def describe_image_once_async(client, image_content, stats=None):
+    """
+    Classify and describe an image with at most one NeVA call.
+
+    Obvious photos and logos are recognised locally and skip the remote models entirely,
+    obvious charts go straight to DePlot, and for everything else the single NeVA
+    description both decides whether the image is a chart and becomes caption material.
+    """
+    local_class = await asyncio.to_thread(classify_image_locally, image_content)
+    if stats is not None:
+        stats[f"local_{local_class}"] += 1
+
+    if local_class in SKIP_REMOTE_CLASSES:
+        return " "
+    if local_class == CHART:
+        return await process_graph_async(client, image_content, stats=stats)
+
+    description = await describe_image_async(client, image_content, stats)
+    if is_graph_description(description):
+        return await process_graph_async(client, image_content, image_description=description, stats=stats)
+    return description
+
+async def _describe_task(client, semaphore, task, stats):
+    """Run the remote calls for a single task under the shared concurrency limit."""
+    async with semaphore:
+        if task.kind == "table":
+            return await process_graph_async(client, task.image_content, stats=stats)
+        return await describe_image_once_async(client, task.image_content, stats)
+
+async def _run_enrichment(tasks, max_concurrency, time_budget, stats, progress=None, transport=None):
+    """Fan out all tasks concurrently and collect descriptions finished within the time budget."""
+    semaphore = asyncio.Semaphore(max_concurrency)
+    # One keep-alive client per run: async clients are bound to the event loop of `enrich_documents`
+    pool_size = min(max_concurrency, NVIDIA_HTTP_POOL_SIZE)
+    limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+    timeout = httpx.Timeout(VLM_REQUEST_TIMEOUT, connect=NVIDIA_CONNECT_TIMEOUT)
+    descriptions = {}
+
+    async with httpx.AsyncClient(timeout=timeout, limits=limits, transport=transport) as client:
+        pending = {asyncio.create_task(_describe_task(client, semaphore, task, stats)): task for task in tasks}
+        if progress:
+            def report_progress(_):
+                stats["finished"] += 1
+                progress("enrich", stats["finished"], len(tasks))
+
+            progress("enrich", 0, len(tasks))
+            for future in pending:
+                future.add_done_callback(report_progress)
+        done, not_done = await asyncio.wait(pending, timeout=time_budget)
+
+        for future in not_done:
+            future.cancel()
+        if not_done:
+            print(f"VLM enrichment time budget of {time_budget}s exceeded; {len(not_done)} item(s) left undescribed")
+
+        for future in done:
+            task = pending[future]
+            try:
+                descriptions[task.doc_id] = future.result()
+            except Exception as e:
+                print(f"Error describing {task.kind} {task.doc_id}: {e}")
+
+    return descriptions
+
+def enrich_documents(documents, tasks, max_concurrency=None, time_budget=None, progress=None, transport=None):
+    """
+    Describe all collected table and image crops and fill in the captions of their documents.
+
+    Remote calls run concurrently on an asyncio event loop, so latency scales with the
+    slowest batch rather than the sum of all calls. Items that fail or miss the
+    per-document time budget keep a caption built from their surrounding text only.
+    `progress("enrich", done, total)` is called as each item finishes. An optional httpx
+    `transport` (e.g. a replaying `httpx.AsyncBaseTransport`) replaces the network for all calls.
+    """
+    if not tasks:
+        return documents
+
+    max_concurrency = max_concurrency or VLM_MAX_CONCURRENCY
+    if time_budget is None:
+        time_budget = VLM_DOCUMENT_TIME_BUDGET
+    start_time = time.perf_counter()
+    stats = Counter()
+    preprocessing_before = image_preprocessor.stats()
+
+    coroutine = _run_enrichment(tasks, max_concurrency, time_budget, stats, progress, transport)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        descriptions = asyncio.run(coroutine)
+    else:
+        # Called from inside an event loop (e.g. a FastAPI handler): run on a dedicated thread
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            descriptions = executor.submit(asyncio.run, coroutine).result()
+
+    documents_by_id = {doc.id_: doc for doc in documents}
+    for task in tasks:
+        doc = documents_by_id.get(task.doc_id)
+        if doc is None:
+            continue
+        description = descriptions.get(task.doc_id, " ")
+        caption = task.before_text.replace("\n", " ") + description + task.after_text.replace("\n", " ")
+        doc.metadata["caption"] = caption
+        doc.text = doc.text.replace(CAPTION_PLACEHOLDER, caption, 1)
+
+    local_classes = ", ".join(f"{key[len('local_'):]}={count}" for key, count in sorted(stats.items()) if key.startswith("local_"))
+    print(f"Enriched {len(descriptions)}/{len(tasks)} tables and images in {time.perf_counter() - start_time:.1f}s "
+          f"with {stats['remote_calls']} remote calls and {stats['cache_hits']} cache hits "
+          f"(local classes: {local_classes or 'none'})")
+    preprocessing = {key: value - preprocessing_before[key] for key, value in image_preprocessor.stats().items()}
+    print(f"Image preprocessing: {preprocessing['images']} encoded, {preprocessing['cache_hits']} reused, "
+          f"{preprocessing['bytes_saved'] / 1024:.0f} KiB saved of {preprocessing['original_bytes'] / 1024:.0f} KiB "
+          f"(~{preprocessing['estimated_upload_seconds_saved']:.1f}s upload, "
+          f"{preprocessing['encode_seconds_saved']:.2f}s encoding saved by the cache)")
+    return documents
@@ -1,13 +1,24 @@
 #streamlit_pages/detail_view.py
 import streamlit as st
 import requests
-from utils import fetch_image_url, fetch_pdf_url, fetch_summary
+from utils import fetch_image_url, fetch_pdf_url, fetch_summary, fetch_publication
 
 def show_detail_view(API_BASE_URL):
     """Displays detailed information of a selected publication."""
     if st.session_state.get("selected_pub") is not None:
         selected_pub = st.session_state["selected_pub"]
 
+        # The grid only holds the ID, title and cover; fetch the full record once
+        if "PDF_LINK" not in selected_pub:
+            selected_pub = fetch_publication(API_BASE_URL, selected_pub["ID"])
+            if selected_pub is None:
+                if st.button("🔙 Back to List"):
+                    st.session_state["selected_pub"] = None
+                    st.session_state["page"] = "grid_view"
+                    st.rerun()
+                return
+            st.session_state["selected_pub"] = selected_pub
+
         # Add a button to go back to the list view at the top
         if st.button("🔙 Back to List"):
             st.session_state["selected_pub"] = None
@@ -3,10 +3,34 @@ import streamlit as st
 from utils import fetch_publications, fetch_image_url
 import os
 
+def show_filters():
+    """Displays the title, author and date filters and returns them as API query parameters."""
+    with st.expander("Filter publications"):
+        col_title, col_author = st.columns(2)
+        title = col_title.text_input("Title contains")
+        author = col_author.text_input("Author contains")
+        col_from, col_to = st.columns(2)
+        date_from = col_from.date_input("Published from", value=None)
+        date_to = col_to.date_input("Published to", value=None)
+    return {
+        "title": title.strip(),
+        "author": author.strip(),
+        "date_from": date_from.isoformat() if date_from else None,
+        "date_to": date_to.isoformat() if date_to else None
+    }
+
 def show_grid_view(API_BASE_URL):
-    """Displays a grid view of the available publications."""
-    # Fetch the list of publications from the server
-    publications = fetch_publications(API_BASE_URL)
+    """Displays a grid view of the available publications, one page at a time."""
+    filters = show_filters()
+
+    # Cursors of the pages visited so far (None for the first page); restart when the filters change
+    if st.session_state.get("publications_filters") != filters:
+        st.session_state["publications_filters"] = filters
+        st.session_state["publications_cursors"] = [None]
+    cursors = st.session_state["publications_cursors"]
+
+    # Fetch the current page of publications from the server
+    publications, next_cursor = fetch_publications(API_BASE_URL, cursors[-1], filters)
 
     if publications:
         st.subheader("Explore Publications")
@@ -69,19 +93,32 @@ def show_grid_view(API_BASE_URL):
                 col.markdown(button_style, unsafe_allow_html=True)
                 if col.button(pub['TITLE'], key=f"btn_{pub['ID']}"):
                     # When the button is clicked, update the session state and navigate to the detail view
+                    # (the detail view fetches the full record of the publication)
                     st.session_state["selected_pub"] = pub
                     st.session_state["page"] = "detail_view"
                     st.rerun()
 
         st.markdown("---")
+    elif len(cursors) == 1:
+        st.info("No publications match the selected filters.")
+
+    # Page navigation
+    col_prev, col_page, col_next = st.columns([1, 4, 1])
+    if len(cursors) > 1 and col_prev.button("⬅ Previous"):
+        cursors.pop()
+        st.rerun()
+    col_page.markdown(f"Page {len(cursors)}")
+    if next_cursor and col_next.button("Next ➡"):
+        cursors.append(next_cursor)
+        st.rerun()
 
     # Check URL parameters for selected publication using st.query_params
     query_params = st.query_params  # Access query parameters using st.query_params dictionary-like interface
-    selected_pub_id = query_params.get('selected_pub_id', [None])[0]
+    selected_pub_id = query_params.get('selected_pub_id')
 
     if selected_pub_id:
-        # Validate the selected publication based on the ID in the query parameters
-        selected_pub = next((pub for pub in publications if str(pub['ID']) == selected_pub_id), None)
+        # The publication may be on another page, so select it by ID; the detail view fetches its record
+        selected_pub = {"ID": int(selected_pub_id)} if selected_pub_id.isdigit() else None
         if selected_pub:
             # Update session state for the selected publication
             st.session_state["selected_pub"] = selected_pub
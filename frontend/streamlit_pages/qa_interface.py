@@ -1,4 +1,6 @@
 # streamlit_pages/qa_interface.py
+import json
+import time
 import requests
 import streamlit as st
 from utils import (
@@ -109,7 +111,7 @@ def show_qa_interface(API_BASE_URL):
 
             with st.chat_message("assistant"):
                 message_placeholder = st.empty()
-                full_response = query_engine(user_input, API_BASE_URL, pub_id, query_mode)
+                full_response = query_engine_stream(user_input, API_BASE_URL, pub_id, query_mode, message_placeholder)
                 message_placeholder.markdown(full_response)
 
             st.session_state['history'].append({"role": "assistant", "content": full_response})
@@ -129,47 +131,98 @@ def check_and_process_index(API_BASE_URL, pub_id, selected_pdf_url):
                 st.session_state['history'] = []
                 st.success("Index already exists! You can start querying.")
             else:
-                with st.spinner("Processing and indexing PDF..."):
-                    response = requests.post(f"{API_BASE_URL}/rag/process-pdf", json={"pdf_link": selected_pdf_url, "pdf_id": pub_id})
-                    if response.status_code == 200:
-                        st.session_state['index'] = True
-                        st.session_state['history'] = []
-                        st.success("PDF processed and index created successfully!")
-                    else:
-                        st.error(f"Failed to process the PDF. Error: {response.status_code} - {response.json().get('detail', 'Unknown error')}")
-                        return
+                job = run_ingestion_job(API_BASE_URL, selected_pdf_url, pub_id)
+                if job.get("status") == "succeeded":
+                    st.session_state['index'] = True
+                    st.session_state['history'] = []
+                    st.success("PDF processed and index created successfully!")
+                else:
+                    st.error(f"Failed to process the PDF. Error: {job.get('error', 'Unknown error')}")
+                    return
         except Exception as e:
             st.error(f"Error during processing or index check: {str(e)}")
             return
 
-def query_engine(query, API_BASE_URL, pub_id, query_mode):
+# Human-readable labels for the ingestion stages reported by /rag/jobs
+INGESTION_STAGE_LABELS = {
+    "download": "Downloading PDF",
+    "parse": "Parsing pages",
+    "enrich": "Describing tables and images",
+    "embed": "Embedding chunks",
+    "index": "Writing index"
+}
+
+def run_ingestion_job(API_BASE_URL, selected_pdf_url, pub_id, reload=False, poll_interval=2):
+    """Submit a background ingestion job and poll it, showing per-stage progress, until it finishes."""
+    response = requests.post(
+        f"{API_BASE_URL}/rag/jobs",
+        json={"pdf_link": selected_pdf_url, "pdf_id": pub_id, "reload": reload}
+    )
+    if response.status_code != 200:
+        return {"status": "failed", "error": f"{response.status_code} - {response.json().get('detail', 'Unknown error')}"}
+
+    job = response.json()
+    progress_bar = st.progress(0.0, text="Queued for processing...")
+    while job.get("status") in ("queued", "running"):
+        time.sleep(poll_interval)
+        response = requests.get(f"{API_BASE_URL}/rag/jobs/{job['job_id']}")
+        if response.status_code != 200:
+            return {"status": "failed", "error": f"{response.status_code} - {response.json().get('detail', 'Unknown error')}"}
+        job = response.json()
+        stage = job.get("stage")
+        if stage:
+            counters = job["progress"].get(stage, {})
+            done, total = counters.get("done", 0), counters.get("total", 0)
+            fraction = done / total if total else 0.0
+            label = INGESTION_STAGE_LABELS.get(stage, stage)
+            progress_bar.progress(min(fraction, 1.0), text=f"{label}... ({done}/{total})" if total else f"{label}...")
+    progress_bar.empty()
+    return job
+
+def query_engine_stream(query, API_BASE_URL, pub_id, query_mode, message_placeholder):
+    """Stream the assistant's answer from /rag/query-stream, rendering tokens as they arrive."""
     try:
         index_type = "pdf-index" if query_mode == "Full Document" else "research-notes"
-        response = requests.post(f"{API_BASE_URL}/rag/query", json={"question": query, "pdf_id": pub_id, "index_type": index_type})
-        if response.status_code == 200:
-            return response.json().get("answer", "")
-        elif response.status_code == 404 and index_type == "research-notes":
-            return "Research notes index not found. Please save research notes first."
-        else:
-            return f"Error querying the assistant: {response.status_code} - {response.json().get('detail', 'Unknown error')}"
+        payload = {"question": query, "pdf_id": pub_id, "index_type": index_type}
+        with requests.post(f"{API_BASE_URL}/rag/query-stream", json=payload, stream=True) as response:
+            if response.status_code == 404 and index_type == "research-notes":
+                return "Research notes index not found. Please save research notes first."
+            elif response.status_code != 200:
+                return f"Error querying the assistant: {response.status_code} - {response.json().get('detail', 'Unknown error')}"
+
+            full_response = ""
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if not line:
+                    event = None
+                elif line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data = json.loads(line[len("data:"):].strip())
+                    if event == "error":
+                        return f"Error querying the assistant: {data.get('detail', 'Unknown error')}"
+                    if event == "done":
+                        break
+                    full_response += data.get("token", "")
+                    message_placeholder.markdown(full_response + "▌")
+            return full_response
     except Exception as e:
         return f"Error querying the assistant: {str(e)}"
 
 def reload_qa_interface(API_BASE_URL, selected_pdf_url, pub_id):
     """Reloads and reprocesses the Q/A interface for the given publication."""
-    with st.spinner("Reprocessing and reindexing PDF..."):
-        try:
-            response = requests.post(f"{API_BASE_URL}/rag/reload-pdf", json={"pdf_link": selected_pdf_url, "pdf_id": pub_id})
-            if response.status_code == 200:
-                st.session_state['index'] = True
-                st.session_state['history'] = []
-                st.success("PDF reprocessed and index recreated successfully!")
-            else:
-                st.error(f"Failed to reload the Q/A Interface. Error: {response.status_code} - {response.json().get('detail', 'Unknown error')}")
-                return
-        except Exception as e:
-            st.error(f"Error reloading the Q/A Interface: {str(e)}")
+    try:
+        job = run_ingestion_job(API_BASE_URL, selected_pdf_url, pub_id, reload=True)
+        if job.get("status") == "succeeded":
+            st.session_state['index'] = True
+            st.session_state['history'] = []
+            st.success("PDF reprocessed and index recreated successfully!")
+        else:
+            st.error(f"Failed to reload the Q/A Interface. Error: {job.get('error', 'Unknown error')}")
             return
+    except Exception as e:
+        st.error(f"Error reloading the Q/A Interface: {str(e)}")
+        return
 
 
 def generate_report(API_BASE_URL, pub_id, conversation_history, query_mode):
@@ -5,18 +5,54 @@ from datetime import datetime
 import pytz
 
 
-def fetch_publications(API_BASE_URL):
-    """Fetches a list of publications from the FastAPI server."""
+# Publications shown per grid page
+PUBLICATIONS_PAGE_SIZE = 25
+
+def fetch_publications(API_BASE_URL, cursor=None, filters=None):
+    """
+    Fetches one page of publications (ID, title and cover) from the FastAPI server.
+
+    Returns `(publications, next_cursor)`; `next_cursor` is None on the last page. Each
+    page and its ETag are kept in the session state and revalidated with If-None-Match,
+    so an unchanged page costs a 304 instead of a full download.
+    """
+    params = {"limit": PUBLICATIONS_PAGE_SIZE, **{key: value for key, value in (filters or {}).items() if value}}
+    if cursor:
+        params["cursor"] = cursor
+    cache_key = tuple(sorted((key, str(value)) for key, value in params.items()))
+    page_cache = st.session_state.setdefault("publications_cache", {})
+    cached = page_cache.get(cache_key)
+    headers = {"If-None-Match": cached["etag"]} if cached else {}
     try:
-        response = requests.get(f"{API_BASE_URL}/snowflake/publications")
+        response = requests.get(f"{API_BASE_URL}/snowflake/publications", params=params, headers=headers)
+        if response.status_code == 304 and cached:
+            return cached["publications"], cached["next_cursor"]
         if response.status_code == 200:
-            return response.json()
+            page = response.json()
+            if response.headers.get("ETag"):
+                page_cache[cache_key] = {"etag": response.headers["ETag"], "publications": page["items"], "next_cursor": page["next_cursor"]}
+            return page["items"], page["next_cursor"]
         else:
             st.error("Failed to fetch publications. Please try again later.")
-            return []
+            return [], None
     except Exception as e:
         st.error(f"Error fetching publications: {str(e)}")
-        return []
+        return [], None
+
+def fetch_publication(API_BASE_URL, pub_id):
+    """Fetches the full record of one publication (summary, author, links) from the FastAPI server."""
+    try:
+        response = requests.get(f"{API_BASE_URL}/snowflake/publications/{pub_id}")
+        if response.status_code == 200:
+            return response.json()
+        if response.status_code == 404:
+            st.error("Publication not found.")
+        else:
+            st.error("Failed to fetch the publication. Please try again later.")
+        return None
+    except Exception as e:
+        st.error(f"Error fetching publication: {str(e)}")
+        return None
 
 def fetch_image_url(API_BASE_URL, file_key):
     """Fetches a pre-signed URL for an image from the S3 bucket using FastAPI."""